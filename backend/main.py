@@ -1,16 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from utils.constants import USERS_PATH, ACTIVITY_PATH
-from utils.file_ops import write_json
-from routes.api import activity, users, tasks, document
-from utils.constants import USERS_PATH, ACTIVITY_PATH
-from routes.ws import document_ws
+from utils.constants import USERS_PATH, TASKS_PATH, DOCUMENT_PATH, DEFAULT_DOCUMENT_ID, PROFILER_ENABLED
+from utils.file_ops import write_json, store
+from utils.passwords import hash_password
+from utils.activity_pipeline import pipeline
+from utils.rooms import rooms
+from utils.task_store import task_store
+from utils.pubsub import bus
+from utils.metrics import MetricsMiddleware
+from utils.profiler import profiler
+from routes.api import activity, users, tasks, document, metrics
+from routes.ws import document_ws, feed_ws
 
 
 # -----------------------------
 # Setup
 # -----------------------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background writers for the lifetime of the server and flush them on shutdown."""
+    store.start()
+    await bus.start()
+    await pipeline.start()
+    await task_store.load()
+    await users.hash_plaintext_passwords()
+    # Recover edits to the default document from its WAL; other documents load on first use
+    rooms.acquire(DEFAULT_DOCUMENT_ID)
+    await rooms.get(DEFAULT_DOCUMENT_ID).session.load()
+    if PROFILER_ENABLED:
+        profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        await rooms.close()
+        await task_store.close()
+        await pipeline.stop()
+        await bus.stop()
+        store.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,27 +50,33 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(users.router)
 app.include_router(activity.router)
 app.include_router(tasks.router)
 app.include_router(document.router)
+app.include_router(metrics.router)
 
 app.include_router(document_ws.router)
+app.include_router(feed_ws.router)
 
 # -----------------------------
 # Seed default users (if empty)
 # -----------------------------
-if not USERS_PATH.exists():
+if not store.exists(USERS_PATH):
     default_users = {
         "users": [
-            {"id": 1, "username": "admin123", "password": "admin123", "role": "Admin"},
-            {"id": 2, "username": "editor123", "password": "editor123", "role": "Editor"},
-            {"id": 3, "username": "viewer123", "password": "viewer123", "role": "Viewer"},
+            {"id": 1, "username": "admin123", "password": hash_password("admin123"), "role": "Admin"},
+            {"id": 2, "username": "editor123", "password": hash_password("editor123"), "role": "Editor"},
+            {"id": 3, "username": "viewer123", "password": hash_password("viewer123"), "role": "Viewer"},
         ]
     }
     write_json(USERS_PATH, default_users)
-    write_json(ACTIVITY_PATH, {"logs": []})
+
+# Load every data file into memory once; requests are served from the store
+store.preload([USERS_PATH, TASKS_PATH, DOCUMENT_PATH])
 
 # -----------------------------
 # Routes
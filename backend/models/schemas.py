@@ -1,5 +1,5 @@
 from typing import Optional, Literal, List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
 Role = Literal["Admin", "Editor", "Viewer"]
 TaskStatus = Literal["Pending", "In Progress", "Done"]
@@ -19,14 +19,42 @@ class Task(BaseModel):
     status: TaskStatus
 
 
+class TaskOperation(BaseModel):
+    """One create/update/delete in a task batch."""
+    op: Literal["create", "update", "delete"]
+    id: int | None = None
+    task: Task | None = None
+    revision: int | None = None  # update/delete: the task's expected current revision
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op != "create" and self.id is None:
+            raise ValueError(f"'{self.op}' needs an id")
+        if self.op != "delete" and self.task is None:
+            raise ValueError(f"'{self.op}' needs a task")
+        return self
+
+
+class TaskBatchRequest(BaseModel):
+    """Task operations applied together, in order."""
+    operations: List[TaskOperation] = Field(min_length=1, max_length=1000)
+
+
 class Document(BaseModel):
     """Represents a shared editable document."""
     title: str
     content: str
-    lastEditedBy: str
+    lastEditedBy: Optional[str] = None  # set from the session token on save
     lastUpdated: Optional[str] = None 
 
 
+class ProfilerRequest(BaseModel):
+    """Switch the sampling profiler on or off."""
+    enabled: bool
+    interval: Optional[float] = Field(None, gt=0, le=1)  # seconds between samples
+    reset: bool = False  # discard the samples collected so far
+
+
 class ActivityLog(BaseModel):
     """Represents a logged user action."""
     timestamp: str
@@ -51,15 +79,11 @@ class LoginRequest(BaseModel):
     password: str
 
 class ActivityRequest(BaseModel):
-    user: str
     action: str
     details: Optional[str] = None
 
 class CreateUserRequest(BaseModel):
-    creator: str
+    creator: Optional[str] = None  # ignored: the creator is the token holder
     username: str
     password: str
     role: str = "Viewer"
-
-class LogoutRequest(BaseModel):
-    username: str
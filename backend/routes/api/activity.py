@@ -1,29 +1,81 @@
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
 from models.schemas import ActivityRequest
-from utils.file_ops import read_json, add_activity
-from utils.constants import ACTIVITY_PATH
+from utils.auth import current_user
+from utils.file_ops import add_activity
+from utils.activity_log import journal
+from utils.activity_pipeline import pipeline
+from utils.activity_index import timestamp_key
+from utils.constants import DATETIME_FMT
+from utils.tokens import Claims
 
 router = APIRouter(prefix="/api/activity", tags=["activity"])
 
+DEFAULT_PAGE_SIZE = 50
+
+
+def _parse_timestamp(value: str | None, field: str) -> int | None:
+    if value is None:
+        return None
+    try:
+        datetime.strptime(value, DATETIME_FMT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{field}' timestamp, expected {DATETIME_FMT}.")
+    return timestamp_key(value)
+
+
 @router.get("/")
-async def get_activity(limit: int | None = Query(None, description="Limit number of logs returned")):
-    """Get all activity logs (optionally limited)."""
+async def get_activity(
+    limit: int | None = Query(None, description="Limit number of logs returned"),
+    user: str | None = Query(None, description="Only logs by this user"),
+    action: str | None = Query(None, description="Only logs with this action"),
+    start: str | None = Query(None, alias="from", description="Oldest timestamp to include (UTC)"),
+    end: str | None = Query(None, alias="to", description="Newest timestamp to include (UTC)"),
+    cursor: int | None = Query(None, ge=0, description="nextCursor from the previous page"),
+):
+    """
+    Get activity logs, oldest first.
+    - No filters: all logs, or the newest `limit` logs
+    - With filters or a cursor: one page (default 50) plus `nextCursor` for older entries
+    """
     try:
-        data = read_json(ACTIVITY_PATH)
-        logs = data.get("logs", [])
-        
-        if limit is not None:
-            logs = logs[-limit:]
+        start_key = _parse_timestamp(start, "from")
+        end_key = _parse_timestamp(end, "to")
+
+        if user is None and action is None and start is None and end is None and cursor is None:
+            if limit is not None:
+                logs = await asyncio.to_thread(journal.tail, limit)
+            else:
+                logs = await asyncio.to_thread(list, journal)
+            return {"status": "success", "data": logs}
 
-        return {"status": "success", "data": logs}
+        logs, next_cursor = await asyncio.to_thread(
+            journal.query,
+            user=user,
+            action=action,
+            start=start_key,
+            end=end_key,
+            cursor=cursor,
+            limit=limit if limit is not None else DEFAULT_PAGE_SIZE,
+        )
+        return {"status": "success", "data": logs, "nextCursor": next_cursor}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read activity logs: {str(e)}")
+@router.get("/stats")
+async def get_activity_stats():
+    """Counters for the background activity writer (queue depth, dropped entries, ...)."""
+    return {"status": "success", "data": pipeline.stats()}
+
+
 @router.post("/")
-async def create_activity(request: ActivityRequest):
-    """Log a new activity."""
+async def create_activity(request: ActivityRequest, user: Claims = Depends(current_user)):
+    """Log a new activity for the token holder."""
     try:
-        add_activity(request.user, request.action)
-        return {"status": "success", "data": {"user": request.user, "action": request.action}}
+        add_activity(user.username, request.action)
+        return {"status": "success", "data": {"user": user.username, "action": request.action}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to log activity: {str(e)}")
\ No newline at end of file
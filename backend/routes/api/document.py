@@ -1,39 +1,185 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from models.schemas import Document
-from utils.file_ops import read_json, write_json, add_activity
-from utils.constants import DOCUMENT_PATH
-from utils.auth import require_role
-from datetime import datetime
-from utils.constants import DATETIME_FMT
+from utils.file_ops import add_activity
+from utils.auth import EDITOR_ROLES, require_roles
+from utils.etags import PreconditionFailed, if_match_revision, make_etag
+from utils.tokens import Claims
+from utils.response_cache import response_cache
+from utils.rooms import rooms, document_paths
+from datetime import datetime, timezone
+from utils.constants import DATETIME_FMT, DEFAULT_DOCUMENT_ID
 
 router = APIRouter(prefix="/api/document", tags=["document"])
 
+MAX_REVISION_PAGE = 1000
+
+
+def _check_id(doc_id: str) -> None:
+    try:
+        document_paths(doc_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _check_exists(doc_id: str) -> None:
+    _check_id(doc_id)
+    if not rooms.exists(doc_id):
+        raise HTTPException(status_code=404, detail="No document found.")
+
+
+def document_etag(doc_id: str, revision: int) -> str:
+    return make_etag("document", doc_id, revision)
+
 
 @router.get("/")
-async def get_document():
-    """Get the single document."""
-    data = read_json(DOCUMENT_PATH)
-    document = data.get("document")
+async def get_default_document(request: Request):
+    """Get the default document."""
+    return await get_document(DEFAULT_DOCUMENT_ID, request)
+
+
+@router.get("/connections")
+async def get_default_connections():
+    """Per-connection WebSocket send queue metrics for the default document."""
+    return await get_connections(DEFAULT_DOCUMENT_ID)
+
+
+@router.get("/revisions")
+async def list_default_revisions(limit: int = Query(50, ge=1, le=MAX_REVISION_PAGE), cursor: int | None = None):
+    """Revision history of the default document."""
+    return await list_revisions(DEFAULT_DOCUMENT_ID, limit, cursor)
+
+
+@router.get("/revisions/{revision}")
+async def get_default_revision(revision: int):
+    """The default document as of one revision."""
+    return await get_revision(DEFAULT_DOCUMENT_ID, revision)
+
+
+@router.get("/diff")
+async def diff_default_revisions(old: int = Query(..., alias="from"), new: int = Query(..., alias="to")):
+    """Ops turning one revision of the default document into another."""
+    return await diff_revisions(DEFAULT_DOCUMENT_ID, old, new)
+
+
+@router.put("/")
+async def update_default_document(
+    updated: Document,
+    response: Response,
+    if_match: str | None = Header(None),
+    user: Claims = Depends(require_roles(*EDITOR_ROLES)),
+):
+    """Update the default document."""
+    return await update_document(DEFAULT_DOCUMENT_ID, updated, response, if_match, user)
+
+
+@router.get("/{doc_id}")
+async def get_document(doc_id: str, request: Request):
+    """
+    Get a document by id; the ETag names its revision (for If-Match on updates).
+    The encoded response is reused until the next edit, and If-None-Match
+    with the current ETag is answered with 304.
+    """
+    _check_id(doc_id)
+    if not rooms.exists(doc_id):
+        raise HTTPException(status_code=404, detail="No document found.")
+
+    async with rooms.use(doc_id) as room:
+        document, revision = room.session.document, room.session.revision
 
     if not document:
         raise HTTPException(status_code=404, detail="No document found.")
-    
+
+    async def build():
+        return {"status": "success", "data": document}
+
+    return await response_cache.serve(request, f"document:{doc_id}", "", revision, build,
+                                      etag=document_etag(doc_id, revision))
+
+
+@router.get("/{doc_id}/connections")
+async def get_connections(doc_id: str):
+    """Per-connection WebSocket send queue metrics (empty when nobody has the document open)."""
+    _check_id(doc_id)
+    room = rooms.get(doc_id)
+    return {"status": "success", "data": room.connections.stats() if room else []}
+
+
+@router.get("/{doc_id}/revisions")
+async def list_revisions(doc_id: str, limit: int = Query(50, ge=1, le=MAX_REVISION_PAGE), cursor: int | None = None):
+    """
+    Revision history, newest first: revision, title, editor and time of each.
+    Pass `nextCursor` back as `cursor` for older revisions.
+    """
+    _check_exists(doc_id)
+    async with rooms.use(doc_id) as room:
+        revisions, next_cursor = await asyncio.to_thread(room.session.history.list, cursor, limit)
+    return {"status": "success", "data": revisions, "nextCursor": next_cursor}
+
+
+@router.get("/{doc_id}/revisions/{revision}")
+async def get_revision(doc_id: str, revision: int):
+    """A document as of one revision (rebuilt from the nearest stored snapshot)."""
+    _check_exists(doc_id)
+    async with rooms.use(doc_id) as room:
+        document = await asyncio.to_thread(room.session.history.get, revision)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
     return {"status": "success", "data": document}
 
 
-@router.put("/")
-async def update_document(updated: Document):
-    """Update the document content."""
-    try:
-        require_role(updated.lastEditedBy, {"Admin", "Editor"})
+@router.get("/{doc_id}/diff")
+async def diff_revisions(doc_id: str, old: int = Query(..., alias="from"), new: int = Query(..., alias="to")):
+    """Insert/delete ops turning revision `from` into revision `to`."""
+    _check_exists(doc_id)
+    async with rooms.use(doc_id) as room:
+        ops = await asyncio.to_thread(room.session.history.diff, old, new)
+    if ops is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"status": "success", "data": {"from": old, "to": new, "ops": ops}}
 
+
+@router.put("/{doc_id}")
+async def update_document(
+    doc_id: str,
+    updated: Document,
+    response: Response,
+    if_match: str | None = Header(None),
+    user: Claims = Depends(require_roles(*EDITOR_ROLES)),
+):
+    """
+    Update (or create) a document's content.
+    - With If-Match (the ETag from GET), 412 if the document has changed since
+    """
+    _check_id(doc_id)
+    try:
+        # The editor is whoever holds the token, not what the body claims
+        updated.lastEditedBy = user.username
         if not updated.lastUpdated:
-            updated.lastUpdated = datetime.now().strftime(DATETIME_FMT)
+            updated.lastUpdated = datetime.now(timezone.utc).strftime(DATETIME_FMT)
+        try:
+            expected = if_match_revision(if_match, "document", doc_id)
+        except PreconditionFailed:
+            expected = -1  # never current: answered with the current ETag below
+
+        def make_edit(s):
+            # Checked at the latest revision, under the room's edit lock
+            if expected is not None and s.revision != expected:
+                raise PreconditionFailed(s.revision)
+            return s.replace(updated.model_dump(), updated.lastEditedBy)
+
+        async with rooms.use(doc_id) as room:
+            # Live editors receive the save as an ordinary edit
+            revision, _ = await room.edit(make_edit, updated.lastEditedBy)
+        response_cache.invalidate(f"document:{doc_id}")
 
-        write_json(DOCUMENT_PATH, {"document": updated.model_dump()})
         add_activity(updated.lastEditedBy, "updated document", updated.title)
+        response.headers["ETag"] = document_etag(doc_id, revision)
         return {"status": "success", "data": updated}
 
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=412, detail="Document has changed",
+                            headers={"ETag": document_etag(doc_id, e.current)})
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,37 @@
+import asyncio
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from models.schemas import ProfilerRequest
+from utils.auth import require_roles
+from utils.metrics import render
+from utils.profiler import profiler
+from utils.tokens import Claims
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request latency, storage and lock timings and WebSocket gauges, in the Prometheus text format."""
+    return PlainTextResponse(render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def get_profile(limit: int | None = Query(None, ge=1), admin: Claims = Depends(require_roles("Admin"))):
+    """Collapsed stacks sampled so far (flame graph input), most frequent first (Admin-only)."""
+    return PlainTextResponse("\n".join(profiler.report(limit)) + "\n")
+
+
+@router.post("/profiler")
+async def set_profiler(request: ProfilerRequest, admin: Claims = Depends(require_roles("Admin"))):
+    """Start or stop the sampling profiler at runtime (Admin-only)."""
+    if request.reset:
+        profiler.reset()
+    if request.enabled:
+        profiler.start(request.interval)
+    else:
+        # Joining the sampler thread can take up to one interval
+        await asyncio.to_thread(profiler.stop)
+    return {"status": "success", "data": profiler.status()}
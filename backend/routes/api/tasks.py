@@ -1,72 +1,182 @@
-from fastapi import APIRouter, HTTPException
-from models.schemas import Task
-from utils.file_ops import read_json, write_json, add_activity
-from utils.constants import TASKS_PATH
-from utils.auth import require_role
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from models.schemas import Task, TaskBatchRequest, TaskStatus
+from utils.file_ops import add_activity
+from utils.auth import EDITOR_ROLES, require_roles
+from utils.feeds import task_feed
+from utils.etags import PreconditionFailed, if_match_revision, make_etag
+from utils.response_cache import response_cache
+from utils.task_store import MissingTasks, RevisionMismatch, task_store
+from utils.tokens import Claims
 
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
 
 @router.get("/")
-async def get_tasks():
-    """Get all tasks."""
-    data = read_json(TASKS_PATH)
-    return {"status": "success", "data": data.get("tasks", [])}
+async def get_tasks(
+    request: Request,
+    status: TaskStatus | None = Query(None, description="Only tasks with this status"),
+    assigned_to: str | None = Query(None, alias="assignedTo", description="Only tasks assigned to this user"),
+    sort: str | None = Query(None, pattern=r"^-?(id|title|status|assignedTo)$",
+                             description="Field to order by, '-' prefix for descending"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: str | None = Query(None, description="nextCursor from the previous page"),
+):
+    """
+    Get tasks.
+    - No parameters: every task, in creation order
+    - With filters, sort, limit or a cursor: one page (default 50) plus `nextCursor`
+    - Answers 304 when If-None-Match holds the current ETag; encoded
+      responses are reused until the next task write
+    """
+    await task_store.load()
+    version = task_store.version
+
+    async def build():
+        if status is None and assigned_to is None and sort is None and limit is None and cursor is None:
+            return {"status": "success", "data": await task_store.all()}
+        field = (sort or "id").lstrip("-")
+        try:
+            tasks, next_cursor = await task_store.query(
+                status=status,
+                assigned_to=assigned_to,
+                sort=field,
+                descending=(sort or "").startswith("-"),
+                cursor=cursor,
+                limit=limit if limit is not None else DEFAULT_PAGE_SIZE,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"status": "success", "data": tasks, "nextCursor": next_cursor}
+
+    variant = repr((status, assigned_to, sort, limit, cursor))
+    # The seq is allocated under the task log's lock by whichever worker writes, so it names one state
+    return await response_cache.serve(request, "tasks", variant, version, build, etag=f'"tasks-{version}"')
+
+
+def task_etag(task: dict) -> str:
+    return make_etag("task", task["id"], task.get("revision", 0))
+
+
+def _conflict(task_id: int, revision: int) -> HTTPException:
+    return HTTPException(status_code=412, detail="Task has changed",
+                         headers={"ETag": make_etag("task", task_id, revision)})
+
+
+async def _precondition(task_id: int, if_match: str | None) -> int | None:
+    """The revision If-Match requires; 412 with the current ETag if it cannot match."""
+    try:
+        return if_match_revision(if_match, "task", task_id)
+    except PreconditionFailed:
+        current = await task_store.get(task_id)
+        if current is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        raise _conflict(task_id, current.get("revision", 0))
+
+
+@router.get("/{task_id}")
+async def get_task(task_id: int):
+    """Get one task; its ETag can be sent back as If-Match when updating or deleting it."""
+    task = await task_store.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return JSONResponse({"status": "success", "data": task}, headers={"ETag": task_etag(task)})
 
 
 @router.post("/")
-async def create_task(task: Task):
+async def create_task(task: Task, response: Response, user: Claims = Depends(require_roles(*EDITOR_ROLES))):
     """Create a new task."""
-    require_role(task.assignedTo, {"Admin", "Editor"})
-
-    data = read_json(TASKS_PATH)
-    tasks = data.get("tasks", [])
-    new_task = task.model_dump()
-    new_task["id"] = max([t["id"] for t in tasks], default=0) + 1
-
-    tasks.append(new_task)
-    write_json(TASKS_PATH, {"tasks": tasks})
+    new_task = await task_store.create(task.model_dump())
+    response_cache.invalidate("tasks")
+    task_feed.publish({"op": "put", "task": new_task})
 
-    add_activity(new_task["assignedTo"], "created task", new_task["title"])
+    add_activity(user.username, "created task", new_task["title"])
+    response.headers["ETag"] = task_etag(new_task)
     return {"status": "success", "data": new_task}
 
 
 @router.put("/{task_id}")
-async def update_task(task_id: int, task: Task):
-    """Update an existing task."""
-    require_role(task.assignedTo, {"Admin", "Editor"})
-
-    data = read_json(TASKS_PATH)
-    tasks = data.get("tasks", [])
-    
-    for idx, existing_task in enumerate(tasks):
-        if existing_task["id"] == task_id:
-            updated_task = task.model_dump()
-            updated_task["id"] = task_id
-            tasks[idx] = updated_task
-            write_json(TASKS_PATH, {"tasks": tasks})
-
-            add_activity(updated_task["assignedTo"], "updated task", updated_task["title"])
-            return {"status": "success", "data": updated_task}
-    
-    raise HTTPException(status_code=404, detail="Task not found")
+async def update_task(
+    task_id: int,
+    task: Task,
+    response: Response,
+    if_match: str | None = Header(None),
+    user: Claims = Depends(require_roles(*EDITOR_ROLES)),
+):
+    """
+    Update an existing task.
+    - With If-Match (the task's ETag), 412 if someone else changed it since
+    """
+    try:
+        updated_task = await task_store.update(task_id, task.model_dump(), await _precondition(task_id, if_match))
+    except PreconditionFailed as e:
+        raise _conflict(task_id, e.current)
+    if updated_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    response_cache.invalidate("tasks")
+    task_feed.publish({"op": "put", "task": updated_task})
+
+    add_activity(user.username, "updated task", updated_task["title"])
+    response.headers["ETag"] = task_etag(updated_task)
+    return {"status": "success", "data": updated_task}
 
 
 @router.delete("/{task_id}")
-async def delete_task(task_id: int):
-    """Delete a task."""
-    data = read_json(TASKS_PATH)
-    tasks = data.get("tasks", [])
-    
-    for idx, existing_task in enumerate(tasks):
-        if existing_task["id"] == task_id:
-            require_role(existing_task["assignedTo"], {"Admin", "Editor"})
-
-            deleted_task = tasks.pop(idx)
-            write_json(TASKS_PATH, {"tasks": tasks})
-
-            add_activity(deleted_task["assignedTo"], "deleted task", deleted_task["title"])
-            return {"status": "success", "data": f"Task {task_id} deleted"}
-    
-    raise HTTPException(status_code=404, detail="Task not found")
+async def delete_task(
+    task_id: int,
+    if_match: str | None = Header(None),
+    user: Claims = Depends(require_roles(*EDITOR_ROLES)),
+):
+    """Delete a task (If-Match as for updates)."""
+    try:
+        deleted_task = await task_store.delete(task_id, await _precondition(task_id, if_match))
+    except PreconditionFailed as e:
+        raise _conflict(task_id, e.current)
+    if deleted_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    response_cache.invalidate("tasks")
+    task_feed.publish({"op": "delete", "id": task_id})
+
+    add_activity(user.username, "deleted task", deleted_task["title"])
+    return {"status": "success", "data": f"Task {task_id} deleted"}
+
+
+@router.post("/batch")
+async def batch_tasks(request: TaskBatchRequest, user: Claims = Depends(require_roles(*EDITOR_ROLES))):
+    """
+    Create, update and delete several tasks at once.
+    - Operations are applied in order, all or nothing, in one write
+    - 404 (nothing applied) if an update or delete names a missing task
+    - 412 (nothing applied) if an operation's `revision` is not its task's current one
+    - Returns one result per operation and logs a single activity entry
+    """
+    operations = [
+        (item.op, item.id, item.task.model_dump() if item.task is not None else None)
+        for item in request.operations
+    ]
+    expected = {index: item.revision for index, item in enumerate(request.operations) if item.revision is not None}
+    try:
+        tasks = await task_store.batch(operations, expected)
+    except MissingTasks as e:
+        raise HTTPException(status_code=404, detail=[
+            {"index": index, "id": task_id, "error": "Task not found"} for index, task_id in sorted(e.missing.items())
+        ])
+    except RevisionMismatch as e:
+        raise HTTPException(status_code=412, detail=[
+            {"index": index, "id": task_id, "revision": revision, "error": "Task has changed"}
+            for index, (task_id, revision) in sorted(e.conflicts.items())
+        ])
+    response_cache.invalidate("tasks")
+    for item, task in zip(request.operations, tasks):
+        task_feed.publish({"op": "delete", "id": task["id"]} if item.op == "delete" else {"op": "put", "task": task})
+
+    counts = {op: sum(item.op == op for item in request.operations) for op in ("create", "update", "delete")}
+    add_activity(user.username, "updated tasks in batch",
+                 ", ".join(f"{n} {op}d" for op, n in counts.items() if n))
+    return {"status": "success", "data": [
+        {"op": item.op, "id": task["id"], "task": task} for item, task in zip(request.operations, tasks)
+    ]}
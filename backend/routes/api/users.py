@@ -1,53 +1,67 @@
-from fastapi import APIRouter, HTTPException
-from models.schemas import LoginRequest, CreateUserRequest, LogoutRequest
-from utils.file_ops import read_json, write_json, add_activity
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from models.schemas import LoginRequest, CreateUserRequest
+from utils.file_ops import aread_json, aupdate_json, add_activity, store
 from utils.constants import USERS_PATH
+from utils.auth import current_user, require_roles
+from utils.response_cache import response_cache
+from utils.passwords import DUMMY_HASH, hash_password, is_hashed, needs_rehash, verify_password
+from utils.tokens import Claims, tokens
+from utils.user_index import user_index
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
+
+def public_user(user: dict) -> dict:
+    """A user record without its password hash."""
+    return {k: v for k, v in user.items() if k != "password"}
+
+
 @router.get("/")
-async def get_users():
-    """Get all users."""
+async def get_users(request: Request):
+    """Get all users (cached until the users file is written; supports If-None-Match)."""
+    async def build():
+        data = await aread_json(USERS_PATH)
+        return {"status": "success", "data": [public_user(u) for u in data.get("users", [])]}
+
     try:
-        data = read_json(USERS_PATH)
-        return {"status": "success", "data": data.get("users", [])}
+        return await response_cache.serve(request, "users", "", store.version(USERS_PATH), build)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read users: {str(e)}")
 
 @router.post("/")
-async def create_user(request: CreateUserRequest):
+async def create_user(request: CreateUserRequest, admin: Claims = Depends(require_roles("Admin"))):
     """Create a new user (Admin-only)."""
     try:
-        creator = request.creator
+        creator = admin.username
         new_username = request.username
         new_password = request.password
         new_role = request.role or "Viewer"
 
-        if not creator or not new_username or not new_password:
+        if not new_username or not new_password:
             raise HTTPException(status_code=400, detail="Missing required fields.")
 
-        data = read_json(USERS_PATH)
-        users = data.get("users", [])
+        password_hash = await asyncio.to_thread(hash_password, new_password)
 
-        creator_user = next((u for u in users if u["username"] == creator), None)
-        if not creator_user or creator_user["role"] != "Admin":
-            raise HTTPException(status_code=403, detail="Only Admins can create users.")
+        def add(data: dict) -> dict:
+            # Runs on the file as it is now, whichever worker wrote it last
+            users = data.get("users", [])
+            if any(u.get("username") == new_username for u in users):
+                raise HTTPException(status_code=400, detail="Username already exists.")
+            return {**data, "users": [*users, {
+                "id": len(users) + 1,
+                "username": new_username,
+                "password": password_hash,
+                "role": new_role,
+            }]}
 
-        if any(u["username"] == new_username for u in users):
-            raise HTTPException(status_code=400, detail="Username already exists.")
+        # Writing the file bumps its store version, which refreshes the index
+        new_user = (await aupdate_json(USERS_PATH, add))["users"][-1]
+        response_cache.invalidate("users")
 
-        new_user = {
-            "id": len(users) + 1,
-            "username": new_username,
-            "password": new_password,
-            "role": new_role,
-        }
-
-        users.append(new_user)
-        write_json(USERS_PATH, {"users": users})
         add_activity(creator, "created user", new_username)
 
-        return {"status": "success", "data": new_user}
+        return {"status": "success", "data": public_user(new_user)}
 
     except HTTPException:
         raise
@@ -58,42 +72,77 @@ async def create_user(request: CreateUserRequest):
 async def login(request: LoginRequest):
     """Authenticate a user and return role information."""
     try:
-        data = read_json(USERS_PATH)
-        users = data.get("users", [])
-
-        for user in users:
-            if user["username"] == request.username and user["password"] == request.password:
-                add_activity(user["username"], "logged in")
-                return {
-                    "status": "success",
-                    "data": {"username": user["username"], "role": user["role"]},
-                }
-
-        raise HTTPException(status_code=401, detail="Invalid username or password")
+        user = await user_index.aget(request.username)
+        stored = user.get("password", "") if user else DUMMY_HASH
+        # PBKDF2 is deliberately slow; keep it off the event loop
+        if not await asyncio.to_thread(verify_password, request.password, stored) or not user:
+            raise HTTPException(status_code=401, detail="Invalid username or password")
+
+        if needs_rehash(stored):
+            await upgrade_password(user["username"], request.password)
+
+        token, claims = tokens.issue(user["username"], user["role"])
+        add_activity(user["username"], "logged in")
+        return {
+            "status": "success",
+            "data": {
+                "username": user["username"],
+                "role": user["role"],
+                "token": token,
+                "expiresAt": claims.expires,
+            },
+        }
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to log in: {str(e)}")
 
-@router.post("/logout")
-async def logout(request: LogoutRequest):
-    """Log a user out and record the activity."""
-    try:
-        username = request.username
-        if not username:
-            raise HTTPException(status_code=400, detail="Missing username field.")
-
-        data = read_json(USERS_PATH)
+async def upgrade_password(username: str, password: str) -> None:
+    """Replace a plaintext or outdated hash after a successful login."""
+    password_hash = await asyncio.to_thread(hash_password, password)
+    await aupdate_json(USERS_PATH, lambda data: {**data, "users": [
+        {**u, "password": password_hash} if u["username"] == username else u
+        for u in data.get("users", [])
+    ]})
+
+async def hash_plaintext_passwords() -> int:
+    """
+    Hash every password still stored as plaintext (run at startup), so
+    accounts that never log in again do not keep it on disk. Hashes with an
+    outdated cost need the password and are upgraded on login instead.
+    Returns the number of accounts updated.
+    """
+    data = await aread_json(USERS_PATH)
+    if all(is_hashed(u["password"]) for u in data.get("users", []) if u.get("password")):
+        return 0
+    hashes: dict = {}
+
+    def hash_plaintext(data: dict) -> dict:
+        # Workers starting together: whoever runs second finds nothing left to hash
         users = data.get("users", [])
-        user = next((u for u in users if u["username"] == username), None)
+        for u in users:
+            if u.get("password") and not is_hashed(u["password"]):
+                hashes[u["username"]] = hash_password(u["password"])
+        return {**data, "users": [{**u, "password": hashes[u["username"]]} if u.get("username") in hashes else u
+                                  for u in users]}
+
+    await aupdate_json(USERS_PATH, hash_plaintext)
+    return len(hashes)
 
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found.")
+@router.get("/me")
+async def get_me(user: Claims = Depends(current_user)):
+    """The user the session token belongs to."""
+    return {"status": "success", "data": {"username": user.username, "role": user.role}}
 
-        add_activity(username, "logged out")
+@router.post("/logout")
+async def logout(user: Claims = Depends(current_user)):
+    """Revoke the session token and record the activity."""
+    try:
+        await tokens.arevoke(user)
+        add_activity(user.username, "logged out")
 
-        return {"status": "success", "message": f"{username} logged out successfully."}
+        return {"status": "success", "message": f"{user.username} logged out successfully."}
 
     except HTTPException:
         raise
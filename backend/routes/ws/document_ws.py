@@ -1,64 +1,123 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from utils.connection_manager import manager
-from utils.file_ops import read_json, write_json, add_activity
-from utils.constants import DOCUMENT_PATH, DATETIME_FMT
-from datetime import datetime
+from utils.auth import EDITOR_ROLES
+from utils.constants import DEFAULT_DOCUMENT_ID
+from utils.document_session import StaleRevision
+from utils.etags import PreconditionFailed
+from utils.rooms import rooms, document_paths
+from utils.file_ops import add_activity
+from utils.metrics import count_ws_messages
+from utils.response_cache import response_cache
+from utils.tokens import InvalidToken, tokens
+from utils import ot
 
 router = APIRouter()
 
 @router.websocket("/ws/document")
-async def document_websocket(websocket: WebSocket):
-    await manager.connect(websocket)
-    username = websocket.query_params.get("user", "unknown")
-
-    manager.active_connections.append({
-        "ws": websocket,
-        "user": username,
-        "cursor": None
-    })
-
-    add_activity(username, "joined document")
-
-    doc_data = read_json(DOCUMENT_PATH)
-    await websocket.send_json({
-        "type": "init",
-        "data": {
-            "document": doc_data.get("document", {}),
-            "users": manager.get_presence()
-        }
-    })
-    print("[WS INIT] sent to", username)
-
-
-    await manager.broadcast({
-        "type": "presence",
-        "data": manager.get_presence()
-    }, sender=websocket)
+async def default_document_websocket(websocket: WebSocket):
+    """Collaborative editing channel for the default document."""
+    await document_websocket(websocket, DEFAULT_DOCUMENT_ID)
 
+
+@router.websocket("/ws/document/{doc_id}")
+async def document_websocket(websocket: WebSocket, doc_id: str):
+    """
+    Collaborative editing channel for one document (room).
+    - init:   full snapshot + revision, sent once on join
+    - op:     client sends {"revision", "ops"} made against `revision`; the server
+              transforms them, replies "ack" with the new revision and relays
+              only the transformed ops to peers
+    - update: legacy full-content message, applied as a diff at the latest revision;
+              with a "revision" it is refused (resync) unless that is still current
+    - resync: sent instead of an ack when an edit cannot be applied, or on
+              request when the client sees a gap in revisions
+    - presence: full cursor list on join/leave; cursor moves are batched
+              into "presence_diff" ticks
+    Only clients of the same document receive its broadcasts (on every worker,
+    see Room), and all outgoing messages go through the room's per-connection
+    queues. The room is loaded by its first client and unloaded after its
+    last one leaves.
+    The session token comes in the `token` query parameter (browsers cannot
+    set headers on a WebSocket handshake); Viewers may watch but not edit.
+    """
     try:
-        while True:
-            msg = await websocket.receive_json()
-
-            if msg["type"] == "update":
-                new_doc = msg["data"]
-                new_doc["lastEditedBy"] = username
-                new_doc["lastUpdated"] = datetime.now().strftime(DATETIME_FMT)
-                write_json(DOCUMENT_PATH, {"document": new_doc})
-                add_activity(username, "edited document")
-
-                await manager.broadcast({
-                    "type": "update",
-                    "data": new_doc
-                }, sender=websocket)
-
-            elif msg["type"] == "cursor":
-                position = msg["data"].get("position")
-                manager.update_cursor(websocket, position)
-                await manager.broadcast({
-                    "type": "presence",
-                    "data": manager.get_presence()
-                }, sender=websocket)
-                
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
-        add_activity(username, "left document")
+        document_paths(doc_id)
+        claims = tokens.verify(websocket.query_params.get("token", ""))
+    except (ValueError, InvalidToken):
+        await websocket.close(code=1008)
+        return
+    username = claims.username
+    can_edit = claims.role in EDITOR_ROLES
+
+    async with rooms.use(doc_id) as room:
+        session, manager, presence = room.session, room.connections, room.presence
+
+        await manager.connect(websocket)
+        connection = manager.register(websocket, username)
+
+        add_activity(username, "joined document", doc_id)
+
+        async with session.lock:
+            await manager.send(websocket, {
+                "type": "init",
+                "data": {
+                    **session.snapshot(),
+                    "users": presence.entries(),
+                    "connectionId": connection.id,
+                }
+            })
+
+        await presence.full(sender=websocket)
+
+        try:
+            while True:
+                msg = await websocket.receive_json()
+                count_ws_messages("document", "in")
+
+                if msg["type"] in ("op", "update") and not can_edit:
+                    async with session.lock:
+                        await manager.send(websocket, {
+                            "type": "resync",
+                            "data": {**session.snapshot(), "reason": "Document is read-only for Viewers."}
+                        })
+
+                elif msg["type"] in ("op", "update"):
+                    data = msg.get("data") or {}
+                    if msg["type"] == "op":
+                        def make_edit(s):
+                            return s.apply(data.get("revision"), data.get("ops"), username)
+                    else:
+                        def make_edit(s):
+                            # Optional {"revision"}: refuse to overwrite edits the client has not seen
+                            base = data.get("revision")
+                            if base is not None and base != s.revision:
+                                raise PreconditionFailed(s.revision)
+                            content = s.document.get("content", "")
+                            return s.apply(s.revision, ot.diff(content, data.get("content", content)), username)
+                    try:
+                        await room.edit(make_edit, username, sender=websocket)
+                    except (StaleRevision, PreconditionFailed, ValueError) as e:
+                        async with session.lock:
+                            await manager.send(websocket, {
+                                "type": "resync",
+                                "data": {**session.snapshot(), "reason": str(e)}
+                            })
+                        continue
+                    response_cache.invalidate(f"document:{doc_id}")
+
+                    if session.should_log_edit(username):
+                        add_activity(username, "edited document", doc_id)
+
+                elif msg["type"] == "resync":
+                    # Client noticed a gap in revisions (e.g. messages dropped while it lagged)
+                    async with session.lock:
+                        await manager.send(websocket, {"type": "resync", "data": session.snapshot()})
+
+                elif msg["type"] == "cursor":
+                    presence.move(websocket, msg["data"].get("position"))
+
+        except WebSocketDisconnect:
+            pass
+        finally:
+            manager.disconnect(websocket)
+            add_activity(username, "left document", doc_id)
+            await presence.full()
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from utils.feeds import feeds
+from utils.metrics import count_ws_messages
+
+router = APIRouter()
+
+
+@router.websocket("/ws/feed/{name}")
+async def feed_websocket(websocket: WebSocket, name: str):
+    """
+    Live changes to tasks (`/ws/feed/tasks`) or activity (`/ws/feed/activity`).
+    - init:  sent once on connect with the feed's `epoch` and current `seq`.
+             A client resuming with `?since=<seq>&epoch=<epoch>` also gets the
+             events it missed, or `reset: true` when it must reload the list
+    - event: {"seq", "data"}; tasks send {"op": "put", "task"} or
+             {"op": "delete", "id"}, activity sends the new entry
+    Events are numbered without gaps; a client that sees one (its queue
+    overflowed) reconnects with the last seq it applied. Events up to the
+    init `seq` may arrive again right after init and are skipped by seq.
+    """
+    feed = feeds.get(name)
+    since = websocket.query_params.get("since")
+    if feed is None or (since is not None and not since.isdigit()):
+        await websocket.close(code=1008)
+        return
+
+    manager = feed.connections
+    await manager.connect(websocket)
+    manager.register(websocket, name)
+    await manager.send(websocket, {
+        "type": "init",
+        "data": feed.snapshot(None if since is None else int(since), websocket.query_params.get("epoch")),
+    })
+
+    try:
+        while True:
+            # Nothing is expected from the client; this only notices the disconnect
+            await websocket.receive_text()
+            count_ws_messages(feed.channel, "in")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(websocket)
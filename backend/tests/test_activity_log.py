@@ -0,0 +1,118 @@
+import sys, os, json, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.activity_log import ActivityJournal
+from utils.activity_index import timestamp_key
+
+
+def entry(i):
+    return {"timestamp": f"2025-01-01 00:00:{i:02d}", "user": "admin123", "action": f"action {i}", "details": None}
+
+
+def test_append_and_tail(tmp_path):
+    journal = ActivityJournal(tmp_path / "activity")
+    for i in range(10):
+        journal.append(entry(i))
+
+    assert [e["action"] for e in journal.tail(3)] == ["action 7", "action 8", "action 9"]
+    assert len(journal.tail(50)) == 10
+    assert journal.tail(0) == []
+    assert list(journal) == [entry(i) for i in range(10)]
+
+
+def test_segments_rotate_and_tail_spans_them(tmp_path):
+    journal = ActivityJournal(tmp_path / "activity", segment_max_bytes=200)
+    for i in range(20):
+        journal.append(entry(i))
+
+    assert len(journal.segments()) > 1
+    assert [e["action"] for e in journal.tail(12)] == [f"action {i}" for i in range(8, 20)]
+    assert list(journal) == [entry(i) for i in range(20)]
+
+
+def test_legacy_file_is_imported(tmp_path, monkeypatch):
+    legacy = tmp_path / "activity.json"
+    legacy.write_text(json.dumps({"logs": [entry(0), entry(1)]}), encoding="utf-8")
+
+    # The legacy log was written in the server's local time; the journal is UTC
+    monkeypatch.setenv("TZ", "UTC-02")
+    time.tzset()
+    try:
+        journal = ActivityJournal(tmp_path / "activity", legacy_path=legacy)
+        journal.append(entry(2))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    imported = [{**entry(i), "timestamp": f"2024-12-31 22:00:{i:02d}"} for i in range(2)]
+    assert list(journal) == [*imported, entry(2)]
+    assert not legacy.exists()
+
+
+def test_journals_of_two_workers_share_segments_and_queries(tmp_path):
+    first, second = (ActivityJournal(tmp_path / "activity", segment_max_bytes=300) for _ in range(2))
+    assert first.query(user="admin123")[0] == []  # index built before the other worker writes
+    for i in range(30):
+        (first if i % 3 else second).append(entry(i))
+
+    names = [path.name for path in first.segments()]
+    assert names == [path.name for path in second.segments()] and len(names) > 2
+    assert list(first) == [entry(i) for i in range(30)]
+    for journal in (first, second):
+        page, cursor = journal.query(user="admin123", limit=10)
+        assert [e["action"] for e in page] == [f"action {i}" for i in range(20, 30)]
+        assert journal.query(action="action 4")[0] == [entry(4)]
+
+def test_query_filters_and_paginates(tmp_path):
+    journal = ActivityJournal(tmp_path / "activity", segment_max_bytes=4096)
+    journal.append_many(
+        {"timestamp": f"2025-01-01 00:{i // 60:02d}:{i % 60:02d}", "user": f"user{i % 3}",
+         "action": "edited" if i % 2 else "viewed", "details": str(i)}
+        for i in range(600)
+    )
+
+    # Page through everything user1 edited, newest pages first
+    seen, cursor = [], None
+    while True:
+        page, cursor = journal.query(user="user1", action="edited", cursor=cursor, limit=40)
+        seen = page + seen
+        if cursor is None:
+            break
+    expected = [str(i) for i in range(600) if i % 3 == 1 and i % 2 == 1]
+    assert [e["details"] for e in seen] == expected
+
+    # Time range is inclusive on both ends
+    page, cursor = journal.query(start=timestamp_key("2025-01-01 00:01:00"),
+                                 end=timestamp_key("2025-01-01 00:01:04"), limit=100)
+    assert [e["details"] for e in page] == ["60", "61", "62", "63", "64"]
+    assert cursor is None
+
+    # Appends after the index is built are indexed too
+    journal.append({"timestamp": "2025-01-01 01:00:00", "user": "late", "action": "edited", "details": "x"})
+    page, _ = journal.query(user="late")
+    assert [e["details"] for e in page] == ["x"]
+    assert journal.query(user="nobody") == ([], None)
+
+
+def test_time_range_covers_entries_written_out_of_order(tmp_path):
+    journal = ActivityJournal(tmp_path / "activity")
+    # 10, 11, then an entry an hour earlier (clock change, or an inline write
+    # that overtook queued ones), then 12
+    for i, ts in enumerate(["2025-01-01 10:00:00", "2025-01-01 11:00:00",
+                            "2025-01-01 09:30:00", "2025-01-01 12:00:00"]):
+        journal.append({"timestamp": ts, "user": "u", "action": "a", "details": str(i)})
+
+    page, _ = journal.query(start=timestamp_key("2025-01-01 09:00:00"), end=timestamp_key("2025-01-01 10:00:00"))
+    assert [e["details"] for e in page] == ["0", "2"]
+    page, _ = journal.query(start=timestamp_key("2025-01-01 11:00:00"))
+    assert [e["details"] for e in page] == ["1", "3"]
+
+    # Later in-order entries are still found by bisecting, not by a scan past the late one
+    for i in range(600):
+        journal.append({"timestamp": f"2025-01-02 00:{i // 60:02d}:{i % 60:02d}", "user": "u", "action": "a",
+                        "details": f"n{i}"})
+    start, end = timestamp_key("2025-01-02 00:05:00"), timestamp_key("2025-01-02 00:05:04")
+    page, cursor = journal.query(start=start, end=end, limit=3)
+    assert [e["details"] for e in page] == ["n302", "n303", "n304"]
+    assert [e["details"] for e in journal.query(start=start, end=end, cursor=cursor)[0]] == ["n300", "n301"]
+    assert journal._index._time_range(start, end, len(journal._index))[0] == 5
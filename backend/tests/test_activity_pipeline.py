@@ -0,0 +1,78 @@
+import sys, os, asyncio
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.activity_log import ActivityJournal
+from utils.activity_pipeline import ActivityPipeline
+
+
+class RecordingJournal(ActivityJournal):
+    """Journal that remembers how many writes it was asked to do."""
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.calls = 0
+
+    def append_many(self, entries):
+        self.calls += 1
+        super().append_many(entries)
+
+
+def entry(i):
+    return {"timestamp": "2025-01-01 00:00:00", "user": "admin123", "action": f"action {i}", "details": None}
+
+
+def test_writes_inline_when_not_started(tmp_path):
+    journal = RecordingJournal(tmp_path / "activity")
+    pipeline = ActivityPipeline(journal)
+    pipeline.submit(entry(0))
+    assert journal.calls == 1
+    assert pipeline.stats()["written"] == 1
+
+
+def test_entries_are_batched_and_flushed_on_stop(tmp_path):
+    journal = RecordingJournal(tmp_path / "activity")
+    pipeline = ActivityPipeline(journal, batch_size=100)
+
+    async def run():
+        await pipeline.start()
+        for i in range(250):
+            pipeline.submit(entry(i))
+        await pipeline.stop()
+
+    asyncio.run(run())
+    assert [e["action"] for e in journal] == [f"action {i}" for i in range(250)]
+    assert journal.calls == 3
+    stats = pipeline.stats()
+    assert stats["queued"] == stats["written"] == 250
+    assert stats["dropped"] == 0 and stats["depth"] == 0
+
+
+def test_backpressure_policies(tmp_path):
+    # Only entries that reach the journal are announced, in journal order
+    published = []
+
+    async def run(policy):
+        journal = RecordingJournal(tmp_path / policy)
+        published.clear()
+        pipeline = ActivityPipeline(journal, maxsize=5, policy=policy,
+                                    on_written=lambda e: published.append(e["action"]))
+        await pipeline.start()
+        # No awaits in between, so the writer cannot drain the queue yet
+        for i in range(8):
+            pipeline.submit(entry(i))
+        await pipeline.stop()
+        return [e["action"] for e in journal], pipeline.stats()
+
+    logged, stats = asyncio.run(run("drop_new"))
+    assert published == logged
+    assert logged == [f"action {i}" for i in range(5)]
+    assert stats["dropped"] == 3
+
+    logged, stats = asyncio.run(run("drop_oldest"))
+    assert published == logged
+    assert logged == [f"action {i}" for i in range(3, 8)]
+    assert stats["dropped"] == 3
+
+    logged, stats = asyncio.run(run("inline"))
+    assert published == logged
+    assert sorted(logged) == [f"action {i}" for i in range(8)]
+    assert stats["dropped"] == 0
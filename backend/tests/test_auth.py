@@ -0,0 +1,145 @@
+import sys, os, asyncio
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from main import app
+from utils.auth import current_user, require_roles
+from utils.constants import USERS_PATH
+from utils.data_store import DataStore
+from utils.file_ops import _file_stamp, _read_file, _write_file, read_json, write_json
+from utils.passwords import hash_password, needs_rehash, verify_password
+from utils.pubsub import LocalBus
+from utils.tokens import InvalidToken, TokenSigner
+
+client = TestClient(app)
+
+
+def test_password_hashing():
+    stored = hash_password("s3cret", iterations=1000)
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert stored != hash_password("s3cret", iterations=1000)  # salted
+    assert verify_password("s3cret", stored)
+    assert not verify_password("S3cret", stored)
+    assert needs_rehash(stored)  # cost differs from PASSWORD_ITERATIONS
+    # Accounts from before hashing still log in, and are flagged for upgrade
+    assert verify_password("legacy", "legacy") and needs_rehash("legacy")
+
+
+def test_login_upgrades_plaintext_and_hides_hashes():
+    original = read_json(USERS_PATH)
+    try:
+        users = [u for u in original["users"] if u["username"] != "hash_user"]
+        write_json(USERS_PATH, {"users": [*users, {"id": 99, "username": "hash_user", "password": "pw1", "role": "Viewer"}]})
+
+        r = client.post("/api/users/login", json={"username": "hash_user", "password": "pw1"})
+        assert r.status_code == 200 and r.json()["data"]["role"] == "Viewer"
+
+        stored = next(u for u in read_json(USERS_PATH)["users"] if u["username"] == "hash_user")["password"]
+        assert stored.startswith("pbkdf2_sha256$") and not needs_rehash(stored)
+
+        assert client.post("/api/users/login", json={"username": "hash_user", "password": "pw1"}).status_code == 200
+        assert client.post("/api/users/login", json={"username": "hash_user", "password": "pw2"}).status_code == 401
+        assert client.post("/api/users/login", json={"username": "nobody", "password": "pw1"}).status_code == 401
+
+        assert all("password" not in u for u in client.get("/api/users/").json()["data"])
+    finally:
+        write_json(USERS_PATH, original)
+
+
+def test_startup_hashes_plaintext_passwords_of_every_account():
+    original = read_json(USERS_PATH)
+    try:
+        users = [u for u in original["users"] if u["username"] != "dormant_user"]
+        write_json(USERS_PATH, {"users": [*users, {"id": 98, "username": "dormant_user", "password": "pw3", "role": "Viewer"}]})
+
+        with TestClient(app):
+            pass
+
+        stored = {u["username"]: u["password"] for u in read_json(USERS_PATH)["users"]}
+        assert all(p.startswith("pbkdf2_sha256$") for p in stored.values())
+        assert verify_password("pw3", stored["dormant_user"])
+    finally:
+        write_json(USERS_PATH, original)
+
+
+def test_tokens_reject_tampering_expiry_and_revocation(tmp_path):
+    signer = TokenSigner(b"k" * 32, ttl=60, revoked_path=tmp_path / "revoked.json")
+    token, claims = signer.issue("alice", "Editor")
+    assert signer.verify(token) == claims
+
+    payload, _, signature = token.partition(".")
+    forged, _ = signer.issue("alice", "Admin")
+    for bad in (f"{forged.partition('.')[0]}.{signature}", payload, "", "x.y"):
+        with pytest.raises(InvalidToken):
+            signer.verify(bad)
+    with pytest.raises(InvalidToken):
+        TokenSigner(b"other" * 8).verify(token)
+
+    expired, _ = TokenSigner(b"k" * 32, ttl=-1).issue("alice", "Editor")
+    with pytest.raises(InvalidToken, match="expired"):
+        signer.verify(expired)
+
+    signer.revoke(claims)
+    # A fresh signer (another worker, or after a restart) sees the revocation too
+    for s in (signer, TokenSigner(b"k" * 32, ttl=60, revoked_path=tmp_path / "revoked.json")):
+        with pytest.raises(InvalidToken, match="revoked"):
+            s.verify(token)
+
+
+class LinkedBus(LocalBus):
+    """Stands in for the broker: delivers what one bus publishes to the others."""
+    distributed = True
+
+    def __init__(self, peers):
+        super().__init__()
+        self.peers = peers
+        peers.append(self)
+
+    async def publish(self, channel, message):
+        for peer in self.peers:
+            if peer is not self:
+                peer._deliver(channel, message)
+
+
+def test_revocations_reach_the_other_workers(tmp_path):
+    path = tmp_path / "revoked.json"
+    # Two processes: separate signers, each with its own resident store
+    buses = []
+    first, second = (
+        TokenSigner(b"k" * 32, ttl=60, revoked_path=path, bus=LinkedBus(buses),
+                    store=DataStore(_read_file, _write_file, flush_interval=0, stamp=_file_stamp))
+        for _ in range(2)
+    )
+    token, claims = first.issue("alice", "Editor")
+    assert first.verify(token) == second.verify(token) == claims
+
+    asyncio.run(first.arevoke(claims))
+    with pytest.raises(InvalidToken, match="revoked"):
+        second.verify(token)
+
+    other, other_claims = second.issue("bob", "Viewer")
+    asyncio.run(second.arevoke(other_claims))
+    # Neither write dropped the other's entry, and a restarted worker sees both
+    third = TokenSigner(b"k" * 32, ttl=60, revoked_path=path, bus=LocalBus(),
+                        store=DataStore(_read_file, _write_file, flush_interval=0, stamp=_file_stamp))
+    for signer in (first, second, third):
+        for revoked in (token, other):
+            with pytest.raises(InvalidToken, match="revoked"):
+                signer.verify(revoked)
+
+
+def test_role_dependencies():
+    token = client.post("/api/users/login", json={"username": "viewer123", "password": "viewer123"}).json()["data"]["token"]
+    for header in (None, "Basic abc", "Bearer x.y"):
+        with pytest.raises(HTTPException) as e:
+            current_user(header)
+        assert e.value.status_code == 401
+
+    viewer = current_user(f"Bearer {token}")
+    assert viewer.username == "viewer123"
+    assert require_roles("Viewer")(viewer) == viewer
+    with pytest.raises(HTTPException) as e:
+        require_roles("Admin", "Editor")(viewer)
+    assert e.value.status_code == 403
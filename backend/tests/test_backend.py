@@ -1,18 +1,21 @@
 import sys, os, json, copy
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+import pytest
 from fastapi.testclient import TestClient
 from main import app
+from utils.activity_log import journal
+from utils.constants import DATA_DIR, SQLITE_PATH, STORAGE_ENGINE
 from utils.file_ops import read_json, write_json
 
 client = TestClient(app)
 
 # ---------- Paths ----------
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+# Also run against STORAGE_ENGINE=sqlite by test_sqlite_storage.py
 USERS_PATH = os.path.join(DATA_DIR, "users.json")
 TASKS_PATH = os.path.join(DATA_DIR, "tasks.json")
 DOC_PATH = os.path.join(DATA_DIR, "document.json")
-ACT_PATH = os.path.join(DATA_DIR, "activity.json")
+ACT_DIR = os.path.join(DATA_DIR, "activity")
 
 
 def load_json(path):
@@ -20,6 +23,16 @@ def load_json(path):
         return json.load(f)
 
 
+_tokens = {}
+
+def auth(username):
+    """Authorization header for a seeded user (password == username); logs in once."""
+    if username not in _tokens:
+        r = client.post("/api/users/login", json={"username": username, "password": username})
+        _tokens[username] = r.json()["data"]["token"]
+    return {"Authorization": f"Bearer {_tokens[username]}"}
+
+
 # ---------- Root ----------
 def test_root_200():
     r = client.get("/")
@@ -36,12 +49,11 @@ def test_get_users_list():
 
 def test_create_user_success_admin():
     payload = {
-        "creator": "admin123",
         "username": "pytest_user",
         "password": "pytest123",
         "role": "Viewer"
     }
-    r = client.post("/api/users/", json=payload)
+    r = client.post("/api/users/", json=payload, headers=auth("admin123"))
     assert r.status_code == 200
     data = r.json()["data"]
     assert data["username"] == "pytest_user"
@@ -52,39 +64,73 @@ def test_create_user_success_admin():
     write_json(USERS_PATH, users)
 
 
+def test_users_list_is_cached_until_a_user_is_created():
+    r = client.get("/api/users/")
+    etag = r.headers["etag"]
+    assert "last-modified" in r.headers
+    assert client.get("/api/users/", headers={"If-None-Match": etag}).status_code == 304
+
+    username = f"cache_user_{os.getpid()}"
+    payload = {"username": username, "password": "pw", "role": "Viewer"}
+    try:
+        assert client.post("/api/users/", json=payload, headers=auth("admin123")).status_code == 200
+        r = client.get("/api/users/", headers={"If-None-Match": etag})
+        assert r.status_code == 200 and r.headers["etag"] != etag
+        assert username in [u["username"] for u in r.json()["data"]]
+    finally:
+        # cleanup so every run does not add another user
+        users = read_json(USERS_PATH)
+        users["users"] = [u for u in users["users"] if u["username"] != username]
+        write_json(USERS_PATH, users)
+
+
 def test_create_user_fail_non_admin():
     payload = {
-        "creator": "viewer123",
         "username": "illegal_user",
         "password": "nope",
         "role": "Viewer"
     }
-    r = client.post("/api/users/", json=payload)
+    r = client.post("/api/users/", json=payload, headers=auth("viewer123"))
     assert r.status_code == 403
 
+    r = client.post("/api/users/", json=payload)
+    assert r.status_code == 401
+
 
 def test_login_success_and_fail():
     # success case
     r = client.post("/api/users/login", json={"username": "admin123", "password": "admin123"})
     assert r.status_code == 200
     assert r.json()["data"]["role"] == "Admin"
+    assert r.json()["data"]["token"]
 
     # invalid password
     r = client.post("/api/users/login", json={"username": "admin123", "password": "wrong"})
     assert r.status_code == 401
 
 
-def test_logout_success():
-    payload = {"username": "admin123"}
-    r = client.post("/api/users/logout", json=payload)
+def test_me_and_logout_success():
+    r = client.post("/api/users/login", json={"username": "admin123", "password": "admin123"})
+    headers = {"Authorization": f"Bearer {r.json()['data']['token']}"}
+
+    r = client.get("/api/users/me", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["data"] == {"username": "admin123", "role": "Admin"}
+
+    r = client.post("/api/users/logout", headers=headers)
     assert r.status_code == 200
     assert "logged out" in r.text
 
+    # The token is revoked
+    assert client.get("/api/users/me", headers=headers).status_code == 401
 
-def test_logout_fail_missing_user():
-    payload = {"username": "ghost_user"}
-    r = client.post("/api/users/logout", json=payload)
-    assert r.status_code == 404
+
+def test_logout_fail_missing_token():
+    r = client.post("/api/users/logout")
+    assert r.status_code == 401
+
+    r = client.post("/api/users/logout", headers={"Authorization": "Bearer not-a-token"})
+    assert r.status_code == 401
 
 
 # ---------- Document ----------
@@ -102,7 +148,7 @@ def test_document_update_success_admin():
         "lastEditedBy": "admin123",
         "lastUpdated": ""
     }
-    r = client.put("/api/document/", json=payload)
+    r = client.put("/api/document/", json=payload, headers=auth("admin123"))
     assert r.status_code == 200
     assert "updated" in r.text
 
@@ -114,7 +160,7 @@ def test_document_update_success_editor():
         "lastEditedBy": "editor123",
         "lastUpdated": ""
     }
-    r = client.put("/api/document/", json=payload)
+    r = client.put("/api/document/", json=payload, headers=auth("editor123"))
     assert r.status_code == 200
     assert "updated" in r.text
 
@@ -126,13 +172,13 @@ def test_document_update_fail_viewer():
         "lastEditedBy": "viewer123",
         "lastUpdated": ""
     }
-    r = client.put("/api/document/", json=payload)
+    r = client.put("/api/document/", json=payload, headers=auth("viewer123"))
     assert r.status_code == 403
 
 
 def test_document_update_missing_field():
     payload = {"title": "Doc Missing Fields"}
-    r = client.put("/api/document/", json=payload)
+    r = client.put("/api/document/", json=payload, headers=auth("editor123"))
     assert r.status_code == 422
 
 
@@ -143,12 +189,56 @@ def test_document_auto_timestamp_on_empty():
         "lastEditedBy": "editor123",
         "lastUpdated": ""
     }
-    r = client.put("/api/document/", json=payload)
+    r = client.put("/api/document/", json=payload, headers=auth("editor123"))
     assert r.status_code == 200
     data = r.json()["data"]
     assert data["lastUpdated"] != ""
 
 
+def test_document_revisions_and_diff():
+    headers = auth("editor123")
+    payload = {"title": "History Doc", "content": "one", "lastEditedBy": "", "lastUpdated": ""}
+    client.put("/api/document/", json=payload, headers=headers)
+    client.put("/api/document/", json={**payload, "content": "one two"}, headers=headers)
+
+    r = client.get("/api/document/revisions", params={"limit": 2})
+    assert r.status_code == 200
+    newest, previous = r.json()["data"]
+    assert newest["revision"] == previous["revision"] + 1
+    assert newest["lastEditedBy"] == "editor123" and newest["title"] == "History Doc"
+
+    r = client.get(f"/api/document/revisions/{previous['revision']}")
+    assert r.status_code == 200 and r.json()["data"]["content"] == "one"
+
+    r = client.get("/api/document/diff", params={"from": previous["revision"], "to": newest["revision"]})
+    assert r.json()["data"]["ops"] == [{"type": "insert", "pos": 3, "text": " two"}]
+
+    assert client.get(f"/api/document/revisions/{newest['revision'] + 1}").status_code == 404
+    assert client.get("/api/document/missing-doc/revisions").status_code == 404
+
+
+def test_document_update_if_match():
+    headers = auth("editor123")
+    r = client.get("/api/document/")
+    etag = r.headers["etag"]
+    payload = {"title": "Testing Doc", "content": "first writer", "lastEditedBy": "", "lastUpdated": ""}
+
+    r = client.put("/api/document/", json=payload, headers={**headers, "If-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    # The second writer saw the old revision: refused, with the current ETag
+    r = client.put("/api/document/", json={**payload, "content": "second writer"}, headers={**headers, "If-Match": etag})
+    assert r.status_code == 412
+    current = r.headers["etag"]
+    assert client.get("/api/document/").json()["data"]["content"] == "first writer"
+
+    # Unchanged since the 412: served from cache, 304 for the current ETag
+    assert client.get("/api/document/", headers={"If-None-Match": current}).status_code == 304
+
+    for bad in ('"task-1-1"', 'W/"document-main-1"'):
+        assert client.put("/api/document/", json=payload, headers={**headers, "If-Match": bad}).status_code == 412
+    assert client.put("/api/document/", json=payload, headers={**headers, "If-Match": current}).status_code == 200
+
+
 # ---------- Tasks ----------
 def test_get_tasks_list():
     r = client.get("/api/tasks/")
@@ -160,29 +250,122 @@ def test_get_tasks_list():
 def test_task_crud_cycle():
     # Create
     payload = {"title": "Test Task", "assignedTo": "editor123", "status": "Pending"}
-    r = client.post("/api/tasks/", json=payload)
+    r = client.post("/api/tasks/", json=payload, headers=auth("editor123"))
     assert r.status_code == 200
     new_task = r.json()["data"]
     task_id = new_task["id"]
 
     # Update
     payload["status"] = "Done"
-    r = client.put(f"/api/tasks/{task_id}", json=payload)
+    r = client.put(f"/api/tasks/{task_id}", json=payload, headers=auth("editor123"))
     assert r.status_code == 200
     updated = r.json()["data"]
     assert updated["status"] == "Done"
 
     # Delete
-    r = client.delete(f"/api/tasks/{task_id}")
+    r = client.delete(f"/api/tasks/{task_id}", headers=auth("editor123"))
     assert r.status_code == 200
     assert "deleted" in r.json()["data"].lower()
 
 
+def test_task_update_and_delete_if_match():
+    headers = auth("editor123")
+    payload = {"title": "Match Task", "assignedTo": "editor123", "status": "Pending"}
+    task_id = client.post("/api/tasks/", json=payload, headers=headers).json()["data"]["id"]
+    r = client.get(f"/api/tasks/{task_id}")
+    etag = r.headers["etag"]
+    assert etag == f'"task-{task_id}-{r.json()["data"]["revision"]}"'
+
+    r = client.put(f"/api/tasks/{task_id}", json={**payload, "status": "Done"}, headers={**headers, "If-Match": etag})
+    assert r.status_code == 200
+    r = client.put(f"/api/tasks/{task_id}", json=payload, headers={**headers, "If-Match": etag})
+    assert r.status_code == 412 and r.headers["etag"] != etag
+    assert client.get(f"/api/tasks/{task_id}").json()["data"]["status"] == "Done"
+    assert client.delete(f"/api/tasks/{task_id}", headers={**headers, "If-Match": etag}).status_code == 412
+
+    r = client.post("/api/tasks/batch", json={"operations": [
+        {"op": "delete", "id": task_id, "revision": 0},
+    ]}, headers=headers)
+    assert r.status_code == 412 and r.json()["detail"][0]["id"] == task_id
+    current = client.get(f"/api/tasks/{task_id}").headers["etag"]
+    assert client.delete(f"/api/tasks/{task_id}", headers={**headers, "If-Match": current}).status_code == 200
+    assert client.get(f"/api/tasks/{task_id}").status_code == 404
+
+
+def test_task_list_filters_pages_and_etag():
+    headers = auth("editor123")
+    created = [
+        client.post("/api/tasks/", json={"title": f"page-{i}", "assignedTo": "pager", "status": "Pending"},
+                    headers=headers).json()["data"]["id"]
+        for i in range(3)
+    ]
+
+    r = client.get("/api/tasks/?assignedTo=pager&status=Pending&limit=2&sort=-id")
+    assert r.status_code == 200
+    body = r.json()
+    assert [t["id"] for t in body["data"]] == created[::-1][:2]
+    r = client.get(f"/api/tasks/?assignedTo=pager&status=Pending&limit=2&sort=-id&cursor={body['nextCursor']}")
+    assert [t["id"] for t in r.json()["data"]] == created[:1]
+    assert r.json()["nextCursor"] is None
+
+    etag = r.headers["etag"]
+    r = client.get("/api/tasks/?assignedTo=pager&status=Pending&limit=2&sort=-id",
+                   headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    for task_id in created:
+        client.delete(f"/api/tasks/{task_id}", headers=headers)
+    r = client.get("/api/tasks/?assignedTo=pager", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json()["data"] == []
+
+    assert client.get("/api/tasks/?sort=priority").status_code == 422
+    assert client.get("/api/tasks/?status=Later").status_code == 422
+    assert client.get("/api/tasks/?cursor=bogus").status_code == 400
+
+
+def test_task_batch():
+    headers = auth("editor123")
+    ops = [
+        {"op": "create", "task": {"title": "batch-1", "assignedTo": "editor123", "status": "Pending"}},
+        {"op": "create", "task": {"title": "batch-2", "assignedTo": "editor123", "status": "Pending"}},
+    ]
+    r = client.post("/api/tasks/batch", json={"operations": ops}, headers=headers)
+    assert r.status_code == 200
+    first, second = [item["id"] for item in r.json()["data"]]
+
+    r = client.post("/api/tasks/batch", json={"operations": [
+        {"op": "update", "id": first, "task": {"title": "batch-1", "assignedTo": "editor123", "status": "Done"}},
+        {"op": "delete", "id": second},
+    ]}, headers=headers)
+    assert r.status_code == 200
+    assert [(i["op"], i["task"]["status"]) for i in r.json()["data"]] == [("update", "Done"), ("delete", "Pending")]
+
+    # A missing task fails the whole batch
+    r = client.post("/api/tasks/batch", json={"operations": [
+        {"op": "delete", "id": first},
+        {"op": "delete", "id": second},
+    ]}, headers=headers)
+    assert r.status_code == 404
+    assert r.json()["detail"] == [{"index": 1, "id": second, "error": "Task not found"}]
+    assert any(t["id"] == first for t in client.get("/api/tasks/").json()["data"])
+
+    # Every item is validated before anything runs
+    r = client.post("/api/tasks/batch", json={"operations": [
+        {"op": "delete", "id": first},
+        {"op": "update", "id": first, "task": {"title": "x", "assignedTo": "y", "status": "Later"}},
+        {"op": "delete"},
+    ]}, headers=headers)
+    assert r.status_code == 422
+    assert client.post("/api/tasks/batch", json={"operations": ops}, headers=auth("viewer123")).status_code == 403
+
+    client.delete(f"/api/tasks/{first}", headers=headers)
+
+
 # ---------- Tasks: Extended ----------
 def test_task_create_admin_editor_success():
     for user in ["admin123", "editor123"]:
         payload = {"title": f"{user}-task", "assignedTo": user, "status": "Pending"}
-        r = client.post("/api/tasks/", json=payload)
+        r = client.post("/api/tasks/", json=payload, headers=auth(user))
         assert r.status_code == 200
         data = r.json()["data"]
         assert data["title"] == f"{user}-task"
@@ -191,40 +374,37 @@ def test_task_create_admin_editor_success():
 
 def test_task_create_viewer_forbidden():
     payload = {"title": "viewer-task", "assignedTo": "viewer123", "status": "Pending"}
-    r = client.post("/api/tasks/", json=payload)
+    r = client.post("/api/tasks/", json=payload, headers=auth("viewer123"))
     assert r.status_code == 403
 
 
 def test_task_update_role_restriction():
     create = {"title": "rolecheck", "assignedTo": "editor123", "status": "Pending"}
-    r = client.post("/api/tasks/", json=create)
+    r = client.post("/api/tasks/", json=create, headers=auth("editor123"))
     assert r.status_code == 200
     task_id = r.json()["data"]["id"]
 
     update = {"id": task_id, "title": "rolecheck", "assignedTo": "viewer123", "status": "Done"}
-    r = client.put(f"/api/tasks/{task_id}", json=update)
+    r = client.put(f"/api/tasks/{task_id}", json=update, headers=auth("viewer123"))
     assert r.status_code == 403
 
 
 def test_task_delete_role_restriction():
     create = {"title": "deletecheck", "assignedTo": "editor123", "status": "Pending"}
-    r = client.post("/api/tasks/", json=create)
+    r = client.post("/api/tasks/", json=create, headers=auth("editor123"))
     assert r.status_code == 200
     task_id = r.json()["data"]["id"]
 
-    data = read_json(TASKS_PATH)
-    for t in data["tasks"]:
-        if t["id"] == task_id:
-            t["assignedTo"] = "viewer123"
-    write_json(TASKS_PATH, data)
+    r = client.delete(f"/api/tasks/{task_id}", headers=auth("viewer123"))
+    assert r.status_code == 403
 
     r = client.delete(f"/api/tasks/{task_id}")
-    assert r.status_code == 403
+    assert r.status_code == 401
 
 
 def test_task_invalid_payload_rejected():
     payload = {"assignedTo": "editor123"}
-    r = client.post("/api/tasks/", json=payload)
+    r = client.post("/api/tasks/", json=payload, headers=auth("editor123"))
     assert r.status_code == 422
 
 
@@ -237,16 +417,53 @@ def test_activity_limit_query():
     assert len(data) <= 2
 
 
+def test_activity_filter_and_cursor():
+    for _ in range(3):
+        client.post("/api/activity/", json={"action": "filter test"}, headers=auth("editor123"))
+
+    r = client.get("/api/activity/?user=editor123&action=filter%20test&limit=2")
+    assert r.status_code == 200
+    body = r.json()
+    assert len(body["data"]) == 2
+    assert all(log["action"] == "filter test" for log in body["data"])
+    assert body["nextCursor"] is not None
+
+    r = client.get(f"/api/activity/?user=editor123&action=filter%20test&limit=2&cursor={body['nextCursor']}")
+    assert r.status_code == 200
+    assert len(r.json()["data"]) >= 1
+
+    r = client.get("/api/activity/?from=yesterday")
+    assert r.status_code == 400
+
+
 def test_create_activity_log():
-    payload = {"user": "admin123", "action": "manual test", "details": "testing"}
-    r = client.post("/api/activity/", json=payload)
+    payload = {"action": "manual test", "details": "testing"}
+    assert client.post("/api/activity/", json=payload).status_code == 401
+    # A "user" in the body cannot override the token holder
+    r = client.post("/api/activity/", json={**payload, "user": "admin123"}, headers=auth("viewer123"))
     assert r.status_code == 200
-    assert r.json()["data"]["action"] == "manual test"
+    assert r.json()["data"] == {"user": "viewer123", "action": "manual test"}
 
 
 # ---------- Integration Smoke ----------
+@pytest.mark.skipif(STORAGE_ENGINE != "json", reason="JSON engine only")
 def test_json_files_exist_and_valid():
-    for path in [USERS_PATH, TASKS_PATH, DOC_PATH, ACT_PATH]:
+    for path in [USERS_PATH, TASKS_PATH, DOC_PATH]:
         assert os.path.exists(path)
         data = load_json(path)
         assert isinstance(data, dict)
+
+    segments = sorted(os.listdir(ACT_DIR))
+    assert segments
+    with open(os.path.join(ACT_DIR, segments[-1]), "r", encoding="utf-8") as f:
+        for line in f:
+            assert isinstance(json.loads(line), dict)
+
+
+@pytest.mark.skipif(STORAGE_ENGINE != "sqlite", reason="SQLite engine only")
+def test_sqlite_database_exists_and_valid():
+    assert os.path.exists(SQLITE_PATH)
+    assert read_json(USERS_PATH)["users"]
+    assert "document" in read_json(DOC_PATH)
+    assert client.get("/api/tasks/").json()["data"]
+    assert all(isinstance(log, dict) for log in journal.tail(10))
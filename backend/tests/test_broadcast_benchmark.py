@@ -0,0 +1,79 @@
+import sys, os, asyncio, json, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from utils import connection_manager
+from utils.connection_manager import ConnectionManager
+
+# Roughly a full-document update: ~20KB of text plus metadata
+PAYLOAD = {
+    "type": "init",
+    "data": {
+        "document": {"title": "Team Collaboration Workspace", "content": "lorem ipsum " * 1700},
+        "revision": 42,
+        "users": [{"user": f"user{i}", "cursor": i} for i in range(20)],
+    },
+}
+ROUNDS = 5
+
+
+class CountingWebSocket:
+    """Simulated connection that accepts frames instantly."""
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, text):
+        self.frames += 1
+
+    async def send_json(self, data):
+        # What Starlette's send_json does: encode per call, then send text
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+async def per_recipient_broadcast(sockets, message):
+    """Previous behavior: every recipient encodes the payload itself."""
+    for ws in sockets:
+        await ws.send_json(message)
+
+
+async def time_broadcasts(connections, monkeypatch):
+    encodes = {"count": 0}
+    original = connection_manager.encode_message
+
+    def counting_encode(message):
+        encodes["count"] += 1
+        return original(message)
+
+    monkeypatch.setattr(connection_manager, "encode_message", counting_encode)
+
+    manager = ConnectionManager(queue_size=ROUNDS + 1)
+    sockets = [CountingWebSocket() for _ in range(connections)]
+    for i, ws in enumerate(sockets):
+        manager.register(ws, f"user{i}")
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await manager.broadcast(PAYLOAD)
+    await manager.drain()
+    encode_once = (time.perf_counter() - started) / ROUNDS
+
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await per_recipient_broadcast(sockets, PAYLOAD)
+    per_recipient = (time.perf_counter() - started) / ROUNDS
+
+    assert encodes["count"] == ROUNDS
+    assert all(ws.frames == 2 * ROUNDS for ws in sockets)
+    return encode_once, per_recipient
+
+
+@pytest.mark.parametrize("connections", [10, 100, 1000])
+def test_broadcast_encodes_once(connections, monkeypatch):
+    """
+    Time one ~20KB broadcast to N simulated connections, encoding once
+    vs. encoding per recipient. Run with `pytest -s` to see the numbers;
+    only the encode and frame counts are asserted, timings are too noisy.
+    """
+    encode_once, per_recipient = asyncio.run(time_broadcasts(connections, monkeypatch))
+    print(f"\n[{connections:>4} conns] encode once {encode_once * 1000:8.2f}ms  "
+          f"per recipient {per_recipient * 1000:8.2f}ms  ({per_recipient / encode_once:5.1f}x)")
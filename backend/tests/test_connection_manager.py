@@ -1,9 +1,10 @@
 import asyncio
+import json
 from fastapi import WebSocket
 from utils.connection_manager import ConnectionManager
 
 class DummyWebSocket:
-    """Mock WebSocket object with send_json recorder."""
+    """Mock WebSocket object with send_json/send_text recorder."""
     def __init__(self):
         self.sent = []
 
@@ -13,29 +14,133 @@ class DummyWebSocket:
     async def send_json(self, data):
         self.sent.append(data)
 
+    async def send_text(self, text):
+        await self.send_json(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+class StalledWebSocket(DummyWebSocket):
+    """WebSocket whose sends never complete until released."""
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def send_json(self, data):
+        await self.release.wait()
+        self.sent.append(data)
+
 
 def test_connect_and_disconnect():
+    async def run():
+        manager = ConnectionManager()
+        ws1, ws2 = DummyWebSocket(), DummyWebSocket()
+
+        # Connect
+        await manager.connect(ws1)
+        await manager.connect(ws2)
+        manager.register(ws1, "admin123")
+        manager.register(ws2, "editor123")
+
+        # Update cursor
+        manager.update_cursor(ws1, 5)
+        assert manager.active_connections[0].cursor == 5
+        assert manager.get(ws1).cursor == 5
+
+        # Broadcast test
+        msg = {"type": "ping"}
+        await manager.broadcast(msg, sender=ws1)
+        await manager.drain()
+        assert ws2.sent and ws2.sent[0] == msg
+        assert ws1.sent == []  # sender excluded
+
+        # Disconnect test
+        manager.disconnect(ws1)
+        assert len(manager.active_connections) == 1
+        assert manager.connections_for("admin123") == []
+        manager.disconnect(ws1)  # already gone: no-op
+        assert len(manager) == 1
+
+    asyncio.run(run())
+
+
+def test_stalled_client_does_not_delay_others():
+    async def run():
+        manager = ConnectionManager(queue_size=4, policy="drop")
+        slow, fast = StalledWebSocket(), DummyWebSocket()
+        manager.register(slow, "slow")
+        manager.register(fast, "fast")
+
+        for i in range(10):
+            await manager.broadcast({"type": "op", "data": i})
+            await asyncio.sleep(0)  # let writers run, as between real events
+        await asyncio.wait_for(manager.get(fast).outbox.drain(), timeout=1)
+        assert [m["data"] for m in fast.sent] == list(range(10))
+
+        # The stalled client holds one message in flight plus a full queue; the rest were dropped
+        stats = {s["user"]: s for s in manager.stats()}
+        assert stats["slow"]["depth"] == 4 and stats["slow"]["dropped"] == 5
+        assert stats["fast"]["sent"] == 10 and stats["fast"]["dropped"] == 0
+
+        slow.release.set()
+        await manager.drain()
+        assert [m["data"] for m in slow.sent] == [0, 1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_slow_consumer_coalesce_and_disconnect():
+    async def run():
+        manager = ConnectionManager(queue_size=2, policy="coalesce")
+        slow = StalledWebSocket()
+        manager.register(slow, "slow")
+
+        await manager.broadcast({"type": "op", "data": 0})
+        await asyncio.sleep(0)  # writer picks up the first message and stalls
+        for i in range(5):
+            await manager.broadcast({"type": "presence", "data": i})
+        slow.release.set()
+        await manager.drain()
+        assert slow.sent == [{"type": "op", "data": 0}, {"type": "presence", "data": 4}]
+
+        # Cursor diffs are merged, not dropped: every connection keeps its latest cursor
+        manager = ConnectionManager(queue_size=2, policy="coalesce")
+        slow = StalledWebSocket()
+        manager.register(slow, "slow")
+        await manager.broadcast({"type": "op", "data": 0})
+        await asyncio.sleep(0)
+        moves = [("a", 1), ("b", 5), ("a", 2), ("c", 7), ("b", 6)]
+        for conn_id, cursor in moves:
+            await manager.broadcast({"type": "presence_diff", "data": [{"id": conn_id, "user": conn_id, "cursor": cursor}]})
+        slow.release.set()
+        await manager.drain()
+        assert slow.sent[-1] == {"type": "presence_diff", "data": [
+            {"id": "a", "user": "a", "cursor": 2},
+            {"id": "b", "user": "b", "cursor": 6},
+            {"id": "c", "user": "c", "cursor": 7},
+        ]}
+
+        manager = ConnectionManager(queue_size=1, policy="disconnect")
+        stuck = StalledWebSocket()
+        manager.register(stuck, "stuck")
+        for i in range(3):
+            await manager.broadcast({"type": "op", "data": i})
+        await asyncio.sleep(0)
+        assert manager.active_connections == []
+        assert stuck.closed == 1013
+
+    asyncio.run(run())
+
+
+def test_user_index_tracks_multiple_tabs():
     manager = ConnectionManager()
-    ws1, ws2 = DummyWebSocket(), DummyWebSocket()
-
-    # Connect
-    asyncio.run(manager.connect(ws1))
-    asyncio.run(manager.connect(ws2))
-    manager.active_connections = [
-        {"ws": ws1, "user": "admin123", "cursor": None},
-        {"ws": ws2, "user": "editor123", "cursor": None},
-    ]
-
-    # Update cursor
-    manager.update_cursor(ws1, 5)
-    assert manager.active_connections[0]["cursor"] == 5
-
-    # Broadcast test
-    msg = {"type": "ping"}
-    asyncio.run(manager.broadcast(msg, sender=ws1))
-    assert ws2.sent and ws2.sent[0] == msg
-    assert ws1.sent == []  # sender excluded
-
-    # Disconnect test
-    manager.disconnect(ws1)
-    assert len(manager.active_connections) == 1
+    tabs = [DummyWebSocket() for _ in range(3)]
+    for ws in tabs:
+        manager.register(ws, "editor123")
+    manager.register(DummyWebSocket(), "admin123")
+
+    assert [c.ws for c in manager.connections_for("editor123")] == tabs
+    manager.disconnect(tabs[1])
+    assert [c.ws for c in manager.connections_for("editor123")] == [tabs[0], tabs[2]]
+    assert [p["user"] for p in manager.get_presence()] == ["editor123", "editor123", "admin123"]
@@ -0,0 +1,125 @@
+import sys, os, json, threading
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.data_store import DataStore
+from utils.file_ops import _file_stamp, _read_file, _write_file
+
+
+def make_store(tmp_path, interval=0.5):
+    path = tmp_path / "items.json"
+    _write_file(path, {"items": [1]})
+    return DataStore(_read_file, _write_file, flush_interval=interval), path
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_reads_are_served_from_memory(tmp_path):
+    store, path = make_store(tmp_path)
+    assert store.get(path) == {"items": [1]}
+
+    # Changing the file behind the store's back is not observed
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"items": []}, f)
+    assert store.get(path) == {"items": [1]}
+
+
+def test_write_through_without_flusher(tmp_path):
+    store, path = make_store(tmp_path)
+    store.put(path, {"items": [1, 2]})
+    assert load_json(path) == {"items": [1, 2]}
+    assert store.version(path) == 1
+
+
+def test_flusher_batches_writes(tmp_path):
+    store, path = make_store(tmp_path, interval=60)
+    store.start()
+    try:
+        for i in range(5):
+            store.put(path, {"items": list(range(i))})
+
+        # Nothing persisted until the flush interval elapses
+        assert load_json(path) == {"items": [1]}
+        assert store.get(path) == {"items": [0, 1, 2, 3]}
+    finally:
+        store.stop()
+
+    assert load_json(path) == {"items": [0, 1, 2, 3]}
+    assert store.version(path) == 5
+    assert not (tmp_path / "items.json.tmp").exists()
+
+
+def test_failed_write_keeps_file_dirty_without_dropping_others(tmp_path):
+    failing = tmp_path / "failing.json"
+    written = []
+
+    def writer(path, data):
+        if path == failing.resolve() and not written:
+            written.append("failed")
+            raise OSError("disk full")
+        _write_file(path, data)
+
+    store = DataStore(_read_file, writer, flush_interval=60)
+    store.start()
+    try:
+        store.put(failing, {"n": 1})
+        store.put(tmp_path / "other.json", {"n": 2})
+        try:
+            store.flush()
+        except OSError:
+            pass
+        assert load_json(tmp_path / "other.json") == {"n": 2}
+        assert store.exists(failing) and not failing.exists()
+
+        # Retried by the next flush
+        store.flush()
+        assert load_json(failing) == {"n": 1}
+    finally:
+        store.stop()
+
+
+def test_evict_keeps_a_put_that_lands_after_the_write(tmp_path):
+    store, path = make_store(tmp_path, interval=60)
+    store.start()
+
+    def writer(key, data):
+        _write_file(key, data)
+        if data == {"items": [2]}:
+            store.put(path, {"items": [3]})
+
+    store._writer = writer
+    try:
+        store.put(path, {"items": [2]})
+        store.evict(path)
+        assert store.get(path) == {"items": [3]}
+        store.flush()
+    finally:
+        store.stop()
+    assert load_json(path) == {"items": [3]}
+
+
+def test_updates_from_two_stores_do_not_lose_each_other(tmp_path):
+    # Two processes' stores on one file, each running its flusher
+    path = tmp_path / "items.json"
+    _write_file(path, {"items": []})
+    stores = [DataStore(_read_file, _write_file, flush_interval=60, stamp=_file_stamp) for _ in range(2)]
+    for store in stores:
+        store.get(path)
+        store.start()
+
+    def add(store, first):
+        for item in range(first, first + 20):
+            store.update(path, lambda data, item=item: {"items": data["items"] + [item]})
+
+    try:
+        threads = [threading.Thread(target=add, args=(store, n * 100)) for n, store in enumerate(stores)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        for store in stores:
+            store.stop()
+    assert sorted(load_json(path)["items"]) == list(range(20)) + list(range(100, 120))
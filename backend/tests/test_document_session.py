@@ -0,0 +1,88 @@
+import sys, os, json, asyncio
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.document_session import DocumentSession
+from utils.file_ops import _write_file
+from utils.wal import WriteAheadLog
+
+
+def make_session(tmp_path, **kwargs):
+    _write_file(tmp_path / "document.json", {"document": {"title": "Doc", "content": "hello"}})
+    return DocumentSession(tmp_path / "document.json", tmp_path / "document.wal", **kwargs)
+
+
+def insert(pos, text):
+    return [{"type": "insert", "pos": pos, "text": text}]
+
+
+def test_edits_are_logged_and_recovered_from_wal(tmp_path):
+    async def edit():
+        session = make_session(tmp_path, snapshot_idle=60)
+        await session.load()
+        for i, text in enumerate([" big", " wide", " world"]):
+            revision, ops = session.apply(i, insert(len(session.document["content"]), text), "editor123")
+            await session.record(revision, ops)
+        # Simulated crash: no snapshot was taken, only the WAL exists
+        return session.document["content"]
+
+    content = asyncio.run(edit())
+    assert content == "hello big wide world"
+    with open(tmp_path / "document.json", encoding="utf-8") as f:
+        assert json.load(f)["document"]["content"] == "hello"
+    assert len((tmp_path / "document.wal").read_text().splitlines()) == 3
+
+    async def recover():
+        session = DocumentSession(tmp_path / "document.json", tmp_path / "document.wal")
+        await session.load()
+        return session
+
+    recovered = asyncio.run(recover())
+    assert recovered.document["content"] == "hello big wide world"
+    assert recovered.document["lastEditedBy"] == "editor123"
+    assert recovered.revision == 3
+
+
+def test_compaction_writes_snapshot_and_trims_wal(tmp_path):
+    async def run():
+        session = make_session(tmp_path, snapshot_idle=0.01)
+        await session.load()
+        revision, ops = session.apply(0, insert(0, ">"), "admin123")
+        await session.record(revision, ops)
+        await asyncio.sleep(0.1)  # idle timeout fires
+        revision, ops = session.apply(1, insert(0, ">"), "admin123")
+        await session.record(revision, ops)
+        await session.close()
+
+    asyncio.run(run())
+    with open(tmp_path / "document.json", encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["document"]["content"] == ">>hello"
+    assert data["revision"] == 2
+    assert not (tmp_path / "document.wal").exists()
+
+
+def test_edit_activity_is_coalesced_per_window(tmp_path):
+    session = make_session(tmp_path, activity_window=60)
+    assert session.should_log_edit("editor123")
+    assert not session.should_log_edit("editor123")
+    assert session.should_log_edit("admin123")
+
+    session.activity_window = 0
+    assert session.should_log_edit("editor123")
+
+
+def test_following_a_wal_restarts_after_it_is_rewritten(tmp_path):
+    wal = WriteAheadLog(tmp_path / "document.wal")
+    wal.append_many([{"seq": i} for i in range(1, 5)])
+    records, position = wal.read_since(None)
+    assert [r["seq"] for r in records] == [1, 2, 3, 4]
+
+    wal.discard_through(2)
+    wal.append({"seq": 5})
+    # Even if the rewritten file got the old inode number back
+    reused = (os.stat(wal.path).st_ino, *position[1:])
+    assert [r["seq"] for r in wal.read_since(reused)[0]] == [3, 4, 5]
+    records, position = wal.read_since(position)
+    assert [r["seq"] for r in records] == [3, 4, 5]
+    wal.append({"seq": 6})
+    assert [r["seq"] for r in wal.read_since(position)[0]] == [6]
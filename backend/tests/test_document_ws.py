@@ -0,0 +1,86 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from main import app
+from utils.tokens import tokens
+
+
+def as_user(path, username, role="Editor"):
+    """WebSocket URL carrying a session token for `username`."""
+    return f"{path}?token={tokens.issue(username, role)[0]}"
+
+
+def receive_until(ws, msg_type):
+    while True:
+        msg = ws.receive_json()
+        if msg["type"] == msg_type:
+            return msg
+
+
+def test_ops_are_transformed_and_relayed():
+    with TestClient(app) as client:
+        with client.websocket_connect(as_user("/ws/document", "admin123", "Admin")) as alice, \
+             client.websocket_connect(as_user("/ws/document", "editor123")) as bob:
+            init = receive_until(alice, "init")["data"]
+            receive_until(bob, "init")
+            base, content = init["revision"], init["document"]["content"]
+
+            # Both edit against the same revision
+            alice.send_json({"type": "op", "data": {"revision": base, "ops": [
+                {"type": "insert", "pos": 0, "text": "A"}]}})
+            ack = receive_until(alice, "ack")["data"]
+            assert ack["revision"] == base + 1
+
+            bob.send_json({"type": "op", "data": {"revision": base, "ops": [
+                {"type": "insert", "pos": len(content), "text": "B"}]}})
+            relayed = receive_until(bob, "op")["data"]
+            assert relayed["ops"] == [{"type": "insert", "pos": 0, "text": "A"}]
+            assert receive_until(bob, "ack")["data"]["revision"] == base + 2
+
+            # Bob's insert was shifted past Alice's before reaching her
+            relayed = receive_until(alice, "op")["data"]
+            assert relayed["ops"] == [{"type": "insert", "pos": len(content) + 1, "text": "B"}]
+            assert relayed["revision"] == base + 2
+
+            r = client.get("/api/document/")
+            assert r.json()["data"]["content"] == "A" + content + "B"
+
+            # Edits against an unknown revision are refused with a fresh snapshot
+            alice.send_json({"type": "op", "data": {"revision": base + 99, "ops": []}})
+            resync = receive_until(alice, "resync")["data"]
+            assert resync["revision"] == base + 2
+
+
+def test_handshake_requires_token_and_viewers_cannot_edit():
+    with TestClient(app) as client:
+        for url in ("/ws/document", "/ws/document?token=forged.token"):
+            with pytest.raises(WebSocketDisconnect) as e:
+                with client.websocket_connect(url) as ws:
+                    ws.receive_json()
+            assert e.value.code == 1008
+
+        with client.websocket_connect(as_user("/ws/document", "viewer123", "Viewer")) as carol:
+            revision = receive_until(carol, "init")["data"]["revision"]
+            carol.send_json({"type": "op", "data": {"revision": revision, "ops": [
+                {"type": "insert", "pos": 0, "text": "nope"}]}})
+            resync = receive_until(carol, "resync")["data"]
+            assert resync["revision"] == revision
+            assert "read-only" in resync["reason"]
+
+
+def test_update_with_stale_revision_is_refused():
+    with TestClient(app) as client:
+        with client.websocket_connect(as_user("/ws/document", "editor123")) as ws:
+            init = receive_until(ws, "init")["data"]
+            revision, content = init["revision"], init["document"]["content"]
+            ws.send_json({"type": "update", "data": {"revision": revision, "content": content + "!"}})
+            assert receive_until(ws, "ack")["data"]["revision"] == revision + 1
+
+            # Written against the revision before the one just acked
+            ws.send_json({"type": "update", "data": {"revision": revision, "content": "overwrite"}})
+            resync = receive_until(ws, "resync")["data"]
+            assert resync["revision"] == revision + 1
+            assert resync["document"]["content"] == content + "!"
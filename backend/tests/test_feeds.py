@@ -0,0 +1,86 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from main import app
+from utils.feeds import Feed
+from utils.pubsub import LocalBus
+from utils.tokens import tokens
+
+
+def editor():
+    return {"Authorization": f"Bearer {tokens.issue('editor123', 'Editor')[0]}"}
+
+
+def receive_after(ws, seq):
+    """Next event newer than `seq` (events replayed by init may repeat right after it)."""
+    while True:
+        msg = ws.receive_json()
+        if msg["type"] == "event" and msg["seq"] > seq:
+            return msg
+
+
+def test_feed_buffers_and_replays():
+    feed = Feed("test", capacity=3, bus=LocalBus())
+    for i in range(5):
+        feed.publish({"n": i})
+
+    assert feed.since(5, feed.epoch) == []
+    assert [e["data"]["n"] for e in feed.since(3, feed.epoch)] == [3, 4]
+    assert [e["seq"] for e in feed.since(2, feed.epoch)] == [3, 4, 5]
+    # Older than the buffer, from another epoch, or from the future: reload
+    assert feed.since(1, feed.epoch) is None
+    assert feed.since(4, "other") is None
+    assert feed.since(6, feed.epoch) is None
+
+    fresh = feed.snapshot()
+    assert fresh["seq"] == 5 and fresh["events"] == [] and not fresh["reset"]
+    assert feed.snapshot(0, feed.epoch)["reset"]
+
+    # Changes from other workers are numbered in this worker's sequence
+    feed.receive({"node": "other", "data": {"n": 5}})
+    assert feed.since(5, feed.epoch) == [{"type": "event", "seq": 6, "data": {"n": 5}}]
+
+
+def test_task_feed_streams_and_resumes():
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/feed/tasks") as ws:
+            init = ws.receive_json()["data"]
+            epoch, seq = init["epoch"], init["seq"]
+
+            task = {"title": "Feed", "assignedTo": "editor123", "status": "Pending"}
+            created = client.post("/api/tasks/", json=task, headers=editor()).json()["data"]
+            event = receive_after(ws, seq)
+            assert event["seq"] == seq + 1
+            assert event["data"] == {"op": "put", "task": created}
+
+        # Changes made while disconnected are replayed on reconnect
+        client.put(f"/api/tasks/{created['id']}", json={**task, "title": "Feed 2"}, headers=editor())
+        client.delete(f"/api/tasks/{created['id']}", headers=editor())
+        with client.websocket_connect(f"/ws/feed/tasks?since={seq + 1}&epoch={epoch}") as ws:
+            init = ws.receive_json()["data"]
+            assert not init["reset"] and init["seq"] == seq + 3
+            assert [e["data"]["op"] for e in init["events"]] == ["put", "delete"]
+            assert init["events"][0]["data"]["task"]["title"] == "Feed 2"
+            assert init["events"][1]["data"] == {"op": "delete", "id": created["id"]}
+
+        # A stale epoch (e.g. after a restart) asks the client to reload
+        with client.websocket_connect(f"/ws/feed/tasks?since={seq}&epoch=stale") as ws:
+            assert ws.receive_json()["data"]["reset"]
+
+
+def test_activity_feed_and_unknown_feeds():
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/feed/activity") as ws:
+            seq = ws.receive_json()["data"]["seq"]
+            client.post("/api/users/login", json={"username": "viewer123", "password": "viewer123"})
+            entry = receive_after(ws, seq)["data"]
+            assert entry["user"] == "viewer123" and entry["action"] == "logged in"
+
+        for url in ("/ws/feed/users", "/ws/feed/tasks?since=abc"):
+            with pytest.raises(WebSocketDisconnect) as e:
+                with client.websocket_connect(url) as ws:
+                    ws.receive_json()
+            assert e.value.code == 1008
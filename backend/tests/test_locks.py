@@ -0,0 +1,120 @@
+import sys, os, asyncio, threading, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.locks import RWLock, AsyncRWLock, LockManager
+from utils.file_ops import _read_file, _write_file
+
+
+def test_readers_share_and_writers_exclude():
+    lock = RWLock()
+    inside = {"readers": 0, "max_readers": 0, "writers": 0}
+    guard = threading.Lock()
+    errors = []
+
+    def reader():
+        for _ in range(200):
+            with lock.read():
+                with guard:
+                    inside["readers"] += 1
+                    inside["max_readers"] = max(inside["max_readers"], inside["readers"])
+                    if inside["writers"]:
+                        errors.append("reader saw writer")
+                time.sleep(0.0001)
+                with guard:
+                    inside["readers"] -= 1
+
+    def writer():
+        for _ in range(100):
+            with lock.write():
+                with guard:
+                    inside["writers"] += 1
+                    if inside["writers"] > 1 or inside["readers"]:
+                        errors.append("writer not exclusive")
+                time.sleep(0.0001)
+                with guard:
+                    inside["writers"] -= 1
+
+    threads = [threading.Thread(target=reader) for _ in range(6)] + [threading.Thread(target=writer) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert inside["max_readers"] > 1
+
+
+def test_locks_are_per_resource(tmp_path):
+    manager = LockManager(RWLock)
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    assert manager.get(a) is manager.get(tmp_path / "." / "a.json")
+
+    acquired = threading.Event()
+
+    def take_b():
+        with manager.write(b):
+            acquired.set()
+
+    with manager.write(a):
+        # Another file stays fully available while `a` is write-locked
+        t = threading.Thread(target=take_b)
+        t.start()
+        t.join(timeout=1)
+    assert acquired.is_set()
+
+
+def test_mixed_reads_and_writes_across_files(tmp_path):
+    """Hammer several files at once: reads never see torn or foreign content."""
+    paths = [tmp_path / f"file{i}.json" for i in range(4)]
+    for i, path in enumerate(paths):
+        _write_file(path, {"owner": i, "version": 0, "items": []})
+    errors = []
+
+    def writer(i):
+        path = paths[i]
+        for version in range(1, 51):
+            _write_file(path, {"owner": i, "version": version, "items": list(range(version))})
+
+    def reader(i):
+        path = paths[i]
+        last = 0
+        for _ in range(200):
+            data = _read_file(path)
+            if data.get("owner") != i or len(data["items"]) != data["version"] or data["version"] < last:
+                errors.append((i, data.get("version")))
+            last = data.get("version", last)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(4)]
+    threads += [threading.Thread(target=reader, args=(i % 4,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert [_read_file(p)["version"] for p in paths] == [50] * 4
+
+
+def test_async_rwlock_serializes_writers():
+    lock = AsyncRWLock()
+    counter = {"value": 0}
+
+    async def increment():
+        async with lock.write():
+            current = counter["value"]
+            await asyncio.sleep(0)
+            counter["value"] = current + 1
+
+    async def read():
+        async with lock.read():
+            await asyncio.sleep(0)
+            return counter["value"]
+
+    async def run():
+        results = await asyncio.gather(*(increment() for _ in range(50)), *(read() for _ in range(50)))
+        return results[50:]
+
+    reads = asyncio.run(run())
+    assert counter["value"] == 50
+    assert all(0 <= r <= 50 for r in reads)
+
@@ -0,0 +1,77 @@
+import sys, os, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from main import app
+from utils import metrics
+from utils.profiler import SamplingProfiler
+from utils.tokens import tokens
+
+
+def bearer(username, role):
+    return {"Authorization": f"Bearer {tokens.issue(username, role)[0]}"}
+
+
+def test_histograms_counters_and_rates_render_as_prometheus_text():
+    histogram = metrics.Histogram("test_latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, route="/x")
+    with histogram.time(route="/y"):
+        pass
+    rate = metrics.Rate("test_events_per_second", "Test rate", window=4)
+    rate.mark(8)
+    try:
+        text = metrics.render()
+        assert "# TYPE test_latency_seconds histogram" in text
+        assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{route="/x",le="1.0"} 2' in text
+        assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 3' in text
+        assert 'test_latency_seconds_sum{route="/x"} 5.55' in text
+        assert histogram.count(route="/y") == 1
+        assert rate.value() == 2.0 and "test_events_per_second 2.0" in text
+    finally:
+        metrics.registry.remove(histogram)
+        metrics.registry.remove(rate)
+
+
+def test_metrics_endpoint_reports_routes_storage_and_websockets():
+    with TestClient(app) as client:
+        client.get("/api/tasks/")
+        client.get("/api/tasks/12345")
+        with client.websocket_connect("/ws/feed/tasks") as ws:
+            ws.receive_json()
+            assert metrics.ws_connections.value(channel="feed:tasks") == 1
+            body = client.get("/metrics")
+        assert metrics.ws_connections.value(channel="feed:tasks") == 0
+
+    assert body.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = body.text
+    # Labelled by route template, not by raw path
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/tasks/{task_id}",status="404"}' in text
+    assert "/api/tasks/12345" not in text
+    assert 'storage_operation_seconds_count{op="load"}' in text
+    assert 'ws_connections{channel="feed:tasks"} 1' in text
+    assert 'ws_messages_total{channel="feed:tasks",direction="out"}' in text
+    assert "ws_messages_per_second" in text and "lock_wait_seconds" in text
+
+
+def test_profiler_samples_threads_and_is_toggled_by_admins():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.monotonic() + 5
+    while profiler.samples < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    profiler.stop()
+    assert not profiler.running and profiler.samples >= 5
+    assert any("test_profiler_samples_threads_and_is_toggled_by_admins" in line for line in profiler.report())
+
+    with TestClient(app) as client:
+        assert client.post("/metrics/profiler", json={"enabled": True}, headers=bearer("viewer123", "Viewer")).status_code == 403
+        admin = bearer("admin123", "Admin")
+        r = client.post("/metrics/profiler", json={"enabled": True, "interval": 0.001, "reset": True}, headers=admin)
+        assert r.status_code == 200 and r.json()["data"]["running"]
+        time.sleep(0.05)
+        r = client.post("/metrics/profiler", json={"enabled": False}, headers=admin)
+        assert not r.json()["data"]["running"] and r.json()["data"]["samples"] > 0
+        r = client.get("/metrics/profile?limit=3", headers=admin)
+        assert r.status_code == 200 and 1 <= len(r.text.strip().splitlines()) <= 3
@@ -0,0 +1,56 @@
+import sys, os, random
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from utils.ot import apply, diff, transform, validate
+
+
+def random_ops(rng, text, count):
+    ops, length = [], len(text)
+    for _ in range(count):
+        if length and rng.random() < 0.5:
+            pos = rng.randrange(length)
+            size = rng.randint(1, min(4, length - pos))
+            ops.append({"type": "delete", "pos": pos, "length": size})
+            length -= size
+        else:
+            word = "".join(rng.choice("xyz") for _ in range(rng.randint(1, 3)))
+            ops.append({"type": "insert", "pos": rng.randint(0, length), "text": word})
+            length += len(word)
+    return ops
+
+
+def test_apply_and_diff():
+    ops = validate([{"type": "insert", "pos": 5, "text": " there"}, {"type": "delete", "pos": 0, "length": 1}], 5)
+    assert apply("hello", ops) == "ello there"
+    for old, new in [("abc", "abc"), ("", "x"), ("abcdef", "abXYef"), ("aaaa", "aa"), ("ab", "")]:
+        assert apply(old, diff(old, new)) == new
+
+
+def test_validate_rejects_bad_ops():
+    with pytest.raises(ValueError):
+        validate([{"type": "insert", "pos": 9, "text": "x"}], 3)
+    with pytest.raises(ValueError):
+        validate([{"type": "delete", "pos": 1, "length": 5}], 3)
+    with pytest.raises(ValueError):
+        validate([{"type": "move", "pos": 0}], 3)
+    assert validate([{"type": "insert", "pos": 0, "text": ""}], 0) == []
+
+
+def test_transform_converges():
+    rng = random.Random(1234)
+    for _ in range(2000):
+        text = "".join(rng.choice("abcdef") for _ in range(rng.randint(0, 12)))
+        a = random_ops(rng, text, rng.randint(1, 3))
+        b = random_ops(rng, text, rng.randint(1, 3))
+        a_prime, b_prime = transform(a, b, a_first=rng.random() < 0.5)
+        assert apply(apply(text, a), b_prime) == apply(apply(text, b), a_prime), (text, a, b)
+
+
+def test_concurrent_inserts_respect_priority():
+    a = [{"type": "insert", "pos": 1, "text": "A"}]
+    b = [{"type": "insert", "pos": 1, "text": "B"}]
+    a_prime, b_prime = transform(a, b, a_first=True)
+    assert apply(apply("xy", a), b_prime) == "xABy"
+    a_prime, b_prime = transform(a, b, a_first=False)
+    assert apply(apply("xy", b), a_prime) == "xBAy"
@@ -0,0 +1,129 @@
+import sys, os, asyncio, threading, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+import pytest
+
+import main
+import routes.api.users as users_api
+from utils import file_ops
+from utils.constants import USERS_PATH
+from utils.passwords import hash_password
+
+WRITE_DELAY = 0.02  # simulated slow disk: 20ms per file write
+WRITERS = 10
+READERS = 5
+
+# Wall-clock comparisons are noisy on shared machines, so the timing
+# assertions are opt-in: RUN_BENCHMARKS=1 pytest -s tests/test_persistence_benchmark.py
+benchmark = pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+
+
+def slow_disk(monkeypatch):
+    """Make every file write through the shared store block like a slow disk; returns the writing threads."""
+    writer = file_ops.store._writer
+    written = []
+
+    def slow_writer(path, data):
+        time.sleep(WRITE_DELAY)
+        writer(path, data)
+        written.append(threading.current_thread())
+
+    monkeypatch.setattr(file_ops.store, "_writer", slow_writer)
+    # Cheap password hashes, so the requests are dominated by the disk
+    monkeypatch.setattr(users_api, "hash_password", lambda password: hash_password(password, iterations=1))
+    return written
+
+
+def blocking_writes(monkeypatch):
+    """Previous behavior: the read-modify-write runs on the event loop."""
+    store = file_ops.store
+
+    async def aupdate(path, change):
+        return store.update(path, change)
+
+    monkeypatch.setattr(store, "aupdate", aupdate)
+
+
+async def run_workload(label: str):
+    """
+    User creations racing readers that poll the user list until they are
+    done; returns read throughput and latency over that window.
+    """
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/api/users/login", json={"username": "admin123", "password": "admin123"})
+        headers = {"Authorization": f"Bearer {r.json()['data']['token']}"}
+        writing = True
+        latencies = []
+
+        async def write_request(i):
+            r = await client.post("/api/users/", headers=headers,
+                                  json={"username": f"bench_{label}_{i}", "password": "secret123"})
+            assert r.status_code == 200
+
+        async def reader():
+            while writing:
+                # A cached read never suspends, so let the writers run
+                await asyncio.sleep(0)
+                sent = time.perf_counter()
+                r = await client.get("/api/users/")
+                assert r.status_code == 200
+                latencies.append(time.perf_counter() - sent)
+
+        readers = [asyncio.create_task(reader()) for _ in range(READERS)]
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(write_request(i) for i in range(WRITERS)))
+            elapsed = time.perf_counter() - started
+        finally:
+            writing = False
+            await asyncio.gather(*readers)
+
+    latencies.sort()
+    return {
+        "reads_per_sec": len(latencies) / elapsed,
+        "read_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "read_max_ms": latencies[-1] * 1000,
+    }
+
+
+def run(label: str):
+    """Run the workload, check every user landed in users.json, then restore it."""
+    original = file_ops.read_json(USERS_PATH)
+    try:
+        result = asyncio.run(run_workload(label))
+        on_disk = file_ops.store._loader(file_ops.store._key(USERS_PATH))["users"]
+        assert {u["username"] for u in on_disk[-WRITERS:]} == {f"bench_{label}_{i}" for i in range(WRITERS)}
+    finally:
+        file_ops.store.update(USERS_PATH, lambda data: original)
+    print(f"\n[{label:>8}] {result['reads_per_sec']:8.0f} reads/s  "
+          f"read p50 {result['read_p50_ms']:7.2f}ms  max {result['read_max_ms']:7.2f}ms")
+    return result
+
+
+def test_user_writes_reach_disk_off_the_event_loop(monkeypatch):
+    """Concurrent creations through the router all land in users.json, written from worker threads."""
+    written = slow_disk(monkeypatch)
+    run("async")
+    # One write per creation, plus restoring the original file
+    assert len(written) == WRITERS + 1
+    assert threading.main_thread() not in written[:WRITERS]
+
+
+@benchmark
+def test_async_persistence_benchmark(monkeypatch):
+    """
+    User creations and user list reads issued concurrently against the app
+    while every file write takes WRITE_DELAY. Blocking writes stall every
+    read behind them; the async API moves the disk work to threads so reads
+    keep being served while users are written. Run with `pytest -s` to see
+    the numbers.
+    """
+    slow_disk(monkeypatch)
+    after = run("async")
+    with monkeypatch.context() as patch:
+        blocking_writes(patch)
+        before = run("blocking")
+
+    assert after["reads_per_sec"] > before["reads_per_sec"]
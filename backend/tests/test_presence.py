@@ -0,0 +1,59 @@
+import sys, os, asyncio
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from main import app
+from utils.connection_manager import ConnectionManager
+from utils.presence import PresenceTracker
+from test_connection_manager import DummyWebSocket
+from test_document_ws import as_user, receive_until
+
+
+def test_cursor_moves_are_batched_into_diffs():
+    async def run():
+        manager = ConnectionManager()
+        tracker = PresenceTracker(manager, rate=50)
+        sockets = [DummyWebSocket() for _ in range(3)]
+        for i, ws in enumerate(sockets):
+            manager.register(ws, f"user{i}")
+
+        # A burst of moves from two clients within one tick
+        for pos in range(100):
+            tracker.move(sockets[0], pos)
+            tracker.move(sockets[1], pos * 2)
+        await asyncio.sleep(0.05)
+        await manager.drain()
+
+        for ws in sockets:
+            assert len(ws.sent) == 1
+            diff = ws.sent[0]
+            assert diff["type"] == "presence_diff"
+            assert [(p["user"], p["cursor"]) for p in diff["data"]] == [("user0", 99), ("user1", 198)]
+
+        # No moves, no ticks
+        await asyncio.sleep(0.05)
+        assert all(len(ws.sent) == 1 for ws in sockets)
+
+        # Full list on leave replaces pending moves
+        tracker.move(sockets[2], 7)
+        manager.disconnect(sockets[0])
+        await tracker.full()
+        await asyncio.sleep(0.05)
+        await manager.drain()
+        assert [m["type"] for m in sockets[1].sent] == ["presence_diff", "presence"]
+        assert [p["user"] for p in sockets[1].sent[1]["data"]] == ["user1", "user2"]
+
+    asyncio.run(run())
+
+
+def test_cursor_message_over_websocket():
+    with TestClient(app) as client:
+        with client.websocket_connect(as_user("/ws/document", "admin123", "Admin")) as alice, \
+             client.websocket_connect(as_user("/ws/document", "editor123")) as bob:
+            receive_until(alice, "init")
+            bob_id = receive_until(bob, "init")["data"]["connectionId"]
+
+            bob.send_json({"type": "cursor", "data": {"position": 3}})
+            bob.send_json({"type": "cursor", "data": {"position": 4}})
+            diff = receive_until(alice, "presence_diff")["data"]
+            assert diff == [{"id": bob_id, "user": "editor123", "cursor": 4}]
@@ -0,0 +1,198 @@
+import sys, os, asyncio, multiprocessing, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+WORKERS = 3
+EDITS = 40
+
+
+def run_broker(path):
+    from utils.pubsub import serve
+    asyncio.run(serve(path))
+
+
+def run_worker(name, doc_id, barrier, results):
+    asyncio.run(edit_from_worker(name, doc_id, barrier, results))
+
+
+async def edit_from_worker(name, doc_id, barrier, results):
+    from utils.pubsub import bus
+    from utils.rooms import rooms
+    from test_connection_manager import DummyWebSocket
+
+    await bus.start()
+    room = rooms.acquire(doc_id)
+    await room.session.load()
+    editor, watcher = DummyWebSocket(), DummyWebSocket()
+    room.connections.register(editor, name)
+    room.connections.register(watcher, f"{name}-watcher")
+    await asyncio.to_thread(barrier.wait, 30)  # every worker is subscribed
+
+    for i in range(EDITS):
+        # Like a client that has not seen the latest edits yet
+        base = max(0, room.session.revision - i % 3)
+        ops = [{"type": "insert", "pos": 0, "text": f"<{name}{i}>"}]
+        await room.edit(lambda s: s.apply(base, ops, name), name, sender=editor)
+        await asyncio.sleep(0.001)
+
+    await asyncio.to_thread(barrier.wait, 30)  # every edit is in the WAL
+    await room.catch_up()
+    await room.connections.drain()
+    await room.session.close()
+    results.put({
+        "name": name,
+        "content": room.session.document["content"],
+        "revision": room.session.revision,
+        "watcher": [(m["type"], m["data"]["revision"]) for m in watcher.sent],
+        "editor": [(m["type"], m["data"]["revision"]) for m in editor.sent],
+    })
+    await bus.stop()
+
+
+def follow(messages):
+    """Replay what a client received the way the doc page does; returns its final revision."""
+    revision = 0
+    for kind, msg_revision in messages:
+        if kind == "resync":
+            assert msg_revision >= revision
+        else:
+            assert msg_revision == revision + 1, (kind, msg_revision, revision)
+        revision = msg_revision
+    return revision
+
+
+def test_workers_share_edits_through_broker(tmp_path, monkeypatch):
+    """
+    Several worker processes edit one document through the broker. Every
+    client must see every revision exactly once, in order, and all workers
+    (and the data on disk) must end with the same text.
+    """
+    sock = str(tmp_path / "bus.sock")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("PUBSUB_BROKER", sock)
+    monkeypatch.setenv("DOC_SNAPSHOT_IDLE", "0.02")  # compact while edits are in flight
+
+    ctx = multiprocessing.get_context("spawn")
+    broker = ctx.Process(target=run_broker, args=(sock,), daemon=True)
+    broker.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(sock):
+            assert time.monotonic() < deadline, "broker did not start"
+            time.sleep(0.01)
+
+        barrier, results = ctx.Barrier(WORKERS), ctx.Queue()
+        workers = [ctx.Process(target=run_worker, args=(f"w{i}", "shared", barrier, results), daemon=True)
+                   for i in range(WORKERS)]
+        for worker in workers:
+            worker.start()
+        reports = [results.get(timeout=60) for _ in workers]
+        for worker in workers:
+            worker.join(timeout=10)
+            assert worker.exitcode == 0
+    finally:
+        broker.terminate()
+
+    total = WORKERS * EDITS
+    for report in reports:
+        assert report["revision"] == total
+        assert follow(report["watcher"]) == total
+        assert follow(report["editor"]) == total
+        assert sum(kind == "ack" for kind, _ in report["editor"]) == EDITS
+
+    contents = {report["content"] for report in reports}
+    assert len(contents) == 1
+    content = contents.pop()
+    assert sorted(content[1:-1].split("><")) == sorted(f"w{w}{i}" for w in range(WORKERS) for i in range(EDITS))
+
+    async def reload():
+        from utils.document_session import DocumentSession
+        session = DocumentSession(tmp_path / "data" / "documents" / "shared.json",
+                                  tmp_path / "data" / "documents" / "shared.wal")
+        return await session.load()
+
+    assert asyncio.run(reload())["content"] == content
+
+
+def run_app_worker(name, barrier, tokens, results):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:  # the full startup: broker connection, stores, pipeline
+        barrier.wait(60)
+        admin = {"Authorization": f"Bearer {login(client, 'admin123')}"}
+        created = [
+            client.post("/api/tasks/", json={"title": f"{name}-{i}", "assignedTo": name, "status": "Pending"},
+                        headers=admin).json()["data"]["id"]
+            for i in range(EDITS)
+        ]
+        assert client.post("/api/users/", json={"username": name, "password": "pw", "role": "Editor"},
+                           headers=admin).status_code == 200
+        token = login(client, name)
+        tokens[name] = token
+        barrier.wait(60)  # every worker has written
+
+        # A user created on another worker can log in here
+        others = [login(client, other) for other in tokens.keys()]
+        assert client.post("/api/users/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+        barrier.wait(60)  # every worker has logged its user out
+
+        deadline = time.monotonic() + 10
+        while any(client.get("/api/users/me", headers={"Authorization": f"Bearer {t}"}).status_code != 401
+                  for t in tokens.values()):
+            assert time.monotonic() < deadline, "revocation did not reach this worker"
+            time.sleep(0.05)
+        listed = client.get("/api/tasks/").json()["data"]
+        users = client.get("/api/users/").json()["data"]
+        results.put({"created": created, "listed": [(t["id"], t["title"]) for t in listed],
+                     "users": sorted(u["username"] for u in users), "logins": len(others)})
+        barrier.wait(60)
+
+
+def login(client, username):
+    password = "pw" if username.startswith("w") else username
+    r = client.post("/api/users/login", json={"username": username, "password": password})
+    assert r.status_code == 200, r.text
+    return r.json()["data"]["token"]
+
+
+def test_app_workers_share_tasks_users_and_logouts(tmp_path, monkeypatch):
+    """
+    Several processes serve main.app on one data directory. Task ids stay
+    unique, every worker lists the same tasks and users, and a logout on
+    one worker is honoured by the others.
+    """
+    sock = str(tmp_path / "bus.sock")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("PUBSUB_BROKER", sock)
+    monkeypatch.setenv("PASSWORD_ITERATIONS", "1000")
+
+    ctx = multiprocessing.get_context("spawn")
+    broker = ctx.Process(target=run_broker, args=(sock,), daemon=True)
+    broker.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(sock):
+            assert time.monotonic() < deadline, "broker did not start"
+            time.sleep(0.01)
+
+        manager = ctx.Manager()
+        barrier, tokens, results = ctx.Barrier(WORKERS), manager.dict(), ctx.Queue()
+        workers = [ctx.Process(target=run_app_worker, args=(f"w{i}", barrier, tokens, results), daemon=True)
+                   for i in range(WORKERS)]
+        for worker in workers:
+            worker.start()
+        reports = [results.get(timeout=120) for _ in workers]
+        for worker in workers:
+            worker.join(timeout=30)
+            assert worker.exitcode == 0
+        manager.shutdown()
+    finally:
+        broker.terminate()
+
+    created = [task_id for report in reports for task_id in report["created"]]
+    assert len(set(created)) == WORKERS * EDITS
+    assert all(report["listed"] == reports[0]["listed"] for report in reports)
+    assert sorted(task_id for task_id, _ in reports[0]["listed"]) == sorted(created)
+    for report in reports:
+        assert report["users"] == sorted(["admin123", "editor123", "viewer123"] + [f"w{i}" for i in range(WORKERS)])
+        assert report["logins"] == WORKERS
@@ -0,0 +1,44 @@
+import sys, os, asyncio
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from starlette.requests import Request
+from utils.response_cache import ResponseCache
+
+
+def get(headers=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_bodies_are_reused_per_version_and_invalidated():
+    cache = ResponseCache(max_entries=2)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return {"status": "success", "data": len(builds)}
+
+    async def run():
+        first = await cache.serve(get(), "users", "", 0, build)
+        again = await cache.serve(get(), "users", "", 0, build)
+        assert first.body == again.body == b'{"status":"success","data":1}' and len(builds) == 1
+        etag = first.headers["etag"]
+        assert etag.startswith('"users-') and first.headers["last-modified"].endswith("GMT")
+
+        cached = await cache.serve(get({"If-None-Match": etag}), "users", "", 0, build)
+        assert cached.status_code == 304 and cached.body == b"" and cached.headers["etag"] == etag
+
+        # A newer version (written elsewhere) or an explicit invalidation rebuilds
+        assert (await cache.serve(get(), "users", "", 1, build)).body.endswith(b"2}")
+        cache.invalidate("users")
+        rebuilt = await cache.serve(get({"If-None-Match": etag}), "users", "", 1, build)
+        assert rebuilt.status_code == 200 and rebuilt.headers["etag"] != etag and len(builds) == 3
+
+        # A known ETag answers 304 without building; entries are bounded
+        assert (await cache.serve(get({"If-None-Match": '"tasks-7"'}), "tasks", "a", 7, build, '"tasks-7"')).status_code == 304
+        await cache.serve(get(), "tasks", "a", 7, build, '"tasks-7"')
+        await cache.serve(get(), "tasks", "b", 7, build, '"tasks-7"')
+        assert cache.get("users", "", 1) is None and cache.get("tasks", "a", 7) is not None
+        assert (cache.hits, cache.misses) == (2, 6)
+
+    asyncio.run(run())
@@ -0,0 +1,77 @@
+import sys, os, json
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils import ot
+from utils.revision_history import RevisionHistory
+
+
+def meta(i):
+    return {"title": "Doc", "lastEditedBy": f"user{i % 3}", "lastUpdated": f"t{i}"}
+
+
+def write_history(path, revisions, **kwargs):
+    """Append `revisions` edits to a history; returns it and the content after each revision."""
+    history = RevisionHistory(path, **kwargs)
+    contents = {0: ""}
+    content = ""
+    for rev in range(1, revisions + 1):
+        ops = [{"type": "insert", "pos": len(content), "text": f"<{rev}>"}]
+        if rev % 4 == 0:
+            ops = [{"type": "delete", "pos": 0, "length": 3}]
+        content = ot.apply(content, ops)
+        history.append(rev, ops, content, meta(rev))
+        contents[rev] = content
+    return history, contents
+
+
+def test_any_revision_is_rebuilt_from_the_nearest_snapshot(tmp_path):
+    history, contents = write_history(tmp_path / "doc.history", 100, snapshot_every=10)
+    assert len(history) == 100
+    for rev in (1, 9, 10, 11, 57, 100):
+        document = history.get(rev)
+        assert document["content"] == contents[rev]
+        assert document["revision"] == rev and document["lastUpdated"] == f"t{rev}"
+    assert history.get(0) is None and history.get(101) is None
+
+    # Snapshots every 10 revisions: a lookup never reads more than 10 records
+    records = [json.loads(line) for line in open(tmp_path / "doc.history", encoding="utf-8")]
+    assert [r["rev"] for r in records if r["snapshot"]] == list(range(1, 101, 10))
+    assert all("data" in r and "ops" in r["data"] for r in records if not r["snapshot"])
+
+    assert history.diff(10, 11) == ot.diff(contents[10], contents[11])
+    assert history.diff(1, 500) is None
+
+
+def test_listing_pages_and_other_writers(tmp_path):
+    history, _ = write_history(tmp_path / "doc.history", 25, snapshot_every=10)
+    page, cursor = history.list(limit=10)
+    assert [r["revision"] for r in page] == list(range(25, 15, -1)) and cursor == 16
+    page, cursor = history.list(cursor=cursor, limit=10)
+    assert page[0]["revision"] == 15 and cursor == 6
+    page, cursor = history.list(cursor=cursor, limit=10)
+    assert [r["revision"] for r in page] == [5, 4, 3, 2, 1] and cursor is None
+
+    # Another worker's history object sees appends from this one, and vice versa
+    other = RevisionHistory(tmp_path / "doc.history", snapshot_every=10)
+    other.append(26, [{"type": "insert", "pos": 0, "text": "x"}], "ignored", meta(26))
+    assert history.get(26)["content"] == "x" + history.get(25)["content"]
+    # Replayed revisions are ignored; a gap starts a new snapshot
+    history.append(26, [], "", meta(26))
+    history.append(30, [], "after gap", meta(30))
+    assert history.get(30)["content"] == "after gap" and history.list(limit=1)[0][0]["snapshot"]
+
+
+def test_large_payloads_are_compressed_and_torn_tails_dropped(tmp_path):
+    path = tmp_path / "doc.history"
+    history = RevisionHistory(path, snapshot_every=50, compress_min=64)
+    content = "lorem ipsum " * 500
+    history.append(1, [], content, meta(1))
+    assert os.path.getsize(path) < len(content) // 4
+    history.append(2, [{"type": "insert", "pos": 0, "text": "!"}], "", meta(2))
+
+    with open(path, "ab") as f:
+        f.write(b'{"rev":3,"snaps')  # crash mid-append
+    reopened = RevisionHistory(path, snapshot_every=50, compress_min=64)
+    assert len(reopened) == 2
+    reopened.append(3, [{"type": "insert", "pos": 0, "text": "?"}], "", meta(3))
+    assert RevisionHistory(path).get(3)["content"] == "?!" + content
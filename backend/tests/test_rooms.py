@@ -0,0 +1,62 @@
+import sys, os, json, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from utils.rooms import rooms, document_paths
+from test_document_ws import as_user, receive_until
+
+
+@pytest.fixture
+def doc_ids():
+    ids = ["room-a", "room-b"]
+    yield ids
+    for doc_id in ids:
+        for path in document_paths(doc_id):
+            path.unlink(missing_ok=True)
+
+
+def test_broadcasts_stay_in_their_room(doc_ids):
+    room_a, room_b = doc_ids
+    with TestClient(app) as client:
+        with client.websocket_connect(as_user(f"/ws/document/{room_a}", "admin123", "Admin")) as alice, \
+             client.websocket_connect(as_user(f"/ws/document/{room_a}", "editor123")) as bob, \
+             client.websocket_connect(as_user(f"/ws/document/{room_b}", "carol")) as carol:
+            for ws in (alice, bob, carol):
+                assert receive_until(ws, "init")["data"]["document"] == {}
+            assert set(doc_ids) <= set(rooms.loaded())
+
+            alice.send_json({"type": "op", "data": {"revision": 0, "ops": [
+                {"type": "insert", "pos": 0, "text": "hello"}]}})
+            assert receive_until(bob, "op")["data"]["ops"] == [{"type": "insert", "pos": 0, "text": "hello"}]
+
+            # Carol's room never saw the edit: her first message is her own ack
+            carol.send_json({"type": "op", "data": {"revision": 0, "ops": [
+                {"type": "insert", "pos": 0, "text": "other"}]}})
+            msg = carol.receive_json()
+            while msg["type"].startswith("presence"):
+                msg = carol.receive_json()
+            assert msg == {"type": "ack", "data": {"revision": 1}}
+
+            assert client.get(f"/api/document/{room_a}").json()["data"]["content"] == "hello"
+            assert client.get(f"/api/document/{room_b}").json()["data"]["content"] == "other"
+
+        # Last clients left: rooms are unloaded and their state is on disk
+        deadline = time.monotonic() + 2
+        while set(doc_ids) & set(rooms.loaded()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not set(doc_ids) & set(rooms.loaded())
+        path, wal_path = document_paths(room_a)
+        assert json.loads(path.read_text())["document"]["content"] == "hello"
+        assert not wal_path.exists()
+        assert client.get(f"/api/document/{room_a}").json()["data"]["content"] == "hello"
+        assert room_a not in rooms.loaded()
+
+
+def test_document_ids_are_validated():
+    with TestClient(app) as client:
+        assert client.get("/api/document/..%2Fusers").status_code in (400, 404)
+        assert client.get("/api/document/bad.id").status_code == 400
+        assert client.get("/api/document/never-saved").status_code == 404
+        assert not document_paths("never-saved")[0].exists()
@@ -0,0 +1,146 @@
+import sys, os, asyncio, subprocess
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from utils.activity_index import timestamp_key
+from utils.activity_log import ActivityJournal
+from utils.file_ops import _read_file, _write_file
+from utils.migrate import migrate
+from utils.sqlite_storage import SqliteActivityJournal, SqliteDatabase, SqliteTaskLog
+from utils.task_store import TaskStore
+
+BACKEND = os.path.dirname(os.path.dirname(__file__))
+
+
+def task(title, status="Pending"):
+    return {"title": title, "assignedTo": "editor123", "status": status}
+
+
+def test_documents_and_pooled_connections(tmp_path):
+    database = SqliteDatabase(tmp_path / "db.sqlite", root=tmp_path, pool_size=2)
+    assert database.read_document(tmp_path / "users.json") == {}
+    assert not database.has_document(tmp_path / "users.json")
+
+    database.write_document(tmp_path / "users.json", {"users": [{"username": "ä"}]})
+    database.write_document(tmp_path / "documents" / "a.json", {"revision": 3})
+    assert database.read_document(tmp_path / "users.json") == {"users": [{"username": "ä"}]}
+    assert database.has_document(tmp_path / "documents" / "a.json")
+    # Every write bumps the document's stamp, so other processes' caches can tell
+    assert database.document_stamp(tmp_path / "documents" / "a.json") == 1
+    database.write_document(tmp_path / "documents" / "a.json", {"revision": 4})
+    assert database.document_stamp(tmp_path / "documents" / "a.json") == 2
+
+    with database.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        names = [row[0] for row in conn.execute("SELECT name FROM documents ORDER BY name")]
+        assert names == ["documents/a.json", "users.json"]  # relative to DATA_DIR
+    assert database._idle.qsize() == 1
+    database.close()
+
+
+def test_task_log_commits_rows_and_recovers(tmp_path):
+    database = SqliteDatabase(tmp_path / "db.sqlite", root=tmp_path)
+
+    async def edit():
+        tasks = TaskStore(SqliteTaskLog(database))
+        await tasks.batch([("create", None, task("a")), ("create", None, task("b")), ("create", None, task("c"))])
+        await tasks.update(1, task("a", "Done"))
+        await tasks.batch([("create", None, task("d")), ("delete", 4, None), ("delete", 3, None)])
+
+    async def recover():
+        tasks = TaskStore(SqliteTaskLog(database))
+        listed = await tasks.all()
+        page, _ = await tasks.query(status="Done")
+        return listed, page, await tasks.create(task("e")), tasks.version
+
+    asyncio.run(edit())
+    listed, done, created, version = asyncio.run(recover())
+    assert [(t["id"], t["title"]) for t in listed] == [(1, "a"), (2, "b")]
+    assert [t["id"] for t in done] == [1]
+    assert created["id"] == 5  # ids 3 and 4 were deleted but stay used
+    assert version == 8
+
+    with database.connection() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM tasks WHERE status = ? ORDER BY id", ("Done",)))
+    assert "tasks_status" in plan
+
+
+def test_task_logs_of_two_workers_share_ids_and_changes(tmp_path):
+    async def run():
+        a = TaskStore(SqliteTaskLog(SqliteDatabase(tmp_path / "db.sqlite", root=tmp_path), keep=3), shared=True)
+        b = TaskStore(SqliteTaskLog(SqliteDatabase(tmp_path / "db.sqlite", root=tmp_path), keep=3), shared=True)
+        created = await asyncio.gather(*(s.create(task(f"t{i}")) for i in range(5) for s in (a, b)))
+        await b.delete(created[0]["id"])
+        in_step = await a.all()
+        for i in range(5):
+            await b.create(task(f"more{i}"))  # more than `keep`: `a` has to reload
+        return created, in_step, await a.all(), await b.all()
+
+    created, in_step, listed_a, listed_b = asyncio.run(run())
+    assert sorted(t["id"] for t in created) == list(range(1, 11))
+    assert len(in_step) == 9
+    assert listed_a == listed_b and [t["id"] for t in listed_a][-5:] == [11, 12, 13, 14, 15]
+
+
+def test_activity_journal_matches_json_journal(tmp_path):
+    entries = [{"timestamp": f"2025-01-01 00:{i // 60:02d}:{i % 60:02d}", "user": f"user{i % 3}",
+                "action": "edited" if i % 2 else "viewed", "details": str(i)} for i in range(250)]
+    json_journal = ActivityJournal(tmp_path / "activity", segment_max_bytes=4096)
+    sqlite_journal = SqliteActivityJournal(SqliteDatabase(tmp_path / "db.sqlite", root=tmp_path))
+    for journal in (json_journal, sqlite_journal):
+        journal.append_many(entries[:200])
+        for entry in entries[200:]:
+            journal.append(entry)
+
+    assert list(sqlite_journal) == entries
+    assert sqlite_journal.tail(5) == json_journal.tail(5) == entries[-5:]
+
+    def walk(journal, **kwargs):
+        pages, cursor = [], None
+        while True:
+            page, cursor = journal.query(cursor=cursor, limit=30, **kwargs)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    for filters in ({}, {"user": "user1"}, {"user": "user2", "action": "edited"},
+                    {"start": timestamp_key("2025-01-01 00:01:00"), "end": timestamp_key("2025-01-01 00:02:30")},
+                    {"user": "nobody"}):
+        assert walk(sqlite_journal, **filters) == walk(json_journal, **filters)
+
+
+def test_migration_imports_json_data(tmp_path):
+    data = tmp_path / "data"
+    _write_file(data / "users.json", {"users": [{"id": 1, "username": "admin123", "role": "Admin"}]})
+    _write_file(data / "documents" / "notes.json", {"document": {"content": "hi"}, "revision": 1})
+    _write_file(data / "tasks.json", {"tasks": [{"id": 4, **task("old")}], "seq": 2})
+    _write_file(data / "task_ids.json", {"next": 9})
+    (data / "tasks.wal").write_text('{"seq": 3, "op": "put", "task": {"id": 8, "title": "new", '
+                                    '"assignedTo": "editor123", "status": "Done"}}\n', encoding="utf-8")
+    ActivityJournal(data / "activity").append_many(
+        [{"timestamp": "2025-01-01 00:00:00", "user": "admin123", "action": f"a{i}"} for i in range(1500)])
+
+    database = SqliteDatabase(tmp_path / "db.sqlite", root=data)
+    assert migrate(data, database) == {"documents": 2, "tasks": 2, "activity": 1500}
+    # Running it again replaces rather than duplicates
+    assert migrate(data, database) == {"documents": 2, "tasks": 2, "activity": 1500}
+
+    assert database.read_document(data / "documents" / "notes.json")["revision"] == 1
+    tasks, seq, _, next_id = SqliteTaskLog(database).load()
+    assert sorted(tasks) == [4, 8] and seq == 3 and next_id == 9
+    journal = SqliteActivityJournal(database)
+    assert [e["action"] for e in journal.tail(2)] == ["a1498", "a1499"]
+    assert _read_file(data / "tasks.json")["seq"] == 2  # sources untouched
+
+
+def test_backend_suite_on_sqlite(tmp_path):
+    """The whole of test_backend.py against the SQLite engine, seeded by the migration command."""
+    env = {**os.environ, "STORAGE_ENGINE": "sqlite", "DATA_DIR": str(tmp_path),
+           "SQLITE_PATH": str(tmp_path / "collab.db")}
+    subprocess.run([sys.executable, "-m", "utils.migrate", "--data-dir", os.path.join(BACKEND, "data")],
+                   cwd=BACKEND, env=env, check=True, capture_output=True)
+    result = subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "tests/test_backend.py"],
+                            cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout[-3000:]
+    assert " passed" in result.stdout and "1 skipped" in result.stdout
+    assert not os.path.exists(os.path.join(tmp_path, "users.json"))
@@ -0,0 +1,202 @@
+import sys, os, json, asyncio
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from utils.data_store import DataStore
+from utils.file_ops import _file_stamp, _read_file, _write_file
+from utils.etags import PreconditionFailed
+from utils.task_store import JsonTaskLog, MissingTasks, RevisionMismatch, TaskStore, encode_cursor
+
+
+def make_store(tmp_path, store=None, **kwargs):
+    store = store if store is not None else DataStore(_read_file, _write_file, flush_interval=0, stamp=_file_stamp)
+    return TaskStore(JsonTaskLog(tmp_path / "tasks.json", tmp_path / "tasks.wal", tmp_path / "task_ids.json", store),
+                     **kwargs)
+
+
+def task(title, status="Pending"):
+    return {"title": title, "assignedTo": "editor123", "status": status}
+
+
+def test_changes_are_logged_and_recovered(tmp_path):
+    _write_file(tmp_path / "tasks.json", {"tasks": [{"id": 7, **task("seeded")}]})
+
+    async def edit():
+        tasks = make_store(tmp_path)
+        first = await tasks.create(task("first"))
+        second = await tasks.create(task("second"))
+        await tasks.update(first["id"], task("first", "Done"))
+        await tasks.delete(second["id"])
+        assert await tasks.update(second["id"], task("gone")) is None
+        assert await tasks.delete(999) is None
+        # Simulated crash: tasks.json was never rewritten
+        return first, second
+
+    first, second = asyncio.run(edit())
+    assert (first["id"], second["id"]) == (8, 9)
+    with open(tmp_path / "tasks.json", encoding="utf-8") as f:
+        assert [t["title"] for t in json.load(f)["tasks"]] == ["seeded"]
+    assert len((tmp_path / "tasks.wal").read_text().splitlines()) == 4
+
+    async def recover():
+        tasks = make_store(tmp_path)
+        listed = await tasks.all()
+        # The newest id was deleted, but it is not handed out again
+        third = await tasks.create(task("third"))
+        return listed, third
+
+    listed, third = asyncio.run(recover())
+    assert [(t["id"], t["title"], t["status"]) for t in listed] == [(7, "seeded", "Pending"), (8, "first", "Done")]
+    assert third["id"] == 10
+
+
+def test_compaction_writes_snapshot_and_trims_wal(tmp_path):
+    async def run():
+        tasks = make_store(tmp_path, compact_records=3)
+        for i in range(5):
+            await tasks.create(task(f"t{i}"))
+        await asyncio.sleep(0.05)  # the compaction started by the third change
+        assert len((tmp_path / "tasks.wal").read_text().splitlines()) == 2
+        await tasks.delete(1)
+        await tasks.close()
+
+    asyncio.run(run())
+    with open(tmp_path / "tasks.json", encoding="utf-8") as f:
+        data = json.load(f)
+    assert [t["id"] for t in data["tasks"]] == [2, 3, 4, 5]
+    assert data["seq"] == 6
+    assert not (tmp_path / "tasks.wal").exists()
+
+    async def reload():
+        return await make_store(tmp_path).create(task("next"))
+
+    assert asyncio.run(reload())["id"] == 6
+
+
+def test_query_filters_sorts_and_pages(tmp_path):
+    rows = [("b", "Pending", "ann"), ("a", "Done", "bob"), ("c", "Pending", "bob"),
+            ("a", "Pending", "bob"), ("d", "In Progress", "ann")]
+    _write_file(tmp_path / "tasks.json", {"tasks": [
+        {"id": i, "title": t, "status": s, "assignedTo": a} for i, (t, s, a) in enumerate(rows, 1)
+    ]})
+
+    async def run():
+        tasks = make_store(tmp_path)
+
+        async def walk(**kwargs):
+            ids, cursor = [], None
+            while True:
+                page, cursor = await tasks.query(cursor=cursor, limit=2, **kwargs)
+                ids += [t["id"] for t in page]
+                if cursor is None:
+                    return ids
+
+        assert await walk() == [1, 2, 3, 4, 5]
+        assert await walk(status="Pending") == [1, 3, 4]
+        assert await walk(status="Pending", assigned_to="bob", descending=True) == [4, 3]
+        assert await walk(sort="title") == [2, 4, 1, 3, 5]
+        assert await walk(assigned_to="bob", sort="title", descending=True) == [3, 4, 2]
+        assert await walk(status="Done", assigned_to="ann") == []
+
+        # Indexes follow writes
+        version = tasks.version
+        await tasks.update(3, {"title": "c", "status": "Done", "assignedTo": "ann"})
+        await tasks.delete(4)
+        await tasks.create({"title": "e", "status": "Pending", "assignedTo": "bob"})
+        assert tasks.version == version + 3
+        assert await walk(status="Pending") == [1, 6]
+        assert await walk(status="Done", assigned_to="ann") == [3]
+        assert await walk(assigned_to="bob", sort="title") == [2, 6]
+
+        for bad in ("nope", encode_cursor(3)):
+            with pytest.raises(ValueError):
+                await tasks.query(sort="title", cursor=bad)
+
+    asyncio.run(run())
+
+
+def test_batch_is_all_or_nothing_in_one_write(tmp_path):
+    async def run():
+        tasks = make_store(tmp_path)
+        first = await tasks.create(task("first"))
+        wal_lines = len((tmp_path / "tasks.wal").read_text().splitlines())
+
+        with pytest.raises(MissingTasks) as e:
+            await tasks.batch([
+                ("create", None, task("never")),
+                ("delete", first["id"], None),
+                ("update", first["id"], task("deleted above")),
+            ])
+        assert e.value.missing == {2: first["id"]}
+        assert await tasks.all() == [first]
+        assert len((tmp_path / "tasks.wal").read_text().splitlines()) == wal_lines
+
+        results = await tasks.batch([
+            ("create", None, task("second")),
+            ("update", first["id"], task("first", "Done")),
+            ("create", None, task("third")),
+            ("delete", 3, None),
+        ])
+        assert [(t["id"], t["title"]) for t in results] == [(2, "second"), (1, "first"), (3, "third"), (3, "third")]
+        page, _ = await tasks.query(status="Done")
+        assert [t["id"] for t in page] == [1]
+        return tasks.version
+
+    assert asyncio.run(run()) == 5
+    # The batch went to the WAL together, after the single create
+    records = [json.loads(line) for line in (tmp_path / "tasks.wal").read_text().splitlines()]
+    assert [r["seq"] for r in records] == [1, 2, 3, 4, 5]
+
+
+def test_writes_can_require_the_current_revision(tmp_path):
+    async def run():
+        tasks = make_store(tmp_path)
+        first = await tasks.create(task("first"))
+        other = await tasks.create(task("other"))
+        assert (first["revision"], other["revision"]) == (1, 2)
+
+        updated = await tasks.update(first["id"], task("first", "Done"), revision=1)
+        assert updated["revision"] == 3
+        # A second writer still holding revision 1 is refused
+        with pytest.raises(PreconditionFailed) as e:
+            await tasks.update(first["id"], task("lost update"), revision=1)
+        assert e.value.current == 3
+        with pytest.raises(PreconditionFailed):
+            await tasks.delete(first["id"], revision=1)
+
+        with pytest.raises(RevisionMismatch) as e:
+            await tasks.batch([("update", other["id"], task("other", "Done")),
+                               ("delete", first["id"], None)], {0: 2, 1: 1})
+        assert e.value.conflicts == {1: (first["id"], 3)}
+        assert (await tasks.get(other["id"]))["status"] == "Pending"
+        assert await tasks.delete(first["id"], revision=3) == updated
+
+    asyncio.run(run())
+    # Revisions are part of the stored task, so they survive a restart
+    async def reload():
+        return await make_store(tmp_path).all()
+    assert [t["revision"] for t in asyncio.run(reload())] == [2]
+
+
+def test_shared_stores_allocate_unique_ids_and_see_each_others_writes(tmp_path):
+    # Two workers on one data directory: own stores, own file caches
+    async def run():
+        a = make_store(tmp_path, shared=True, compact_records=4)
+        b = make_store(tmp_path, shared=True, compact_records=4)
+        created = await asyncio.gather(*(s.create(task(f"t{i}")) for i in range(10) for s in (a, b)))
+        updated = await b.update(created[0]["id"], task("t0", "Done"), revision=created[0]["revision"])
+        with pytest.raises(PreconditionFailed):
+            await a.update(created[0]["id"], task("stale"), revision=created[0]["revision"])
+        # `b` sleeps through a compaction that trims the WAL past its seq: it reloads the snapshot
+        for i in range(10):
+            await a.create(task(f"more{i}"))
+        await a.compact()
+        late = make_store(tmp_path, shared=True)
+        return created, updated, await a.all(), await b.all(), await late.all(), a.version, b.version
+
+    created, updated, listed_a, listed_b, listed_late, version_a, version_b = asyncio.run(run())
+    assert sorted(t["id"] for t in created) == list(range(1, 21))
+    assert len({t["revision"] for t in created}) == 20
+    assert listed_a == listed_b == listed_late and len(listed_a) == 30
+    assert updated in listed_a and updated["status"] == "Done"
+    assert version_a == version_b == 31
@@ -0,0 +1,100 @@
+import sys, os, asyncio, time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+
+from utils.file_ops import _write_file
+from utils.task_store import JsonTaskLog, TaskStore
+
+TASKS = 100_000
+ROUNDS = 5
+
+# Wall-clock comparisons are noisy on shared machines, so the 100k-task
+# timing run is opt-in: RUN_BENCHMARKS=1 pytest -s tests/test_task_store_benchmark.py
+benchmark = pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="set RUN_BENCHMARKS=1 to run")
+
+
+def make_tasks(count):
+    return [{"id": i, "title": f"task {i}", "assignedTo": "editor123", "status": "Pending"} for i in range(1, count + 1)]
+
+
+def seed(path, count):
+    _write_file(path, {"tasks": make_tasks(count)})
+
+
+def rewrite_all(path, tasks):
+    """Previous behavior: scan the list, then reserialize every task."""
+    _write_file(path, {"tasks": tasks})
+
+
+def list_update(path, tasks, task_id, status):
+    for idx, existing in enumerate(tasks):
+        if existing["id"] == task_id:
+            tasks = [*tasks[:idx], {**existing, "status": status}, *tasks[idx + 1:]]
+            rewrite_all(path, tasks)
+            return tasks
+
+
+def list_create(path, tasks, title):
+    new_task = {"id": max(t["id"] for t in tasks) + 1, "title": title, "assignedTo": "editor123", "status": "Pending"}
+    tasks = [*tasks, new_task]
+    rewrite_all(path, tasks)
+    return tasks
+
+
+async def time_store(tmp_path, count):
+    tasks = TaskStore(JsonTaskLog(tmp_path / "tasks.json", tmp_path / "tasks.wal", tmp_path / "task_ids.json"),
+                      compact_records=10 * ROUNDS)
+    await tasks.load()
+    snapshot_size = (tmp_path / "tasks.json").stat().st_size
+
+    started = time.perf_counter()
+    for i in range(ROUNDS):
+        # Tasks near the end are the worst case for a linear scan
+        await tasks.update(count - i, {"title": f"task {count - i}", "assignedTo": "editor123", "status": "Done"})
+        await tasks.create({"title": f"new {i}", "assignedTo": "editor123", "status": "Pending"})
+    elapsed = (time.perf_counter() - started) / (2 * ROUNDS)
+
+    # Nothing but the WAL was written
+    assert (tmp_path / "tasks.json").stat().st_size == snapshot_size
+    assert (await tasks.get(count))["status"] == "Done"
+    assert (await tasks.get(count + ROUNDS))["title"] == f"new {ROUNDS - 1}"
+
+    # Filtered page: served from the status index instead of a scan of all tasks
+    started = time.perf_counter()
+    page, _ = await tasks.query(status="Done", limit=50)
+    query = time.perf_counter() - started
+    scan = [t for t in await tasks.all() if t["status"] == "Done"][:50]
+    assert page == scan
+    print(f"\n[{count} tasks] status query {query * 1000:.3f}ms")
+    return elapsed, (tmp_path / "tasks.wal").stat().st_size / (2 * ROUNDS)
+
+
+def test_task_store_appends_changes_to_the_wal(tmp_path):
+    """Updates and creates leave the snapshot alone and are served from the indexes."""
+    seed(tmp_path / "tasks.json", 1_000)
+    asyncio.run(time_store(tmp_path, 1_000))
+
+
+@benchmark
+def test_task_store_at_100k_tasks(tmp_path):
+    """
+    Update and create tasks in a 100k-task store: WAL appends vs. scanning
+    and rewriting tasks.json on every change. Run with `pytest -s` to see
+    the numbers.
+    """
+    seed(tmp_path / "tasks.json", TASKS)
+    indexed, bytes_per_change = asyncio.run(time_store(tmp_path, TASKS))
+
+    legacy_path = tmp_path / "legacy.json"
+    seed(legacy_path, TASKS)
+    tasks = make_tasks(TASKS)
+    started = time.perf_counter()
+    for i in range(ROUNDS):
+        tasks = list_update(legacy_path, tasks, TASKS - i, "Done")
+        tasks = list_create(legacy_path, tasks, f"new {i}")
+    rewrite = (time.perf_counter() - started) / (2 * ROUNDS)
+
+    print(f"\n[{TASKS} tasks] indexed+WAL {indexed * 1000:8.3f}ms/change ({bytes_per_change:.0f} B)  "
+          f"scan+rewrite {rewrite * 1000:8.2f}ms/change  ({rewrite / indexed:6.1f}x)")
+    assert indexed * 10 < rewrite
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+def timestamp_key(ts: str | None) -> int:
+    """Turn a DATETIME_FMT string ("YYYY-MM-DD HH:MM:SS") into a sortable integer."""
+    if not ts or len(ts) < 19:
+        return 0
+    try:
+        return int(ts[0:4] + ts[5:7] + ts[8:10] + ts[11:13] + ts[14:16] + ts[17:19])
+    except ValueError:
+        return 0
+
+
+class ActivityIndex:
+    """
+    Secondary indexes over the activity journal.
+
+    Every entry is identified by its sequence number (its position in the
+    journal). Per entry the index keeps only compact columns: where the line
+    lives on disk, its timestamp key and interned user/action ids. Per user and
+    per action it keeps the sorted list of matching sequence numbers, so a
+    filtered query walks only the entries that can match and reads just the
+    page it returns from disk.
+
+    Time ranges are bisected, whatever order entries were written in: an
+    entry not older than the newest one so far joins the in-order run (sorted
+    by time and by sequence number alike); any other (clock change, an
+    entry that overtook queued ones) goes to a list sorted by (time, seq).
+    """
+
+    def __init__(self):
+        self.segments = array("i")
+        self.offsets = array("q")
+        self.timestamps = array("q")
+        self._user_ids = array("i")
+        self._action_ids = array("i")
+        self._names: Dict[str, int] = {}
+        self._by_user: Dict[int, array] = {}
+        self._by_action: Dict[int, array] = {}
+        self._run_times = array("q")
+        self._run_seqs = array("q")
+        self._late: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _intern(self, name: Any) -> int:
+        key = str(name)
+        ident = self._names.get(key)
+        if ident is None:
+            ident = self._names[key] = len(self._names)
+        return ident
+
+    def add(self, segment: int, offset: int, entry: Dict[str, Any]) -> int:
+        """Index one entry and return its sequence number."""
+        seq = len(self.offsets)
+        user = self._intern(entry.get("user"))
+        action = self._intern(entry.get("action"))
+
+        self.segments.append(segment)
+        self.offsets.append(offset)
+        ts = timestamp_key(entry.get("timestamp"))
+        if not self._run_times or self._run_times[-1] <= ts:
+            self._run_times.append(ts)
+            self._run_seqs.append(seq)
+        else:
+            insort(self._late, (ts, seq))
+        self.timestamps.append(ts)
+        self._user_ids.append(user)
+        self._action_ids.append(action)
+        self._by_user.setdefault(user, array("q")).append(seq)
+        self._by_action.setdefault(action, array("q")).append(seq)
+        return seq
+
+    def search(
+        self,
+        user: str | None = None,
+        action: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        cursor: int | None = None,
+        limit: int = 50,
+    ) -> Tuple[List[int], int | None]:
+        """
+        Find matching sequence numbers, newest first.
+
+        - `start`/`end` are inclusive timestamp keys (see `timestamp_key`)
+        - `cursor` is exclusive: only entries older than it are returned
+        - Returns the page and the cursor for the next (older) page, or None
+        """
+        if limit <= 0:
+            return [], None
+
+        hi = len(self.offsets)
+        if cursor is not None:
+            hi = max(0, min(hi, cursor))
+
+        candidates: List[Tuple[int, Iterator[int]]] = []  # (size, seqs below hi, newest first)
+        if start is not None or end is not None:
+            candidates.append(self._time_range(start, end, hi))
+        user_id = action_id = None
+        if user is not None:
+            user_id = self._names.get(user)
+            candidates.append(self._below(self._by_user.get(user_id, array("q")), hi))
+        if action is not None:
+            action_id = self._names.get(action)
+            candidates.append(self._below(self._by_action.get(action_id, array("q")), hi))
+
+        if candidates:
+            # Walk the most selective candidates and check the other filters inline
+            seqs = min(candidates, key=lambda c: c[0])[1]
+        else:
+            seqs = iter(range(hi - 1, -1, -1))
+
+        page: List[int] = []
+        for seq in seqs:
+            if user_id is not None and self._user_ids[seq] != user_id:
+                continue
+            if action_id is not None and self._action_ids[seq] != action_id:
+                continue
+            if (start is not None and self.timestamps[seq] < start) or (end is not None and self.timestamps[seq] > end):
+                continue
+            if len(page) == limit:
+                return page, page[-1]
+            page.append(seq)
+        return page, None
+
+    @staticmethod
+    def _below(postings: array, hi: int) -> Tuple[int, Iterator[int]]:
+        """The sequence numbers of a posting list below `hi`, newest first."""
+        pos = bisect_left(postings, hi)
+        return pos, (postings[i] for i in range(pos - 1, -1, -1))
+
+    def _time_range(self, start: int | None, end: int | None, hi: int) -> Tuple[int, Iterator[int]]:
+        """Sequence numbers below `hi` with start <= timestamp <= end, newest first."""
+        first = 0 if start is None else bisect_left(self._run_times, start)
+        last = len(self._run_times) if end is None else bisect_right(self._run_times, end)
+        last = bisect_left(self._run_seqs, hi, first, max(first, last))
+        late_first = 0 if start is None else bisect_left(self._late, (start,))
+        late_last = len(self._late) if end is None else bisect_left(self._late, (end + 1,))
+        late = sorted((seq for _, seq in self._late[late_first:late_last] if seq < hi), reverse=True)
+        run = (self._run_seqs[i] for i in range(last - 1, first - 1, -1))
+        return last - first + len(late), heapq.merge(run, late, reverse=True)
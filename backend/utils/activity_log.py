@@ -0,0 +1,229 @@
+from __future__ import annotations
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from utils.activity_index import ActivityIndex
+from utils.constants import ACTIVITY_DIR, ACTIVITY_PATH, ACTIVITY_SEGMENT_BYTES, DATETIME_FMT, STORAGE_ENGINE
+from utils.locks import process_lock
+
+_SEGMENT_GLOB = "activity-*.jsonl"
+_TAIL_BLOCK = 64 * 1024
+
+
+class ActivityJournal:
+    """
+    Append-only activity log stored as JSON-lines segments.
+
+    - Each entry is one line appended to the newest segment, so a write costs
+      the same no matter how long the history is.
+    - Once a segment reaches `segment_max_bytes` a new one is started.
+    - `tail(n)` reads backwards from the end of the newest segment(s) and only
+      parses the lines it returns.
+    - A legacy `activity.json` is imported into the first segment on first use,
+      its local-time timestamps converted to UTC like the rest of the journal.
+    - Filtered queries go through an `ActivityIndex`, built on the first query
+      and brought up to date before each one by reading only the lines
+      appended since.
+    - Appends hold the directory's lock file, so worker processes sharing
+      the journal never interleave partial lines or rotate twice, and each
+      picks up segments the others started.
+    """
+
+    def __init__(self, directory: Path, segment_max_bytes: int = ACTIVITY_SEGMENT_BYTES,
+                 legacy_path: Path | None = None):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.legacy_path = legacy_path
+        self._lock = threading.Lock()
+        self._segments: List[Path] | None = None
+        self._index: ActivityIndex | None = None
+        # Where the index stops: (segment number, byte offset of the next line)
+        self._indexed: Tuple[int, int] = (0, 0)
+
+    # -----------------------------
+    # Segments
+    # -----------------------------
+    @staticmethod
+    def _segment_name(number: int) -> str:
+        return f"activity-{number:06d}.jsonl"
+
+    def _open(self) -> List[Path]:
+        """Discover existing segments, including ones other processes started (caller holds the lock)."""
+        if self._segments is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with process_lock(self.directory / "activity.lock"):
+                self._segments = sorted(self.directory.glob(_SEGMENT_GLOB))
+                if not self._segments:
+                    self._segments = [self.directory / self._segment_name(1)]
+                    self._segments[0].touch()
+                    self._import_legacy()
+        while True:
+            following = self.directory / self._segment_name(self._number(self._segments[-1]) + 1)
+            if not following.exists():
+                return self._segments
+            self._segments.append(following)
+
+    @staticmethod
+    def _number(segment: Path) -> int:
+        return int(segment.stem.split("-")[-1])
+
+    def _import_legacy(self) -> None:
+        if self.legacy_path is None or not Path(self.legacy_path).exists():
+            return
+        legacy = Path(self.legacy_path)
+        try:
+            with legacy.open("r", encoding="utf-8") as f:
+                logs = json.load(f).get("logs", [])
+        except json.JSONDecodeError:
+            logs = []
+        self._write_lines(from_local_time(entry) for entry in logs)
+        legacy.replace(legacy.with_suffix(legacy.suffix + ".migrated"))
+
+    def segments(self) -> List[Path]:
+        """All segment paths, oldest first."""
+        with self._lock:
+            return list(self._open())
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def _write_lines(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Append to the newest segment, or a new one once it is full (caller holds both locks)."""
+        data = b"".join((json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8") for e in entries)
+        if not data:
+            return
+        if self._segments[-1].stat().st_size >= self.segment_max_bytes:
+            segment = self.directory / self._segment_name(self._number(self._segments[-1]) + 1)
+            segment.touch()
+            self._segments.append(segment)
+        with self._segments[-1].open("ab") as f:
+            f.write(data)
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """Append a single entry to the newest segment."""
+        self.append_many([entry])
+
+    def append_many(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Append several entries with one write."""
+        with self._lock:
+            self._open()
+            with process_lock(self.directory / "activity.lock"):
+                self._open()  # segments another process started meanwhile
+                self._write_lines(entries)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over every entry, oldest first."""
+        for segment in self.segments():
+            with segment.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        """Return the newest `limit` entries, oldest first."""
+        if limit <= 0:
+            return []
+
+        lines: List[bytes] = []
+        for segment in reversed(self.segments()):
+            lines = _read_last_lines(segment, limit - len(lines)) + lines
+            if len(lines) >= limit:
+                break
+        return [json.loads(line) for line in lines]
+
+    def query(
+        self,
+        user: str | None = None,
+        action: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        cursor: int | None = None,
+        limit: int = 50,
+    ) -> Tuple[List[Dict[str, Any]], int | None]:
+        """
+        Return one page of matching entries (oldest first) and the cursor for
+        the next, older page. See `ActivityIndex.search` for the arguments.
+        """
+        with self._lock:
+            segments = list(self._open())
+            index = self._build_index()
+            seqs, next_cursor = index.search(user, action, start, end, cursor, limit)
+            locations = [(index.segments[seq], index.offsets[seq]) for seq in reversed(seqs)]
+
+        entries = []
+        handles: Dict[int, Any] = {}
+        try:
+            for segment, offset in locations:
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = segments[segment].open("rb")
+                f.seek(offset)
+                entries.append(json.loads(f.readline()))
+        finally:
+            for f in handles.values():
+                f.close()
+        return entries, next_cursor
+
+    def _build_index(self) -> ActivityIndex:
+        """
+        Index the lines appended since the last call, by this process or
+        another one; the first call scans every segment (caller holds the lock).
+        """
+        if self._index is None:
+            self._index, self._indexed = ActivityIndex(), (0, 0)
+        number, offset = self._indexed
+        for number in range(number, len(self._segments)):
+            offset = offset if number == self._indexed[0] else 0
+            with self._segments[number].open("rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # still being written
+                    if line.strip():
+                        self._index.add(number, offset, json.loads(line))
+                    offset += len(line)
+        self._indexed = (number, offset)
+        return self._index
+
+
+def from_local_time(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """A legacy entry (timestamp in the server's local time) with its timestamp in UTC."""
+    try:
+        local = datetime.strptime(entry.get("timestamp") or "", DATETIME_FMT)
+    except ValueError:
+        return entry
+    return {**entry, "timestamp": local.astimezone(timezone.utc).strftime(DATETIME_FMT)}
+
+
+def _read_last_lines(path: Path, count: int) -> List[bytes]:
+    """Read up to `count` trailing non-empty lines of `path` without scanning the whole file."""
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0 and buf.count(b"\n") <= count:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+
+    lines = buf.split(b"\n")
+    # The first line may be partial if we stopped reading mid-file
+    if pos > 0:
+        lines = lines[1:]
+    return [line for line in lines if line.strip()][-count:]
+
+
+# Shared journal used by add_activity and the activity routes
+if STORAGE_ENGINE == "sqlite":
+    from utils.sqlite_storage import SqliteActivityJournal, database
+    journal = SqliteActivityJournal(database)
+else:
+    journal = ActivityJournal(ACTIVITY_DIR, legacy_path=ACTIVITY_PATH)
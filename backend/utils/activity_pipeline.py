@@ -0,0 +1,153 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, Callable, Dict, List
+
+from utils.activity_log import ActivityJournal, journal
+from utils.constants import ACTIVITY_BACKPRESSURE, ACTIVITY_BATCH_SIZE, ACTIVITY_QUEUE_SIZE
+from utils.feeds import activity_feed
+
+BACKPRESSURE_POLICIES = ("inline", "drop_new", "drop_oldest")
+
+
+class ActivityPipeline:
+    """
+    Background writer for activity entries.
+
+    - `submit` only enqueues, so request handlers never wait on disk I/O.
+    - One writer task drains the queue and appends whatever has accumulated
+      (up to `batch_size`) with a single journal write in a worker thread.
+    - The queue is bounded; when it is full the backpressure policy decides:
+        inline      -> write the entry synchronously in the caller
+        drop_new    -> discard the new entry
+        drop_oldest -> discard the oldest queued entry to make room
+    - Until `start` is called (or after `stop`) entries are written inline.
+    - `on_written` is called with each entry once it is in the journal (in
+      journal order), so dropped or failed entries are never announced.
+    """
+
+    def __init__(
+        self,
+        journal: ActivityJournal,
+        maxsize: int = ACTIVITY_QUEUE_SIZE,
+        batch_size: int = ACTIVITY_BATCH_SIZE,
+        policy: str = ACTIVITY_BACKPRESSURE,
+        on_written: Callable[[Dict[str, Any]], Any] | None = None,
+    ):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.journal = journal
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.policy = policy
+        self.on_written = on_written
+        self.queued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._writer: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "policy": self.policy,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "capacity": self.maxsize,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+        }
+
+    # -----------------------------
+    # Producer side
+    # -----------------------------
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _write_inline(self, entries: List[Dict[str, Any]]) -> None:
+        self.journal.append_many(entries)
+        self._written(entries)
+
+    def _written(self, entries: List[Dict[str, Any]]) -> None:
+        self.written += len(entries)
+        self.batches += 1
+        if self.on_written is not None:
+            for entry in entries:
+                self.on_written(entry)
+
+    def submit(self, entry: Dict[str, Any]) -> None:
+        """Queue an entry for the writer task, applying backpressure when full."""
+        if not self.running or not self._on_loop():
+            self._write_inline([entry])
+            return
+
+        try:
+            self._queue.put_nowait(entry)
+            self.queued += 1
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == "drop_new":
+            self.dropped += 1
+        elif self.policy == "drop_oldest":
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self._queue.put_nowait(entry)
+            self.queued += 1
+            self.dropped += 1
+        else:
+            self._write_inline([entry])
+
+    # -----------------------------
+    # Writer side
+    # -----------------------------
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._writer = asyncio.create_task(self._run(), name="activity-writer")
+
+    async def stop(self) -> None:
+        """Drain everything still queued, then stop the writer."""
+        if self._writer is None:
+            return
+        await self._queue.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self.journal.append_many, batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                print("[ACTIVITY] batch write failed:", e)
+            else:
+                self._written(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+
+# Shared pipeline used by add_activity (written entries go to the live activity feed);
+# started and stopped by the app lifespan
+pipeline = ActivityPipeline(journal, on_written=activity_feed.publish)
@@ -1,20 +1,37 @@
-from fastapi import HTTPException
-from utils.file_ops import read_json
-from utils.constants import USERS_PATH
+from fastapi import Depends, Header, HTTPException
+from utils.tokens import Claims, InvalidToken, tokens
 
-def require_role(username: str, allowed_roles: set[str]) -> None:
+# Roles allowed to change tasks and documents
+EDITOR_ROLES = ("Admin", "Editor")
+
+
+def bearer_token(authorization: str | None) -> str | None:
+    scheme, _, token = (authorization or "").partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+def current_user(authorization: str | None = Header(None)) -> Claims:
     """
-    Ensure `username` exists and their role is in `allowed_roles`.
-    - Raises 401 if user not found
-    - Raises 403 if role not permitted
+    FastAPI dependency: the caller's verified token claims.
+    - Raises 401 if the Authorization header is missing or the token is invalid
     """
-    data = read_json(USERS_PATH)
-    users = data.get("users", [])
-    user = next((u for u in users if u.get("username") == username), None)
+    token = bearer_token(authorization)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Missing bearer token.",
+                            headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return tokens.verify(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
 
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found or not authenticated.")
 
-    role = user.get("role")
-    if role not in allowed_roles:
-        raise HTTPException(status_code=403, detail=f"Insufficient role: {role}. Required: {', '.join(sorted(allowed_roles))}.")
+def require_roles(*allowed_roles: str):
+    """
+    FastAPI dependency factory: like `current_user`, and
+    - Raises 403 if the token's role is not in `allowed_roles`
+    """
+    def dependency(user: Claims = Depends(current_user)) -> Claims:
+        if user.role not in allowed_roles:
+            raise HTTPException(status_code=403, detail=f"Insufficient role: {user.role}. Required: {', '.join(sorted(allowed_roles))}.")
+        return user
+    return dependency
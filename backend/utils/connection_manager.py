@@ -1,40 +1,284 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
 from fastapi import WebSocket
 from typing import Dict, List, Any
 
+try:
+    import orjson
+except ImportError:  # optional, faster encoder
+    orjson = None
+
+from utils.constants import WS_SEND_QUEUE_SIZE, WS_SLOW_CONSUMER_POLICY
+from utils.metrics import count_ws_messages, ws_broadcast_seconds, ws_connections
+from utils.pubsub import NODE_ID
+
+SLOW_CONSUMER_POLICIES = ("drop", "coalesce", "disconnect")
+# Message types a lagging client can receive merged: the latest full list,
+# and the latest cursor per connection from the diffs
+COALESCE_TYPES = {"presence", "presence_diff"}
+
+
+def encode_message(message: dict) -> str:
+    """Encode a message to JSON text once so every recipient gets the same buffer"""
+    if orjson is not None:
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class Outbox:
+    """
+    Bounded send queue plus a writer task for one WebSocket.
+
+    Broadcasts only enqueue, so a slow or stalled client delays nobody but
+    itself. When the queue is full the slow-consumer policy applies:
+        drop       -> discard the new message
+        coalesce   -> fold queued presence into the new presence message
+                      (see `_coalesce`), otherwise discard the new message
+        disconnect -> close the socket
+    Clients detect discarded edits from the gap in revision numbers and ask
+    for a resync.
+    """
+
+    def __init__(self, ws: WebSocket, maxsize: int, policy: str):
+        self.ws = ws
+        self.maxsize = maxsize
+        self.policy = policy
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._queue: deque = deque()
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.create_task(self._run())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_latency_ms": round(self.last_latency * 1000, 3),
+            "avg_latency_ms": round(self._total_latency / self.sent * 1000, 3) if self.sent else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+    def put(self, msg_type: str | None, text: str) -> bool:
+        """Queue an encoded message; returns False when the socket should be disconnected."""
+        if self.closed:
+            return True
+
+        if len(self._queue) >= self.maxsize:
+            if self.policy == "disconnect":
+                return False
+            if self.policy == "coalesce" and msg_type in COALESCE_TYPES:
+                text = self._coalesce(msg_type, text)
+            if len(self._queue) >= self.maxsize:
+                self.dropped += 1
+                return True
+
+        self._queue.append((time.perf_counter(), msg_type, text))
+        self._idle.clear()
+        self._ready.set()
+        return True
+
+    def _coalesce(self, msg_type: str, text: str) -> str:
+        """
+        Remove queued presence that the new message makes redundant.
+        - presence (full list): replaces every queued presence message
+        - presence_diff: absorbs the diffs queued after the last full list,
+          keeping the latest cursor per connection, so a lagging client loses
+          no cursor (each diff only carries the cursors that moved)
+        """
+        kept: deque = deque()
+        diffs: List[str] = []
+        for item in self._queue:
+            if item[1] == "presence_diff" or (item[1] == "presence" and msg_type == "presence"):
+                self.coalesced += 1
+                if item[1] == "presence_diff":
+                    diffs.append(item[2])
+                continue
+            if item[1] == "presence":
+                diffs = []  # already reflected in the full list queued after them
+            kept.append(item)
+        self._queue = kept
+        if msg_type == "presence_diff" and diffs:
+            latest: Dict[str, Dict[str, Any]] = {}
+            for queued in (*diffs, text):
+                for entry in json.loads(queued)["data"]:
+                    latest[entry["id"]] = entry
+            text = encode_message({"type": "presence_diff", "data": list(latest.values())})
+        return text
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been sent."""
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        self.closed = True
+        self._task.cancel()
+        self._queue.clear()
+        self._idle.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                enqueued, _, text = self._queue.popleft()
+                try:
+                    await self.ws.send_text(text)
+                except Exception:
+                    # Client went away; the receive loop handles the disconnect
+                    self.closed = True
+                    self._queue.clear()
+                    break
+                latency = time.perf_counter() - enqueued
+                self.sent += 1
+                self.last_latency = latency
+                self.max_latency = max(self.max_latency, latency)
+                self._total_latency += latency
+            self._ready.clear()
+            self._idle.set()
+            if self.closed:
+                return
+
+
+class Connection:
+    """One registered WebSocket: its user, last cursor position and send queue"""
+    __slots__ = ("id", "ws", "user", "cursor", "outbox")
+    _ids = itertools.count(1)
+
+    def __init__(self, ws: WebSocket, user: str, cursor: int | None = None):
+        # Unique across workers, so presence from several processes can be merged
+        self.id = f"{NODE_ID}-{next(Connection._ids)}"
+        self.ws = ws
+        self.user = user
+        self.cursor = cursor
+        self.outbox: Outbox | None = None
+
+    def presence(self) -> Dict[str, Any]:
+        return {"id": self.id, "user": self.user, "cursor": self.cursor}
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[Dict[str, Any]] = []
+    """
+    Registry of live WebSockets keyed by socket (O(1) lookup, register and
+    disconnect) with a secondary index by username. Connections, queued
+    messages and broadcast time are reported under `channel` on /metrics.
+    """
+
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE, policy: str = WS_SLOW_CONSUMER_POLICY,
+                 channel: str = "document"):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.channel = channel
+        self.queue_size = queue_size
+        self.policy = policy
+        self._connections: Dict[WebSocket, Connection] = {}
+        self._by_user: Dict[str, Dict[WebSocket, Connection]] = {}
 
     async def connect(self, websocket: WebSocket):
         """Accept a new WebSocket connection"""
         await websocket.accept()
 
+    def register(self, websocket: WebSocket, user: str) -> Connection:
+        """Track an accepted WebSocket for broadcasts and presence"""
+        connection = Connection(websocket, user)
+        if websocket not in self._connections:
+            ws_connections.inc(channel=self.channel)
+        self._connections[websocket] = connection
+        self._by_user.setdefault(user, {})[websocket] = connection
+        return connection
+
     def disconnect(self, websocket: WebSocket):
-        """Remove a disconnected WebSocket from the active list"""
-        self.active_connections = [
-            conn for conn in self.active_connections if conn["ws"] != websocket
-        ]
+        """Remove a disconnected WebSocket from the registry"""
+        connection = self._connections.pop(websocket, None)
+        if connection is None:
+            return
+        ws_connections.dec(channel=self.channel)
+        same_user = self._by_user.get(connection.user)
+        if same_user is not None:
+            same_user.pop(websocket, None)
+            if not same_user:
+                del self._by_user[connection.user]
+        if connection.outbox is not None:
+            asyncio.ensure_future(connection.outbox.close())
+
+    @property
+    def active_connections(self) -> List[Connection]:
+        return list(self._connections.values())
+
+    def get(self, websocket: WebSocket) -> Connection | None:
+        return self._connections.get(websocket)
+
+    def connections_for(self, user: str) -> List[Connection]:
+        """All connections opened by `user` (e.g. several tabs)"""
+        return list(self._by_user.get(user, {}).values())
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    def _outbox(self, connection: Connection) -> Outbox:
+        if connection.outbox is None:
+            connection.outbox = Outbox(connection.ws, self.queue_size, self.policy)
+        return connection.outbox
+
+    def _enqueue(self, connection: Connection, msg_type: str | None, text: str) -> None:
+        count_ws_messages(self.channel, "out")
+        if not self._outbox(connection).put(msg_type, text):
+            self._drop_slow_consumer(connection)
+
+    def _drop_slow_consumer(self, connection: Connection) -> None:
+        ws = connection.ws
+        self.disconnect(ws)
+
+        async def close():
+            try:
+                await ws.close(code=1013, reason="Too slow to keep up")
+            except Exception:
+                pass
+
+        asyncio.ensure_future(close())
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for one WebSocket, ordered after anything already queued for it"""
+        connection = self._connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, message.get("type"), encode_message(message))
 
     async def broadcast(self, message: dict, sender: WebSocket | None = None):
-        """Broadcast a message to all connected WebSockets except the sender"""
-        for connection in self.active_connections:
-            ws = connection["ws"]
-            if connection["ws"] != sender:
-                await connection["ws"].send_json(message)
+        """Encode a message once and queue it for all connected WebSockets except the sender"""
+        with ws_broadcast_seconds.time(channel=self.channel):
+            msg_type, text = message.get("type"), encode_message(message)
+            for connection in list(self._connections.values()):
+                if connection.ws is not sender:
+                    self._enqueue(connection, msg_type, text)
 
-    def update_cursor(self, websocket: WebSocket, position: int):
-        """Update the cursor position for a specific user"""
-        for connection in self.active_connections:
-            if connection["ws"] == websocket:
-                connection["cursor"] = position
-                break
+    async def drain(self):
+        """Wait until every queued message has been sent"""
+        await asyncio.gather(*(
+            conn.outbox.drain() for conn in self._connections.values() if conn.outbox is not None
+        ))
 
-    def get_presence(self) -> list[dict]:
+    def stats(self) -> list[dict]:
+        """Per-connection send queue depth, drops and send latency"""
         return [
-            {"user": conn["user"], "cursor": conn.get("cursor", None)}
-            for conn in self.active_connections
+            {"user": conn.user, **(conn.outbox.stats() if conn.outbox is not None else {})}
+            for conn in self._connections.values()
         ]
 
-    
-# Shared global instance for all WebSocket routes
-manager = ConnectionManager()
+    def update_cursor(self, websocket: WebSocket, position: int):
+        """Update the cursor position for a specific user"""
+        connection = self._connections.get(websocket)
+        if connection is not None:
+            connection.cursor = position
+
+    def get_presence(self) -> list[dict]:
+        return [conn.presence() for conn in self._connections.values()]
@@ -1,13 +1,91 @@
+import os
 from pathlib import Path
 
 BACKEND_ROOT = Path(__file__).resolve().parents[1]
-DATA_DIR = BACKEND_ROOT / "data"
+DATA_DIR = Path(os.getenv("DATA_DIR", BACKEND_ROOT / "data"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# Where users, tasks, document snapshots and activity are kept: "json" (files in
+# DATA_DIR) or "sqlite" (one database; import the JSON files with `python -m utils.migrate`)
+STORAGE_ENGINE = os.getenv("STORAGE_ENGINE", "json")
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH", DATA_DIR / "collab.db"))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+
 USERS_PATH = DATA_DIR / "users.json"
 TASKS_PATH = DATA_DIR / "tasks.json"
 DOCUMENT_PATH = DATA_DIR / "document.json"
-ACTIVITY_PATH = DATA_DIR / "activity.json"
+ACTIVITY_PATH = DATA_DIR / "activity.json"  # legacy single-file log, imported into ACTIVITY_DIR
+ACTIVITY_DIR = DATA_DIR / "activity"
 
 ROLES = ["Admin", "Editor", "Viewer"]
-DATETIME_FMT = "%Y-%m-%d %H:%M:%S"
\ No newline at end of file
+DATETIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Seconds between background flushes of the in-memory data store (0 = write-through)
+STORE_FLUSH_INTERVAL = float(os.getenv("STORE_FLUSH_INTERVAL", "0.5"))
+
+# Size at which the activity journal starts a new segment file
+ACTIVITY_SEGMENT_BYTES = int(os.getenv("ACTIVITY_SEGMENT_BYTES", str(1024 * 1024)))
+
+# Activity logging pipeline: queue bound, max entries per write, and what to do when full
+ACTIVITY_QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+ACTIVITY_BACKPRESSURE = os.getenv("ACTIVITY_BACKPRESSURE", "inline")  # inline | drop_new | drop_oldest
+
+# Task changes go to a WAL; tasks.json is rewritten once this many have accumulated.
+# Task ids come from a counter kept in TASK_IDS_PATH.
+TASKS_WAL_PATH = DATA_DIR / "tasks.wal"
+TASK_IDS_PATH = DATA_DIR / "task_ids.json"
+TASK_COMPACT_RECORDS = int(os.getenv("TASK_COMPACT_RECORDS", "1000"))
+
+# Password hashing (PBKDF2-HMAC-SHA256); raise the iteration count as hardware gets faster
+PASSWORD_ITERATIONS = int(os.getenv("PASSWORD_ITERATIONS", "200000"))
+
+# Signed session tokens: lifetime, revocation list, and signing key (generated
+# into TOKEN_SECRET_PATH on first start unless TOKEN_SECRET is set; shared by all workers)
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", str(12 * 3600)))
+TOKEN_SECRET = os.getenv("TOKEN_SECRET", "")
+TOKEN_SECRET_PATH = DATA_DIR / "token_secret"
+REVOKED_TOKENS_PATH = DATA_DIR / "revoked_tokens.json"
+
+# Number of past document edits kept for transforming late client ops
+OT_HISTORY_LIMIT = int(os.getenv("OT_HISTORY_LIMIT", "1000"))
+
+# Live document persistence: edits go to a WAL, snapshots are compacted into DOCUMENT_PATH
+DOCUMENT_WAL_PATH = DATA_DIR / "document.wal"
+DOC_SNAPSHOT_IDLE = float(os.getenv("DOC_SNAPSHOT_IDLE", "2"))  # seconds without edits
+DOC_SNAPSHOT_INTERVAL = float(os.getenv("DOC_SNAPSHOT_INTERVAL", "30"))  # max seconds between snapshots
+DOC_EDIT_ACTIVITY_WINDOW = float(os.getenv("DOC_EDIT_ACTIVITY_WINDOW", "300"))  # one "edited document" per user per window
+
+# Every document revision is kept in <wal name>.history: a full copy of the content every
+# REVISION_SNAPSHOT_EVERY revisions and the edit ops in between; payloads of at least
+# REVISION_COMPRESS_MIN bytes are stored zlib-compressed
+REVISION_SNAPSHOT_EVERY = int(os.getenv("REVISION_SNAPSHOT_EVERY", "50"))
+REVISION_COMPRESS_MIN = int(os.getenv("REVISION_COMPRESS_MIN", "256"))
+
+# Additional documents live at DOCUMENTS_DIR/<id>.json (+ <id>.wal); the default
+# document keeps DOCUMENT_PATH / DOCUMENT_WAL_PATH
+DOCUMENTS_DIR = DATA_DIR / "documents"
+DEFAULT_DOCUMENT_ID = "main"
+
+# Per-WebSocket send queue bound and what to do with clients that fall behind
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce")  # drop | coalesce | disconnect
+
+# Unix socket of the pub/sub broker that lets several workers share DATA_DIR (`python -m utils.pubsub`);
+# empty = single process, nothing is forwarded
+PUBSUB_BROKER = os.getenv("PUBSUB_BROKER", "")
+
+# Encoded GET responses (document, users, task lists) kept for reuse until their resource changes
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+# Task and activity change events kept per feed for clients resuming after a reconnect
+FEED_BUFFER_SIZE = int(os.getenv("FEED_BUFFER_SIZE", "1000"))
+
+# Window (seconds) of the messages-per-second gauges on /metrics
+METRICS_RATE_WINDOW = int(os.getenv("METRICS_RATE_WINDOW", "10"))
+# Sampling profiler behind /metrics/profile: on from startup or not, and seconds between samples
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+
+# Cursor moves are batched into presence ticks at this rate
+PRESENCE_TICK_HZ = float(os.getenv("PRESENCE_TICK_HZ", "20"))
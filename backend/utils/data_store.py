@@ -0,0 +1,237 @@
+from __future__ import annotations
+import asyncio
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable
+
+from utils.locks import process_lock
+
+
+class DataStore:
+    """
+    Resident cache for the backend's JSON files.
+
+    - Reads are served from memory; a file is parsed from disk only once.
+    - Writes replace the cached payload and mark the file dirty.
+    - A background flusher persists dirty files every `flush_interval` seconds
+      using the writer passed in (atomic replace in file_ops, or a row in
+      the SQLite engine's documents table).
+    - While the flusher is not running (tests, scripts) writes go straight to disk.
+    - With a `stamp` function (file identity and mtime, or a row counter),
+      `refresh` reloads a file that was changed outside this store.
+
+    Cached payloads are shared, so callers must not mutate what `get` returns in
+    place; build a new object and hand it to `put` instead.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Path], Dict[str, Any]],
+        writer: Callable[[Path, Dict[str, Any]], None],
+        flush_interval: float = 0.5,
+        exists: Callable[[Path], bool] = Path.exists,
+        stamp: Callable[[Path], Any] | None = None,
+    ):
+        self._loader = loader
+        self._writer = writer
+        self._exists = exists
+        self._stamp = stamp
+        self.flush_interval = flush_interval
+        self._cache: Dict[Path, Dict[str, Any]] = {}
+        self._versions: Dict[Path, int] = {}
+        # Storage stamp of each cached file as of its last load or write
+        self._stamps: Dict[Path, Any] = {}
+        self._dirty: set[Path] = set()
+        self._lock = threading.Lock()
+        # Serializes writes of one file; held while its payload is written
+        self._file_locks: Dict[Path, threading.Lock] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _key(path: Path | str) -> Path:
+        return Path(path).resolve()
+
+    # -----------------------------
+    # Reads / writes
+    # -----------------------------
+    def preload(self, paths: Iterable[Path | str]) -> None:
+        """Parse the given files into memory ahead of the first request."""
+        for path in paths:
+            self.get(path)
+
+    def get(self, path: Path | str) -> Dict[str, Any]:
+        """Return the cached payload for `path`, loading it on first access."""
+        key = self._key(path)
+        data = self._cache.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            if key not in self._cache:
+                if self._stamp is not None:
+                    self._stamps[key] = self._stamp(key)
+                self._cache[key] = self._loader(key)
+                self._versions.setdefault(key, 0)
+            return self._cache[key]
+
+    def refresh(self, path: Path | str) -> bool:
+        """
+        Reload `path` if its storage changed since this store last loaded or
+        wrote it (another process wrote it); True if it was reloaded, which
+        also bumps its version. Pending writes of our own take precedence.
+        """
+        key = self._key(path)
+        if self._stamp is None or key not in self._cache:
+            return False
+        with self._file_lock(key):
+            current = self._stamp(key)
+            with self._lock:
+                if key in self._dirty or current == self._stamps.get(key):
+                    return False
+            data = self._loader(key)
+            with self._lock:
+                if key in self._dirty:
+                    return False
+                self._cache[key] = data
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._stamps[key] = current
+            return True
+
+    def put(self, path: Path | str, data: Dict[str, Any]) -> None:
+        """Replace the payload for `path` and schedule it for persistence."""
+        key = self._key(path)
+        with self._lock:
+            self._cache[key] = data
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._dirty.add(key)
+            if self.running:
+                return
+
+        self._flush_key(key)
+
+    async def aget(self, path: Path | str) -> Dict[str, Any]:
+        """`get` for async callers: cache misses are loaded in a worker thread."""
+        data = self._cache.get(self._key(path))
+        if data is not None:
+            return data
+        return await asyncio.to_thread(self.get, path)
+
+    def update(self, path: Path | str, change: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Read-modify-write `path` as one step, also against other processes:
+        under its lock file (`<path>.lock`) reload it if it was written
+        elsewhere, put `change(payload)` and write that through. Returns it.
+        """
+        key = self._key(path)
+        with process_lock(key.with_name(key.name + ".lock")):
+            self.get(key)
+            self.refresh(key)
+            data = change(self.get(key))
+            self.put(key, data)
+            self.flush([key])
+        return data
+
+    async def aupdate(self, path: Path | str, change: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+        """`update` for async callers (in a worker thread)."""
+        return await asyncio.to_thread(self.update, path, change)
+
+    async def aput(self, path: Path | str, data: Dict[str, Any]) -> None:
+        """`put` for async callers: write-through happens in a worker thread."""
+        if self.running:
+            self.put(path, data)
+        else:
+            await asyncio.to_thread(self.put, path, data)
+
+    def evict(self, path: Path | str) -> None:
+        """Persist `path` if dirty and drop it from memory; the next `get` reloads it."""
+        self._flush_key(self._key(path), evict=True)
+
+    async def aevict(self, path: Path | str) -> None:
+        """`evict` for async callers: the final write happens in a worker thread."""
+        await asyncio.to_thread(self.evict, path)
+
+    def exists(self, path: Path | str) -> bool:
+        """True if `path` has been written (in memory or in storage)."""
+        key = self._key(path)
+        return key in self._dirty or self._exists(key)
+
+    def version(self, path: Path | str) -> int:
+        """Monotonic counter bumped on every `put` to `path`."""
+        return self._versions.get(self._key(path), 0)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def flush(self, paths: Iterable[Path | str] | None = None) -> None:
+        """
+        Write dirty files to disk now (all of them, or only `paths`).
+        A failed write leaves its file dirty for the next flush; the other
+        files are still written and the first error is raised afterwards.
+        """
+        with self._lock:
+            keys = list(self._dirty if paths is None else self._dirty & {self._key(p) for p in paths})
+
+        error: Exception | None = None
+        for key in keys:
+            try:
+                self._flush_key(key)
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _flush_key(self, key: Path, evict: bool = False) -> None:
+        # The payload is taken and written under the file's own lock, so two
+        # flushes of one file (flusher thread and an explicit flush) cannot
+        # finish out of order and leave an older payload on disk.
+        with self._file_lock(key):
+            with self._lock:
+                dirty = key in self._dirty
+                self._dirty.discard(key)
+                data = self._cache.get(key)
+            if dirty and data is not None:
+                try:
+                    self._writer(key, data)
+                    if self._stamp is not None:
+                        self._stamps[key] = self._stamp(key)
+                except Exception:
+                    with self._lock:
+                        self._dirty.add(key)
+                    raise
+            if evict:
+                with self._lock:
+                    # A put that landed after the write keeps its (newer) payload
+                    if key not in self._dirty:
+                        self._cache.pop(key, None)
+
+    def _file_lock(self, key: Path) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(key, threading.Lock())
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background flusher (no-op when the interval is 0)."""
+        if self.running or self.flush_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-store-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and persist anything still pending."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print("[STORE] flush failed:", e)
@@ -0,0 +1,260 @@
+from __future__ import annotations
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from utils import ot
+from utils.constants import (
+    DATETIME_FMT,
+    DOCUMENT_PATH,
+    DOCUMENT_WAL_PATH,
+    DOC_EDIT_ACTIVITY_WINDOW,
+    DOC_SNAPSHOT_IDLE,
+    DOC_SNAPSHOT_INTERVAL,
+    OT_HISTORY_LIMIT,
+)
+from utils.file_ops import aread_json, store
+from utils.revision_history import RevisionHistory
+from utils.wal import WriteAheadLog
+
+
+class StaleRevision(Exception):
+    """The client's base revision is older than the retained op history."""
+
+
+class DocumentSession:
+    """
+    Live, revisioned state of the shared document.
+
+    - Every accepted edit bumps `revision` and is kept in a bounded history so
+      edits made against an older revision can be transformed forward.
+    - Callers hold `lock` around `apply`/`record` and the broadcast that
+      follows, so peers receive ops in revision order.
+    - `record` appends the edit to a write-ahead log; the full document is
+      only written when a snapshot is taken (after `snapshot_idle` seconds
+      without edits, or at least every `snapshot_interval` seconds), which
+      also trims the WAL. `load` replays the WAL on top of the last snapshot.
+    - `shared` sessions are one of several workers' copies of the same
+      document. The WAL is then the common edit log: edits are made under
+      `exclusive()` after `sync` has applied what other workers appended.
+    - `history` keeps every revision (the WAL only holds those since the last
+      snapshot); `record` appends to both.
+    """
+
+    def __init__(
+        self,
+        path: Path = DOCUMENT_PATH,
+        wal_path: Path = DOCUMENT_WAL_PATH,
+        history_limit: int = OT_HISTORY_LIMIT,
+        snapshot_idle: float = DOC_SNAPSHOT_IDLE,
+        snapshot_interval: float = DOC_SNAPSHOT_INTERVAL,
+        activity_window: float = DOC_EDIT_ACTIVITY_WINDOW,
+        shared: bool = False,
+        history_path: Path | None = None,
+    ):
+        self.path = path
+        self.shared = shared
+        self.wal = WriteAheadLog(wal_path)
+        self.history = RevisionHistory(history_path or Path(wal_path).with_suffix(".history"))
+        self.history_limit = history_limit
+        self.snapshot_idle = snapshot_idle
+        self.snapshot_interval = snapshot_interval
+        self.activity_window = activity_window
+        self.lock = asyncio.Lock()
+        self.document: Dict[str, Any] | None = None
+        self.revision = 0
+        self._history: List[List[ot.Op]] = []
+        self._snapshot_revision = 0
+        self._last_snapshot = time.monotonic()
+        self._idle_timer: asyncio.TimerHandle | None = None
+        self._snapshot_task: asyncio.Task | None = None
+        self._edit_logged: Dict[str, float] = {}
+        self._wal_position: Tuple[int, bytes, int] | None = None
+
+    async def load(self) -> Dict[str, Any]:
+        """Load the last snapshot and replay the WAL on first use."""
+        if self.document is None:
+            if self.shared:
+                # Other workers write snapshots too; don't trust this process's cache
+                await store.aevict(self.path)
+            data = await aread_json(self.path)
+            self.document = data.get("document") or {}
+            self.revision = data.get("revision", 0)
+            self._snapshot_revision = self.revision
+            self._history = []
+            self._wal_position = None
+            for record in await asyncio.to_thread(self.wal.replay, self.revision):
+                self._apply_record(record)
+        return self.document
+
+    def _apply_record(self, record: Dict[str, Any]) -> None:
+        self.document = {
+            **self.document,
+            "content": ot.apply(self.document.get("content", ""), record["ops"]),
+            **record["meta"],
+        }
+        self.revision = record["seq"]
+        self._history.append(record["ops"])
+        if len(self._history) > self.history_limit:
+            del self._history[: len(self._history) - self.history_limit]
+
+    async def sync(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Shared sessions: apply edits other workers have logged since our
+        revision. Returns (WAL records applied, whether the session had to be
+        reloaded from the snapshot because the WAL was trimmed past us).
+        """
+        if not self.shared:
+            return [], False
+        records, self._wal_position = await asyncio.to_thread(self.wal.read_since, self._wal_position)
+        records = [r for r in records if r["seq"] > self.revision]
+        if records and records[0]["seq"] != self.revision + 1:
+            self.document = None
+            await self.load()
+            return [], True
+        for record in records:
+            self._apply_record(record)
+        return records, False
+
+    @asynccontextmanager
+    async def exclusive(self) -> AsyncIterator[None]:
+        """Shared sessions: hold the WAL against other workers while editing."""
+        fd = await asyncio.to_thread(self.wal.lock) if self.shared else None
+        try:
+            yield
+        finally:
+            self.wal.unlock(fd)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"document": self.document or {}, "revision": self.revision}
+
+    # -----------------------------
+    # Edits
+    # -----------------------------
+    def apply(self, base_revision: int, ops: Any, user: str) -> Tuple[int, List[ot.Op]]:
+        """
+        Transform `ops` made against `base_revision` over everything applied
+        since, apply them and return (new revision, transformed ops).
+        """
+        if not isinstance(base_revision, int) or base_revision > self.revision or base_revision < 0:
+            raise ValueError(f"Invalid revision: {base_revision!r}")
+        missed = self.revision - base_revision
+        if missed > len(self._history):
+            raise StaleRevision(f"Revision {base_revision} is too old")
+
+        content = self.document.get("content", "")
+        # Validate against the text the client saw, then move the edit forward
+        base_length = len(content)
+        for past in reversed(self._history[len(self._history) - missed:]):
+            base_length -= sum(len(op["text"]) if op["type"] == "insert" else -op["length"] for op in past)
+        ops = ot.validate(ops, base_length)
+        for past in self._history[len(self._history) - missed:]:
+            ops, _ = ot.transform(ops, past, a_first=False)
+
+        self.document = {
+            **self.document,
+            "content": ot.apply(content, ops),
+            "lastEditedBy": user,
+            "lastUpdated": datetime.now(timezone.utc).strftime(DATETIME_FMT),
+        }
+        self.revision += 1
+        self._history.append(ops)
+        if len(self._history) > self.history_limit:
+            del self._history[: len(self._history) - self.history_limit]
+        return self.revision, ops
+
+    def replace(self, document: Dict[str, Any], user: str) -> Tuple[int, List[ot.Op]]:
+        """Apply a full-document write (REST save) as an edit against the current revision."""
+        ops = ot.diff(self.document.get("content", ""), document.get("content", ""))
+        revision, ops = self.apply(self.revision, ops, user)
+        self.document["title"] = document.get("title", self.document.get("title"))
+        if document.get("lastUpdated"):
+            self.document["lastUpdated"] = document["lastUpdated"]
+        return revision, ops
+
+    def op_message(self, revision: int, ops: List[ot.Op], user: str) -> Dict[str, Any]:
+        """Message broadcast to peers for an accepted edit."""
+        return {
+            "type": "op",
+            "data": {
+                "revision": revision,
+                "ops": ops,
+                "user": user,
+                "title": self.document.get("title"),
+                "lastUpdated": self.document.get("lastUpdated"),
+            },
+        }
+
+    async def record(self, revision: int, ops: List[ot.Op]) -> None:
+        """Make an applied edit durable in the WAL, add it to the history and schedule a snapshot."""
+        meta = {k: self.document.get(k) for k in ("title", "lastEditedBy", "lastUpdated")}
+        content = self.document.get("content", "")
+
+        def write():
+            self.wal.append({"seq": revision, "ops": ops, "meta": meta})
+            self.history.append(revision, ops, content, meta)
+
+        await asyncio.to_thread(write)
+        self._schedule_snapshot()
+
+    def should_log_edit(self, user: str) -> bool:
+        """True for a user's first edit in each activity window (edits are logged once per window)."""
+        now = time.monotonic()
+        last = self._edit_logged.get(user)
+        if last is not None and now - last < self.activity_window:
+            return False
+        self._edit_logged[user] = now
+        return True
+
+    # -----------------------------
+    # Snapshots
+    # -----------------------------
+    def _schedule_snapshot(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+            self._start_snapshot()
+        else:
+            self._idle_timer = asyncio.get_running_loop().call_later(self.snapshot_idle, self._start_snapshot)
+
+    def _start_snapshot(self) -> None:
+        self._idle_timer = None
+        if self._snapshot_task is None or self._snapshot_task.done():
+            self._snapshot_task = asyncio.create_task(self.compact())
+
+    async def compact(self) -> None:
+        """Write the current document to DOCUMENT_PATH and trim the WAL it covers."""
+        if self.document is None or self.revision == self._snapshot_revision:
+            return
+        document, revision = self.document, self.revision
+        self._last_snapshot = time.monotonic()
+
+        def write():
+            if not self.shared:
+                store.put(self.path, {"document": document, "revision": revision})
+                store.flush([self.path])
+                self.wal.discard_through(revision)
+                return
+            with self.wal.exclusive():
+                store.evict(self.path)
+                if store.get(self.path).get("revision", 0) < revision:
+                    store.put(self.path, {"document": document, "revision": revision})
+                    store.flush([self.path])
+                # Keep recent edits so lagging workers can still catch up (and
+                # can tell when they fell too far behind)
+                self.wal.discard_through(revision - self.history_limit)
+
+        await asyncio.to_thread(write)
+        self._snapshot_revision = revision
+
+    async def close(self) -> None:
+        """Take a final snapshot (server shutdown)."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        await self.compact()
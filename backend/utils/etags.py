@@ -0,0 +1,43 @@
+"""
+Revision ETags and If-Match preconditions.
+
+Every document and task carries a revision number that grows with each
+write. Its ETag is `"<kind>-<id>-<revision>"`; a client sending it back in
+If-Match only overwrites the version it has seen, and gets 412 otherwise.
+"""
+from __future__ import annotations
+from typing import List
+
+
+class PreconditionFailed(Exception):
+    """A write was made against a revision that is no longer current."""
+
+    def __init__(self, current: int | None = None):
+        super().__init__("The resource has changed" if current is None else f"The resource is at revision {current}")
+        self.current = current
+
+
+def make_etag(kind: str, resource_id: int | str, revision: int) -> str:
+    return f'"{kind}-{resource_id}-{revision}"'
+
+
+def parse_etags(header: str | None) -> List[str]:
+    """Entity tags listed in an If-Match / If-None-Match header."""
+    return [tag.strip() for tag in (header or "").split(",") if tag.strip()]
+
+
+def if_match_revision(header: str | None, kind: str, resource_id: int | str) -> int | None:
+    """
+    The revision an If-Match header requires, or None when it requires none
+    (no header, or `*`). Raises PreconditionFailed unless it holds exactly
+    one strong ETag of this resource (anything else can never match).
+    """
+    tags = parse_etags(header)
+    if not tags or "*" in tags:
+        return None
+    prefix = f'"{kind}-{resource_id}-'
+    revisions = {tag[len(prefix):-1] for tag in tags if tag.startswith(prefix) and tag.endswith('"')}
+    revisions = {int(r) for r in revisions if r.isdigit()}
+    if len(revisions) != 1:
+        raise PreconditionFailed()
+    return revisions.pop()
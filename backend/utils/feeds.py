@@ -0,0 +1,88 @@
+"""
+Live change feeds for tasks and activity (`/ws/feed/{name}`).
+
+Every change is published as an event numbered with the feed's sequence:
+
+    {"type": "event", "seq": 42, "data": {...}}
+
+The last FEED_BUFFER_SIZE events stay in memory, so a client reconnecting
+with the last `seq` and `epoch` it saw only receives what it missed. When the
+gap is no longer buffered, or the epoch differs (server restart, another
+worker), the client is told to reload the full list instead.
+"""
+from __future__ import annotations
+import asyncio
+import itertools
+import uuid
+from collections import deque
+from typing import Any, Dict, List
+
+from utils.connection_manager import ConnectionManager
+from utils.constants import FEED_BUFFER_SIZE
+from utils.pubsub import LocalBus, bus as default_bus
+
+
+class Feed:
+    """
+    One change stream with a ring buffer of its recent events.
+
+    - `publish` is synchronous so it can be called from any write path; the
+      event is encoded once and queued for every subscriber.
+    - With several workers, events are forwarded over the bus and each worker
+      numbers them in its own sequence (its `epoch`), in arrival order.
+    """
+
+    def __init__(self, name: str, capacity: int = FEED_BUFFER_SIZE, bus: LocalBus = default_bus):
+        self.name = name
+        self.channel = f"feed:{name}"
+        self.bus = bus
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.connections = ConnectionManager(channel=self.channel)
+        self._events: deque = deque(maxlen=capacity)
+        bus.subscribe(self.channel, self.receive)
+
+    def publish(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Number, buffer and broadcast a change made on this worker."""
+        event = self._append(data)
+        if self.bus.distributed:
+            asyncio.ensure_future(self.bus.publish(self.channel, {"node": self.bus.node, "data": data}))
+        return event
+
+    def receive(self, message: Dict[str, Any]) -> None:
+        """Bus callback for changes made on other workers."""
+        self._append(message["data"])
+
+    def _append(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self.seq += 1
+        event = {"type": "event", "seq": self.seq, "data": data}
+        self._events.append(event)
+        if len(self.connections):
+            asyncio.ensure_future(self.connections.broadcast(event))
+        return event
+
+    def since(self, seq: int, epoch: str | None) -> List[Dict[str, Any]] | None:
+        """Events after `seq`, or None when they cannot be replayed (reload instead)."""
+        if epoch != self.epoch or seq > self.seq or seq < 0:
+            return None
+        oldest = self._events[0]["seq"] if self._events else self.seq + 1
+        if seq < oldest - 1:
+            return None
+        return list(itertools.islice(self._events, max(seq - oldest + 1, 0), None))
+
+    def snapshot(self, seq: int | None = None, epoch: str | None = None) -> Dict[str, Any]:
+        """Payload of the `init` message for a (re)connecting client."""
+        events = [] if seq is None else self.since(seq, epoch)
+        return {
+            "feed": self.name,
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "events": events or [],
+            "reset": events is None,
+        }
+
+
+# Change feeds served by /ws/feed/{name}
+task_feed = Feed("tasks")
+activity_feed = Feed("activity")
+feeds: Dict[str, Feed] = {feed.name: feed for feed in (task_feed, activity_feed)}
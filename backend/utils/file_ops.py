@@ -1,16 +1,20 @@
 from __future__ import annotations
 from pathlib import Path
+import asyncio
 import json
-import threading
-from datetime import datetime
-from typing import Any, Dict
-from utils.constants import ACTIVITY_PATH, DATETIME_FMT
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+from utils.constants import DATETIME_FMT, STORAGE_ENGINE, STORE_FLUSH_INTERVAL
+from utils.locks import file_locks
+from utils.activity_pipeline import pipeline
+from utils.data_store import DataStore
+from utils.metrics import storage_seconds
+from utils.pubsub import bus
 
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-_LOCK = threading.Lock()
-
 def _ensure_file(path, default_payload):
     path = Path(path)
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -19,10 +23,10 @@ def _ensure_file(path, default_payload):
             json.dump(default_payload, f, indent=2)
 
 
-def read_json(path):
+def _read_file(path):
     path = Path(path)
     _ensure_file(path, {})
-    with _LOCK:
+    with file_locks.read(path):
         try:
             with path.open("r", encoding="utf-8") as f:
                 return json.load(f)
@@ -30,33 +34,98 @@ def read_json(path):
             return {}
 
 
-from pathlib import Path
-import json
-import threading
-from typing import Any, Dict
-
-_LOCK = threading.Lock()
-
-def write_json(path: Path | str, data: Dict[str, Any]) -> None:
-    """Thread-safe write with atomic replace."""
+def _write_file(path: Path | str, data: Dict[str, Any]) -> None:
+    """Thread-safe write with atomic replace (exclusive lock on this file only)."""
     path = Path(path)
     path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with _LOCK:
+    # Per process: workers sharing the data directory may write the same file
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with file_locks.write(path):
         with tmp.open("w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         tmp.replace(path)
 
 
+def _file_stamp(path: Path | str) -> tuple | None:
+    """Changes whenever the file is replaced or rewritten (None if missing)."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _timed(op: str, fn: Callable) -> Callable:
+    """`fn` with its duration recorded as storage_operation_seconds{op=...}."""
+    def timed(*args, **kwargs):
+        with storage_seconds.time(op=op):
+            return fn(*args, **kwargs)
+    return timed
+
+
+# Shared resident store; main.py preloads it and runs its flusher.
+if STORAGE_ENGINE == "sqlite":
+    from utils.sqlite_storage import database
+    store = DataStore(_timed("load", database.read_document), _timed("flush", database.write_document),
+                      flush_interval=STORE_FLUSH_INTERVAL, exists=database.has_document,
+                      stamp=database.document_stamp)
+elif STORAGE_ENGINE == "json":
+    store = DataStore(_timed("load", _read_file), _timed("flush", _write_file), flush_interval=STORE_FLUSH_INTERVAL,
+                      stamp=_file_stamp)
+else:
+    raise ValueError(f"Unknown STORAGE_ENGINE: {STORAGE_ENGINE!r} (expected 'json' or 'sqlite')")
+
+
+def read_json(path: Path | str) -> Dict[str, Any]:
+    """Return the in-memory payload for `path` (treat it as read-only)."""
+    with storage_seconds.time(op="get"):
+        return store.get(path)
+
+
+def write_json(path: Path | str, data: Dict[str, Any]) -> None:
+    """Replace the payload for `path`; persisted by the store's flusher."""
+    with storage_seconds.time(op="put"):
+        store.put(path, data)
+
+
+async def aread_json(path: Path | str) -> Dict[str, Any]:
+    """Async read_json that never blocks the event loop on disk I/O."""
+    with storage_seconds.time(op="get"):
+        return await store.aget(path)
+
+
+async def awrite_json(path: Path | str, data: Dict[str, Any]) -> None:
+    """Async write_json that never blocks the event loop on disk I/O."""
+    with storage_seconds.time(op="put"):
+        await store.aput(path, data)
+
+
+async def aupdate_json(path: Path | str, change: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Read-modify-write `path` as one step across worker processes (see
+    `DataStore.update`) and tell the other workers to reload it.
+    """
+    with storage_seconds.time(op="update"):
+        data = await store.aupdate(path, change)
+    await bus.publish("files", {"node": bus.node, "path": str(Path(path).resolve())})
+    return data
+
+
+def _reload(message: Dict[str, Any]) -> None:
+    """Bus callback: another worker rewrote a file through `aupdate_json`."""
+    asyncio.ensure_future(asyncio.to_thread(store.refresh, message["path"]))
+
+
+bus.subscribe("files", _reload)
+
+
 def add_activity(user: str, action: str, details: str | None = None) -> None:
-    """Log an activity entry."""
-    _ensure_file(ACTIVITY_PATH, {"logs": []})
-    now = datetime.now().strftime(DATETIME_FMT)
-    data = read_json(ACTIVITY_PATH)
-    data.setdefault("logs", []).append({
+    """Queue an activity entry for the background journal writer (which also feeds /ws/feed/activity)."""
+    now = datetime.now(timezone.utc).strftime(DATETIME_FMT)
+    entry = {
         "timestamp": now,
         "user": user,
         "action": action,
         "details": details,
-    })
-    write_json(ACTIVITY_PATH, data)
+    }
+    pipeline.submit(entry)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Generic, TypeVar
+
+from utils.metrics import lock_wait_seconds
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single worker only
+    fcntl = None
+
+
+class RWLock:
+    """
+    Thread reader/writer lock.
+    - Any number of readers may hold it together
+    - A writer holds it alone
+    - Waiting writers block new readers so writes are not starved
+    - Time spent waiting is recorded under `kind` (lock_wait_seconds)
+    """
+
+    def __init__(self, kind: str = "file"):
+        self.kind = kind
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        start = time.perf_counter()
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        lock_wait_seconds.observe(time.perf_counter() - start, kind=self.kind, mode="read")
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        start = time.perf_counter()
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        lock_wait_seconds.observe(time.perf_counter() - start, kind=self.kind, mode="write")
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class AsyncRWLock:
+    """asyncio counterpart of `RWLock` for coroutines sharing one event loop."""
+
+    def __init__(self, kind: str = "resource"):
+        self.kind = kind
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @asynccontextmanager
+    async def read(self):
+        start = time.perf_counter()
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+        lock_wait_seconds.observe(time.perf_counter() - start, kind=self.kind, mode="read")
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @asynccontextmanager
+    async def write(self):
+        start = time.perf_counter()
+        async with self._cond:
+            self._waiting_writers += 1
+            try:
+                await self._cond.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        lock_wait_seconds.observe(time.perf_counter() - start, kind=self.kind, mode="write")
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+L = TypeVar("L", RWLock, AsyncRWLock)
+
+
+class LockManager(Generic[L]):
+    """
+    One reader/writer lock per resource, keyed by resolved path (or any name),
+    so work on unrelated files never contends.
+    """
+
+    def __init__(self, factory: Callable[[], L]):
+        self._factory = factory
+        self._locks: Dict[str, L] = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def _key(resource: Path | str) -> str:
+        return str(Path(resource).resolve()) if isinstance(resource, Path) else resource
+
+    def get(self, resource: Path | str) -> L:
+        key = self._key(resource)
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(key, self._factory())
+        return lock
+
+    def read(self, resource: Path | str):
+        return self.get(resource).read()
+
+    def write(self, resource: Path | str):
+        return self.get(resource).write()
+
+
+@contextmanager
+def process_lock(path: Path):
+    """
+    Hold the lock file `path` exclusively (flock), against other processes
+    sharing the data directory as well as other threads of this one.
+    """
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        start = time.perf_counter()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        lock_wait_seconds.observe(time.perf_counter() - start, kind="process", mode="write")
+        yield
+    finally:
+        os.close(fd)
+
+
+# Guards file reads/writes across threads (file_ops)
+file_locks: LockManager[RWLock] = LockManager(RWLock)
+# Serializes read-modify-write sequences of coroutines (routes)
+resource_locks: LockManager[AsyncRWLock] = LockManager(AsyncRWLock)
@@ -0,0 +1,234 @@
+"""
+In-process metrics in the Prometheus text format (served at /metrics).
+
+Counters, gauges and histograms are plain Python objects with labels; they
+are thread-safe because storage and lock timings are taken in worker
+threads. `MetricsMiddleware` times every HTTP request by its route template.
+"""
+from __future__ import annotations
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from utils.constants import METRICS_RATE_WINDOW
+
+# Seconds; covers in-memory hits (~10µs) up to slow disk writes
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    """A named family of values, one per combination of label values."""
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Rate(Metric):
+    """
+    Events per second over the last `window` seconds (a gauge), counted in
+    one-second buckets so marking an event is O(1).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), window: int = METRICS_RATE_WINDOW):
+        super().__init__(name, help, labelnames)
+        self.window = max(1, window)
+        self._buckets: Dict[LabelKey, Dict[int, int]] = {}
+
+    def mark(self, count: int = 1, **labels: str) -> None:
+        key, second = self._key(labels), int(time.monotonic())
+        with self._lock:
+            buckets = self._buckets.setdefault(key, {})
+            buckets[second] = buckets.get(second, 0) + count
+            if len(buckets) > self.window + 1:
+                for old in [s for s in buckets if s <= second - self.window]:
+                    del buckets[old]
+
+    def value(self, **labels: str) -> float:
+        return self._rate(self._buckets.get(self._key(labels), {}), int(time.monotonic()))
+
+    def _rate(self, buckets: Dict[int, int], now: int) -> float:
+        return sum(n for second, n in list(buckets.items()) if second > now - self.window) / self.window
+
+    def samples(self) -> List[str]:
+        now = int(time.monotonic())
+        with self._lock:
+            items = sorted((key, self._rate(buckets, now)) for key, buckets in self._buckets.items())
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+registry: List[Metric] = []
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+# -----------------------------
+# Shared metrics
+# -----------------------------
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"))
+http_requests_in_progress = Gauge("http_requests_in_progress", "HTTP requests being handled")
+storage_seconds = Histogram(
+    "storage_operation_seconds", "Time spent in the data store (get/put) and its disk or database I/O (load/flush)",
+    ("op",))
+lock_wait_seconds = Histogram(
+    "lock_wait_seconds", "Time spent waiting to acquire reader/writer locks", ("kind", "mode"))
+ws_connections = Gauge("ws_connections", "Open WebSocket connections", ("channel",))
+ws_messages = Counter("ws_messages_total", "WebSocket messages received (in) and queued for sending (out)",
+                      ("channel", "direction"))
+ws_message_rate = Rate("ws_messages_per_second", "WebSocket messages per second, averaged over a short window",
+                       ("channel", "direction"))
+ws_broadcast_seconds = Histogram("ws_broadcast_duration_seconds", "Time to encode and queue one broadcast",
+                                 ("channel",))
+
+
+def count_ws_messages(channel: str, direction: str, count: int = 1) -> None:
+    ws_messages.inc(count, channel=channel, direction=direction)
+    ws_message_rate.mark(count, channel=channel, direction=direction)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request, labelled
+    by the matched route template (e.g. /api/tasks/{task_id}) rather than
+    the raw path, so label values stay bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_progress.dec()
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
@@ -0,0 +1,81 @@
+"""
+Import the JSON data files into the SQLite database used by STORAGE_ENGINE=sqlite:
+
+    python -m utils.migrate                      # DATA_DIR -> SQLITE_PATH
+    python -m utils.migrate --data-dir ./data --database /srv/collab.db
+
+Run it from backend/ with the server stopped. The database's documents, tasks
+and activity are replaced by what the JSON files hold; the JSON files are
+left untouched, so the JSON engine keeps working on them.
+"""
+from __future__ import annotations
+import argparse
+import json
+from pathlib import Path
+from typing import Dict
+
+from utils.activity_log import ActivityJournal, from_local_time
+from utils.constants import DATA_DIR, SQLITE_PATH
+from utils.data_store import DataStore
+from utils.file_ops import _read_file, _write_file
+from utils.sqlite_storage import SqliteActivityJournal, SqliteDatabase, SqliteTaskLog
+from utils.task_store import JsonTaskLog
+
+# Kept by the task store and the activity journal rather than as documents
+_NOT_DOCUMENTS = {"tasks.json", "task_ids.json", "activity.json"}
+_BATCH = 1000
+
+
+def migrate(data_dir: Path, database: SqliteDatabase) -> Dict[str, int]:
+    """Copy everything under `data_dir` into `database`; returns counts per kind."""
+    data_dir = Path(data_dir)
+    counts = {"documents": 0, "tasks": 0, "activity": 0}
+
+    documents = [p for p in sorted(data_dir.glob("*.json")) if p.name not in _NOT_DOCUMENTS]
+    documents += sorted((data_dir / "documents").glob("*.json"))
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM documents")
+    for path in documents:
+        database.write_document(path, _read_file(path))
+        counts["documents"] += 1
+
+    json_store = DataStore(_read_file, _write_file, flush_interval=0)
+    tasks, seq, _, next_id = JsonTaskLog(data_dir / "tasks.json", data_dir / "tasks.wal",
+                                         data_dir / "task_ids.json", store=json_store).load()
+    SqliteTaskLog(database).replace_all(tasks.values(), seq, max(next_id, max(tasks, default=0) + 1))
+    counts["tasks"] = len(tasks)
+
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM activity")
+    target = SqliteActivityJournal(database)
+    if any((data_dir / "activity").glob("activity-*.jsonl")):
+        entries = iter(ActivityJournal(data_dir / "activity"))
+    elif (data_dir / "activity.json").exists():
+        # Never opened by the JSON engine: only the legacy single-file log exists
+        logs = json.loads((data_dir / "activity.json").read_text(encoding="utf-8")).get("logs", [])
+        entries = (from_local_time(entry) for entry in logs)
+    else:
+        entries = iter(())
+    while batch := [entry for _, entry in zip(range(_BATCH), entries)]:
+        target.append_many(batch)
+        counts["activity"] += len(batch)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import the JSON data files into SQLite.")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--database", type=Path, default=SQLITE_PATH)
+    args = parser.parse_args()
+
+    database = SqliteDatabase(args.database, root=args.data_dir)
+    try:
+        counts = migrate(args.data_dir, database)
+    finally:
+        database.close()
+    print(f"[MIGRATE] {args.data_dir} -> {args.database}: "
+          + ", ".join(f"{n} {kind}" for kind, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
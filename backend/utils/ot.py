@@ -0,0 +1,139 @@
+"""
+Operational transform for plain-text documents.
+
+An edit is a list of primitive ops applied in order:
+    {"type": "insert", "pos": int, "text": str}
+    {"type": "delete", "pos": int, "length": int}
+
+`transform(a, b)` rewrites two concurrent edits made against the same text so
+that applying `a` then `b'`, or `b` then `a'`, gives the same result. When
+both insert at the same position, the side given priority goes first.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+
+Op = Dict[str, Any]
+
+
+def validate(ops: Any, length: int) -> List[Op]:
+    """Check that `ops` can be applied to a text of `length` characters; return normalized ops."""
+    if not isinstance(ops, list):
+        raise ValueError("ops must be a list")
+
+    normalized: List[Op] = []
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError("op must be an object")
+        pos = op.get("pos")
+        if not isinstance(pos, int) or isinstance(pos, bool) or pos < 0 or pos > length:
+            raise ValueError(f"op position out of range: {pos!r}")
+
+        if op.get("type") == "insert":
+            text = op.get("text")
+            if not isinstance(text, str):
+                raise ValueError("insert op needs a text string")
+            if text:
+                normalized.append({"type": "insert", "pos": pos, "text": text})
+                length += len(text)
+        elif op.get("type") == "delete":
+            count = op.get("length")
+            if not isinstance(count, int) or isinstance(count, bool) or count < 0 or pos + count > length:
+                raise ValueError(f"delete length out of range: {count!r}")
+            if count:
+                normalized.append({"type": "delete", "pos": pos, "length": count})
+                length -= count
+        else:
+            raise ValueError(f"unknown op type: {op.get('type')!r}")
+    return normalized
+
+
+def apply(content: str, ops: List[Op]) -> str:
+    """Apply validated ops to `content`."""
+    for op in ops:
+        pos = op["pos"]
+        if op["type"] == "insert":
+            content = content[:pos] + op["text"] + content[pos:]
+        else:
+            content = content[:pos] + content[pos + op["length"]:]
+    return content
+
+
+def _transform_op(op: Op, other: Op, op_first: bool) -> List[Op]:
+    """Rewrite one primitive `op` to apply after `other`."""
+    pos = op["pos"]
+
+    if other["type"] == "insert":
+        at, size = other["pos"], len(other["text"])
+        if op["type"] == "insert":
+            if pos < at or (pos == at and op_first):
+                return [op]
+            return [{**op, "pos": pos + size}]
+
+        end = pos + op["length"]
+        if at <= pos:
+            return [{**op, "pos": pos + size}]
+        if at >= end:
+            return [op]
+        # The insert landed inside the deleted range: delete around it
+        return [
+            {"type": "delete", "pos": pos, "length": at - pos},
+            {"type": "delete", "pos": pos + size, "length": end - at},
+        ]
+
+    start, stop = other["pos"], other["pos"] + other["length"]
+    if op["type"] == "insert":
+        if pos <= start:
+            return [op]
+        if pos >= stop:
+            return [{**op, "pos": pos - other["length"]}]
+        return [{**op, "pos": start}]
+
+    end = pos + op["length"]
+    if end <= start:
+        return [op]
+    if pos >= stop:
+        return [{**op, "pos": pos - other["length"]}]
+    # Overlapping deletes: only what `other` did not already remove is left
+    remaining = op["length"] - (min(end, stop) - max(pos, start))
+    return [{"type": "delete", "pos": min(pos, start), "length": remaining}] if remaining else []
+
+
+def transform(a: List[Op], b: List[Op], a_first: bool = False) -> Tuple[List[Op], List[Op]]:
+    """
+    Transform concurrent edits `a` and `b` against each other.
+    Returns (a', b') where a' applies after b and b' applies after a.
+    """
+    if not a or not b:
+        return a, b
+
+    if len(a) > 1:
+        head, b = transform(a[:1], b, a_first)
+        tail, b = transform(a[1:], b, a_first)
+        return head + tail, b
+    if len(b) > 1:
+        a, head = transform(a, b[:1], a_first)
+        a, tail = transform(a, b[1:], a_first)
+        return a, head + tail
+
+    return _transform_op(a[0], b[0], a_first), _transform_op(b[0], a[0], not a_first)
+
+
+def diff(old: str, new: str) -> List[Op]:
+    """Smallest single-region edit turning `old` into `new` (common prefix/suffix trimmed)."""
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    ops: List[Op] = []
+    removed = len(old) - prefix - suffix
+    if removed:
+        ops.append({"type": "delete", "pos": prefix, "length": removed})
+    inserted = new[prefix:len(new) - suffix]
+    if inserted:
+        ops.append({"type": "insert", "pos": prefix, "text": inserted})
+    return ops
@@ -0,0 +1,54 @@
+import base64
+import hashlib
+import hmac
+import secrets
+
+from utils.constants import PASSWORD_ITERATIONS
+
+ALGORITHM = "pbkdf2_sha256"
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def hash_password(password: str, iterations: int = PASSWORD_ITERATIONS) -> str:
+    """Salted PBKDF2 hash, stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>"."""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """
+    Check `password` against a stored hash. Accounts created before hashing
+    still hold the plaintext; those compare directly (see `needs_rehash`).
+    This is CPU-heavy by design: call it from a worker thread.
+    """
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+def is_hashed(stored: str) -> bool:
+    """False for passwords still stored as plaintext."""
+    return stored.startswith(ALGORITHM + "$")
+
+
+def needs_rehash(stored: str, iterations: int = PASSWORD_ITERATIONS) -> bool:
+    """True for plaintext or hashes made with a different cost."""
+    if not is_hashed(stored):
+        return True
+    try:
+        return int(stored.split("$")[1]) != iterations
+    except (IndexError, ValueError):
+        return True
+
+
+# Verified against when the username is unknown, so both cases take as long
+DUMMY_HASH = hash_password(secrets.token_hex(8))
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, Dict
+
+from fastapi import WebSocket
+
+from utils.connection_manager import ConnectionManager
+from utils.constants import PRESENCE_TICK_HZ
+from utils.pubsub import LocalBus
+
+
+class PresenceTracker:
+    """
+    Batches cursor moves into presence ticks.
+
+    `move` only records the new position; at most `rate` times a second the
+    cursors that changed since the last tick go out as one "presence_diff"
+    ({id, user, cursor} per moved connection, latest position only). The
+    full list ("presence") is sent on join and leave, where clients need to
+    add or remove entries.
+
+    With several workers, ticks and each worker's own list of connections are
+    forwarded on `channel`; the full list a client sees is this worker's
+    connections plus the last list received from every other worker.
+    """
+
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        rate: float = PRESENCE_TICK_HZ,
+        bus: LocalBus | None = None,
+        channel: str = "",
+    ):
+        self.connections = connections
+        self.interval = 1 / rate if rate > 0 else 0
+        self.bus = bus or LocalBus()
+        self.channel = channel
+        self._dirty: Dict[WebSocket, None] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._remote: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def move(self, websocket: WebSocket, position: int | None) -> None:
+        """Record a cursor position; peers see it on the next tick."""
+        self.connections.update_cursor(websocket, position)
+        self._dirty[websocket] = None
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.interval, self._tick)
+
+    def changes(self) -> list[dict]:
+        """Take the cursors that moved since the last tick."""
+        dirty, self._dirty = self._dirty, {}
+        changes = []
+        for ws in dirty:
+            connection = self.connections.get(ws)
+            if connection is not None:
+                changes.append(connection.presence())
+        return changes
+
+    def entries(self) -> list[dict]:
+        """Everyone in the room, on every worker."""
+        entries = self.connections.get_presence()
+        for remote in self._remote.values():
+            entries.extend(remote.values())
+        return entries
+
+    def _tick(self) -> None:
+        self._timer = None
+        changes = self.changes()
+        if changes:
+            asyncio.ensure_future(self._send_diff(changes))
+
+    async def _send_diff(self, changes: list[dict]) -> None:
+        await self.connections.broadcast({"type": "presence_diff", "data": changes})
+        await self.bus.publish(self.channel, {"type": "presence_diff", "node": self.bus.node, "data": changes})
+
+    async def full(self, sender: WebSocket | None = None) -> None:
+        """Broadcast the full presence list (join/leave); it supersedes pending moves."""
+        self._dirty.clear()
+        await self.connections.broadcast({"type": "presence", "data": self.entries()}, sender=sender)
+        await self._publish_local()
+
+    async def _publish_local(self, reply: bool = False) -> None:
+        await self.bus.publish(self.channel, {
+            "type": "presence_node",
+            "node": self.bus.node,
+            "data": self.connections.get_presence(),
+            "reply": reply,
+        })
+
+    def receive(self, message: Dict[str, Any]) -> None:
+        """Apply presence forwarded by another worker and pass it on to local clients."""
+        node = message["node"]
+        if message["type"] == "presence_diff":
+            remote = self._remote.setdefault(node, {})
+            for entry in message["data"]:
+                remote[entry["id"]] = entry
+            asyncio.ensure_future(self.connections.broadcast(
+                {"type": "presence_diff", "data": message["data"]}))
+        elif message["type"] == "presence_node":
+            if message["data"]:
+                self._remote[node] = {entry["id"]: entry for entry in message["data"]}
+            else:
+                self._remote.pop(node, None)
+            asyncio.ensure_future(self.connections.broadcast({"type": "presence", "data": self.entries()}))
+            # A worker we have not heard from needs our list too
+            if not message["reply"] and len(self.connections):
+                asyncio.ensure_future(self._publish_local(reply=True))
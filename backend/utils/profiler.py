@@ -0,0 +1,84 @@
+from __future__ import annotations
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List
+
+from utils.constants import PROFILER_INTERVAL
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that can be switched on and off while serving.
+
+    - A daemon thread wakes every `interval` seconds and records the Python
+      stack of every other thread, so the cost is one stack walk per sample
+      rather than a hook on every call.
+    - Samples accumulate as collapsed stacks ("module:function;...;leaf N"),
+      the input format of flame graph tools.
+    - Stacks of idle threads (waiting in the event loop's selector or on a
+      lock) are counted like any other; they show where threads wait.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float | None = None) -> None:
+        if interval is not None:
+            self.interval = interval
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, frame in frames.items():
+                if thread_id == me:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def report(self, limit: int | None = None) -> List[str]:
+        """Collapsed stacks, most sampled first."""
+        with self._lock:
+            return [f"{stack} {count}" for stack, count in self._stacks.most_common(limit)]
+
+    def status(self) -> Dict[str, object]:
+        return {"running": self.running, "interval": self.interval, "samples": self.samples,
+                "stacks": len(self._stacks)}
+
+
+# Process-wide profiler behind /metrics/profile (main.py starts it when PROFILER_ENABLED)
+profiler = SamplingProfiler()
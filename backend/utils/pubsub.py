@@ -0,0 +1,178 @@
+"""
+Forwarding of events between worker processes.
+
+Each worker serves its own clients; workers sharing a data directory
+exchange events through a small broker over a Unix socket:
+
+    python -m utils.pubsub /tmp/collab.sock
+    PUBSUB_BROKER=/tmp/collab.sock uvicorn main:app --workers 4
+
+Forwarded are rooms (edits ordered through each document's WAL, presence),
+the change feeds' events, token revocations and "reload this file" notices
+for files rewritten with `file_ops.aupdate_json` (users). Tasks and the
+activity journal need no events: workers coordinate through their logs.
+
+Without PUBSUB_BROKER the in-process `LocalBus` is used and nothing leaves
+the process.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import sys
+import uuid
+from typing import Any, Callable, Dict, List, Set
+
+from utils.constants import PUBSUB_BROKER
+
+# Identifies this worker in forwarded events and connection ids
+NODE_ID = uuid.uuid4().hex[:8]
+
+# Room events (ops, presence lists) can exceed asyncio's 64KiB default line limit
+_LINE_LIMIT = 16 * 1024 * 1024
+
+Callback = Callable[[Dict[str, Any]], None]
+
+
+class LocalBus:
+    """
+    Single-process bus: there are no other workers, so `publish` forwards
+    nothing. Subscribers only ever receive events published elsewhere.
+    """
+    distributed = False
+
+    def __init__(self):
+        self.node = NODE_ID
+        self._subscribers: Dict[str, List[Callback]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def unsubscribe(self, channel: str, callback: Callback) -> None:
+        callbacks = self._subscribers.get(channel, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self._subscribers.pop(channel, None)
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        pass
+
+    def _deliver(self, channel: str, message: Dict[str, Any]) -> None:
+        for callback in list(self._subscribers.get(channel, ())):
+            try:
+                callback(message)
+            except Exception as e:
+                print("[PUBSUB] subscriber failed:", e)
+
+
+class BrokerBus(LocalBus):
+    """
+    Bus backed by the broker at `path`. Events are delivered to the other
+    workers subscribed to the channel, in the order the broker received them.
+    """
+    distributed = True
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._writer: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        reader, self._writer = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+        for channel in self._subscribers:
+            self._send({"op": "sub", "channel": channel})
+        self._task = asyncio.create_task(self._run(reader))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        if channel not in self._subscribers:
+            self._send({"op": "sub", "channel": channel})
+        super().subscribe(channel, callback)
+
+    def unsubscribe(self, channel: str, callback: Callback) -> None:
+        super().unsubscribe(channel, callback)
+        if channel not in self._subscribers:
+            self._send({"op": "unsub", "channel": channel})
+
+    async def publish(self, channel: str, message: Dict[str, Any]) -> None:
+        self._send({"op": "pub", "channel": channel, "message": message})
+        if self._writer is not None:
+            await self._writer.drain()
+
+    def _send(self, frame: Dict[str, Any]) -> None:
+        if self._writer is not None:
+            self._writer.write(json.dumps(frame, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    async def _run(self, reader: asyncio.StreamReader) -> None:
+        while line := await reader.readline():
+            frame = json.loads(line)
+            self._deliver(frame["channel"], frame["message"])
+        print("[PUBSUB] broker connection closed")
+
+
+class Broker:
+    """Relays each published frame to every other connection subscribed to its channel."""
+
+    def __init__(self):
+        self._channels: Dict[str, Set[asyncio.StreamWriter]] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscribed: Set[str] = set()
+        try:
+            while line := await reader.readline():
+                frame = json.loads(line)
+                channel = frame["channel"]
+                if frame["op"] == "sub":
+                    self._channels.setdefault(channel, set()).add(writer)
+                    subscribed.add(channel)
+                elif frame["op"] == "unsub":
+                    self._leave(channel, writer)
+                    subscribed.discard(channel)
+                elif frame["op"] == "pub":
+                    data = json.dumps({"channel": channel, "message": frame["message"]},
+                                      separators=(",", ":")).encode("utf-8") + b"\n"
+                    for peer in self._channels.get(channel, ()):
+                        if peer is not writer:
+                            peer.write(data)
+        except ConnectionError:
+            pass  # worker exited
+        finally:
+            for channel in subscribed:
+                self._leave(channel, writer)
+            writer.close()
+
+    def _leave(self, channel: str, writer: asyncio.StreamWriter) -> None:
+        peers = self._channels.get(channel)
+        if peers is not None:
+            peers.discard(writer)
+            if not peers:
+                del self._channels[channel]
+
+
+async def serve(path: str) -> None:
+    server = await asyncio.start_unix_server(Broker().handle, path, limit=_LINE_LIMIT)
+    print("[PUBSUB] broker listening on", path)
+    async with server:
+        await server.serve_forever()
+
+
+# Shared bus for this worker
+bus = BrokerBus(PUBSUB_BROKER) if PUBSUB_BROKER else LocalBus()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(sys.argv[1] if len(sys.argv) > 1 else PUBSUB_BROKER))
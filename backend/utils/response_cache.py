@@ -0,0 +1,116 @@
+from __future__ import annotations
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Tuple
+
+from fastapi import Request, Response
+
+from utils.constants import RESPONSE_CACHE_SIZE
+from utils.etags import parse_etags
+
+
+class CachedResponse(NamedTuple):
+    version: Any
+    body: bytes
+    etag: str
+    last_modified: str
+
+
+def encode_json(payload: Any) -> bytes:
+    """The bytes JSONResponse would send for `payload`."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class ResponseCache:
+    """
+    Encoded JSON bodies of GET responses, reused until their resource changes.
+
+    - Entries are keyed by resource ("users", "tasks", "document:<id>") and
+      variant (e.g. the query string), and are only valid for the resource
+      version they were built from: the document revision, the task log seq
+      or the users file's store version. Other worker processes' writes
+      move these too: the task store applies their commits before its seq
+      is read, and the users file is reloaded when they announce a write.
+    - Write paths call `invalidate` so the entry is dropped right away and
+      Last-Modified reflects the time of the write.
+    - Responses carry a strong ETag (the resource's own, or a digest of the
+      body) and If-None-Match is answered with 304 without sending the body.
+    - At most `max_entries` bodies are kept, least recently used dropped first.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Tuple[str, str], CachedResponse] = OrderedDict()
+        # resource -> (version first seen after the last write, when that write happened)
+        self._modified: Dict[str, Tuple[Any, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, resource: str, variant: str, version: Any) -> CachedResponse | None:
+        entry = self._entries.get((resource, variant))
+        if entry is None or entry.version != version:
+            return None
+        self._entries.move_to_end((resource, variant))
+        return entry
+
+    def put(self, resource: str, variant: str, version: Any, payload: Any, etag: str | None = None) -> CachedResponse:
+        body = encode_json(payload)
+        if etag is None:
+            etag = f'"{resource}-{hashlib.sha256(body).hexdigest()[:20]}"'
+        entry = CachedResponse(version, body, etag, formatdate(self._modified_at(resource, version), usegmt=True))
+        self._entries[(resource, variant)] = entry
+        self._entries.move_to_end((resource, variant))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _modified_at(self, resource: str, version: Any) -> float:
+        seen = self._modified.get(resource)
+        if seen is None or (seen[0] is not None and seen[0] != version):
+            seen = (version, time.time())  # changed elsewhere: first seen now
+        elif seen[0] is None:
+            seen = (version, seen[1])
+        self._modified[resource] = seen
+        return seen[1]
+
+    def invalidate(self, resource: str) -> None:
+        """Drop every cached variant of `resource` (call after writing it)."""
+        for key in [key for key in self._entries if key[0] == resource]:
+            del self._entries[key]
+        self._modified[resource] = (None, time.time())
+
+    async def serve(
+        self,
+        request: Request,
+        resource: str,
+        variant: str,
+        version: Any,
+        build: Callable[[], Awaitable[Any]],
+        etag: str | None = None,
+    ) -> Response:
+        """
+        Answer a GET from the cache, building (and caching) the payload with
+        `build` on a miss. When the resource's `etag` is known up front, a
+        matching If-None-Match is answered without building anything.
+        """
+        client_tags = parse_etags(request.headers.get("if-none-match"))
+        entry = self.get(resource, variant, version)
+        if entry is None:
+            self.misses += 1
+            if etag is not None and etag in client_tags:
+                return Response(status_code=304, headers={"ETag": etag})
+            entry = self.put(resource, variant, version, await build(), etag)
+        else:
+            self.hits += 1
+
+        headers = {"ETag": entry.etag, "Last-Modified": entry.last_modified}
+        if entry.etag in client_tags:
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Shared cache for the read-heavy GET routes
+response_cache = ResponseCache()
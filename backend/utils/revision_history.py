@@ -0,0 +1,181 @@
+from __future__ import annotations
+import base64
+import bisect
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from utils import ot
+from utils.constants import REVISION_COMPRESS_MIN, REVISION_SNAPSHOT_EVERY
+
+
+class RevisionHistory:
+    """
+    Every revision of one document, in an append-only JSON-lines file.
+
+    - Most records hold only the edit's ops, so the file grows with the size
+      of the edits. Every `snapshot_every` revisions (and after any gap, e.g.
+      revisions made before the history existed) a record holds the full
+      content instead.
+    - Payloads of `compress_min` bytes or more are stored zlib-compressed.
+    - An in-memory index maps revisions to file offsets, so `get` reads the
+      nearest snapshot at or before the revision plus the deltas after it:
+      at most `snapshot_every` records, however long the history.
+    - Several workers may append to the same file (each under the document's
+      WAL lock); the index picks up their records before every read or write.
+    """
+
+    def __init__(self, path: Path, snapshot_every: int = REVISION_SNAPSHOT_EVERY,
+                 compress_min: int = REVISION_COMPRESS_MIN):
+        self.path = Path(path)
+        self.snapshot_every = max(1, snapshot_every)
+        self.compress_min = compress_min
+        self._lock = threading.Lock()
+        self._revisions: List[int] = []
+        self._offsets: List[int] = []
+        self._snapshots: List[int] = []  # positions in _revisions of full-content records
+        self._end = 0  # bytes of the file indexed so far
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def append(self, revision: int, ops: List[ot.Op], content: str, meta: Dict[str, Any]) -> None:
+        """
+        Record `revision`, made by applying `ops`; `content` is the text after
+        the edit and is only stored when this record is a snapshot.
+        Revisions at or below the latest recorded one are ignored.
+        """
+        with self._lock:
+            self._refresh()
+            if self._revisions and revision <= self._revisions[-1]:
+                return
+            last_snapshot = self._revisions[self._snapshots[-1]] if self._snapshots else None
+            snapshot = (
+                last_snapshot is None
+                or self._revisions[-1] != revision - 1
+                or revision - last_snapshot >= self.snapshot_every
+            )
+            payload = {"content": content} if snapshot else {"ops": ops}
+            record = {"rev": revision, "snapshot": snapshot, **meta, **self._encode(payload)}
+            line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("ab") as f:
+                if f.tell() > self._end:
+                    # Torn line from a crash mid-append: drop it before writing after it
+                    f.truncate(self._end)
+                f.write(line)
+                f.flush()
+            self._index(revision, snapshot, self._end)
+            self._end += len(line)
+
+    def _encode(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(data) < self.compress_min:
+            return {"data": payload}
+        return {"z": base64.b64encode(zlib.compress(data)).decode("ascii")}
+
+    @staticmethod
+    def _decode(record: Dict[str, Any]) -> Dict[str, Any]:
+        if "z" in record:
+            return json.loads(zlib.decompress(base64.b64decode(record["z"])))
+        return record["data"]
+
+    # -----------------------------
+    # Index
+    # -----------------------------
+    def _index(self, revision: int, snapshot: bool, offset: int) -> None:
+        if snapshot:
+            self._snapshots.append(len(self._revisions))
+        self._revisions.append(revision)
+        self._offsets.append(offset)
+
+    def _refresh(self) -> None:
+        """Index records appended since the last look (by this or another process)."""
+        try:
+            f = self.path.open("rb")
+        except FileNotFoundError:
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size < self._end:
+                # Rewritten underneath us (data reset): start over
+                self._revisions, self._offsets, self._snapshots, self._end = [], [], [], 0
+            f.seek(self._end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not self._revisions or record["rev"] > self._revisions[-1]:
+                    self._index(record["rev"], record["snapshot"], self._end)
+                self._end += len(line)
+
+    def _read(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Records at index positions [start, stop), read in one pass."""
+        if start >= stop:
+            return []
+        with self.path.open("rb") as f:
+            f.seek(self._offsets[start])
+            data = f.read(self._end - self._offsets[start] if stop == len(self._offsets)
+                          else self._offsets[stop] - self._offsets[start])
+        return [json.loads(line) for line in data.splitlines()]
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    @staticmethod
+    def _summary(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "revision": record["rev"],
+            "title": record.get("title"),
+            "lastEditedBy": record.get("lastEditedBy"),
+            "lastUpdated": record.get("lastUpdated"),
+            "snapshot": record["snapshot"],
+        }
+
+    def list(self, cursor: int | None = None, limit: int = 50) -> Tuple[List[Dict[str, Any]], int | None]:
+        """One page of revisions, newest first, and the cursor for the next (older) page."""
+        with self._lock:
+            self._refresh()
+            stop = len(self._revisions) if cursor is None else bisect.bisect_left(self._revisions, cursor)
+            start = max(0, stop - limit)
+            records = self._read(start, stop)
+            next_cursor = self._revisions[start] if start > 0 else None
+        return [self._summary(r) for r in reversed(records)], next_cursor
+
+    def get(self, revision: int) -> Dict[str, Any] | None:
+        """The document as of `revision`, or None if it is not in the history."""
+        with self._lock:
+            self._refresh()
+            i = bisect.bisect_left(self._revisions, revision)
+            if i == len(self._revisions) or self._revisions[i] != revision:
+                return None
+            base = self._snapshots[bisect.bisect_right(self._snapshots, i) - 1]
+            records = self._read(base, i + 1)
+
+        content = self._decode(records[0])["content"]
+        for record in records[1:]:
+            content = ot.apply(content, self._decode(record)["ops"])
+        last = records[-1]
+        return {
+            **{k: last.get(k) for k in ("title", "lastEditedBy", "lastUpdated")},
+            "content": content,
+            "revision": revision,
+        }
+
+    def diff(self, old: int, new: int) -> List[ot.Op] | None:
+        """Ops turning revision `old` into revision `new`, or None if either is unknown."""
+        a, b = self.get(old), self.get(new)
+        if a is None or b is None:
+            return None
+        return ot.diff(a["content"], b["content"])
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._revisions)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Tuple
+
+from fastapi import WebSocket
+
+from utils.connection_manager import ConnectionManager
+from utils.constants import (
+    DEFAULT_DOCUMENT_ID,
+    DOCUMENT_PATH,
+    DOCUMENT_WAL_PATH,
+    DOCUMENTS_DIR,
+)
+from utils.document_session import DocumentSession
+from utils.file_ops import store
+from utils.ot import Op
+from utils.presence import PresenceTracker
+from utils.pubsub import LocalBus, bus as default_bus
+
+DOCUMENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def document_paths(doc_id: str) -> Tuple[Path, Path]:
+    """(snapshot path, WAL path) for a document id."""
+    if doc_id == DEFAULT_DOCUMENT_ID:
+        return DOCUMENT_PATH, DOCUMENT_WAL_PATH
+    if not DOCUMENT_ID_RE.match(doc_id):
+        raise ValueError(f"Invalid document id: {doc_id!r}")
+    return DOCUMENTS_DIR / f"{doc_id}.json", DOCUMENTS_DIR / f"{doc_id}.wal"
+
+
+class Room:
+    """
+    Live state of one document: its edit session and the sockets subscribed to it.
+
+    With several workers each one holds its own Room for the document. Edits
+    are serialized through the shared WAL (see DocumentSession), and every
+    accepted edit is announced on the bus so the other workers pick it up
+    from the WAL and relay it to their clients in revision order.
+    """
+    __slots__ = ("id", "session", "connections", "presence", "refs", "bus", "channel")
+
+    def __init__(self, doc_id: str, bus: LocalBus = default_bus):
+        path, wal_path = document_paths(doc_id)
+        self.id = doc_id
+        self.bus = bus
+        self.channel = f"document:{doc_id}"
+        self.session = DocumentSession(path, wal_path, shared=bus.distributed)
+        self.connections = ConnectionManager()
+        self.presence = PresenceTracker(self.connections, bus=bus, channel=self.channel)
+        self.refs = 0
+
+    async def edit(
+        self,
+        make_edit: Callable[[DocumentSession], Tuple[int, List[Op]]],
+        user: str,
+        sender: WebSocket | None = None,
+    ) -> Tuple[int, List[Op]]:
+        """
+        Run `make_edit` (session.apply / session.replace) at the latest
+        revision, make it durable, ack `sender` and relay the ops to everyone
+        else. Errors from `make_edit` propagate with nothing changed.
+        """
+        session = self.session
+        async with session.lock:
+            async with session.exclusive():
+                await self._catch_up()
+                revision, ops = make_edit(session)
+                await session.record(revision, ops)
+            if sender is not None:
+                await self.connections.send(sender, {"type": "ack", "data": {"revision": revision}})
+            await self.connections.broadcast(session.op_message(revision, ops, user), sender=sender)
+            await self.bus.publish(self.channel, {"type": "revision", "node": self.bus.node, "revision": revision})
+        return revision, ops
+
+    async def catch_up(self) -> None:
+        """Relay edits other workers have made since this room last looked."""
+        if self.session.shared:
+            async with self.session.lock:
+                await self._catch_up()
+
+    async def _catch_up(self) -> None:
+        records, reloaded = await self.session.sync()
+        if reloaded:
+            await self.connections.broadcast({"type": "resync", "data": self.session.snapshot()})
+        for record in records:
+            message = self.session.op_message(record["seq"], record["ops"], record["meta"].get("lastEditedBy"))
+            await self.connections.broadcast(message)
+
+    def receive(self, message: Dict[str, Any]) -> None:
+        """Bus callback for events from other workers."""
+        if message["type"] == "revision":
+            if message["revision"] > self.session.revision:
+                asyncio.ensure_future(self.catch_up())
+        else:
+            self.presence.receive(message)
+
+
+class RoomRegistry:
+    """
+    Documents loaded on demand.
+
+    - A room is created on first use and counts its users (WebSocket clients
+      and in-flight REST requests).
+    - When the last one leaves, the room takes a final snapshot and is dropped
+      along with its cached payload, so idle documents only exist on disk.
+    - `pinned` rooms (the default document) stay loaded once opened.
+    """
+
+    def __init__(self, pinned: Iterable[str] = (DEFAULT_DOCUMENT_ID,), bus: LocalBus = default_bus):
+        self.pinned = set(pinned)
+        self.bus = bus
+        self._rooms: Dict[str, Room] = {}
+
+    def exists(self, doc_id: str) -> bool:
+        """True when the document is loaded or has been saved before."""
+        if doc_id in self._rooms:
+            return True
+        path, wal_path = document_paths(doc_id)
+        return store.exists(path) or wal_path.exists()
+
+    def acquire(self, doc_id: str) -> Room:
+        room = self._rooms.get(doc_id)
+        if room is None:
+            room = self._rooms[doc_id] = Room(doc_id, self.bus)
+            self.bus.subscribe(room.channel, room.receive)
+        room.refs += 1
+        return room
+
+    async def release(self, room: Room) -> None:
+        room.refs -= 1
+        if room.refs > 0 or room.id in self.pinned:
+            return
+        await room.session.close()
+        # Someone may have joined while the snapshot was being written
+        if room.refs == 0 and self._rooms.get(room.id) is room:
+            del self._rooms[room.id]
+            self.bus.unsubscribe(room.channel, room.receive)
+            await store.aevict(room.session.path)
+
+    @asynccontextmanager
+    async def use(self, doc_id: str) -> AsyncIterator[Room]:
+        """Hold a loaded room for the duration of the block."""
+        room = self.acquire(doc_id)
+        try:
+            await room.session.load()
+            await room.catch_up()
+            yield room
+        finally:
+            # Finish unloading even if the handler is being cancelled
+            await asyncio.shield(self.release(room))
+
+    def get(self, doc_id: str) -> Room | None:
+        """The room if it is currently loaded."""
+        return self._rooms.get(doc_id)
+
+    def loaded(self) -> List[str]:
+        return list(self._rooms)
+
+    async def close(self) -> None:
+        """Snapshot every loaded room (server shutdown)."""
+        for room in list(self._rooms.values()):
+            await room.session.close()
+
+
+# Shared registry for the document routes
+rooms = RoomRegistry()
@@ -0,0 +1,354 @@
+"""
+SQLite storage engine (STORAGE_ENGINE=sqlite).
+
+One database file holds what the JSON engine keeps in separate files:
+
+- `documents`: the JSON payloads served by the data store (users, document
+  snapshots, revoked tokens), keyed by their path relative to DATA_DIR
+- `tasks`: one row per task, indexed by status and assignee, and
+  `task_changes`: the latest task log records, for other workers to catch up
+- `activity`: one row per activity entry, indexed by user, action and timestamp
+
+Document edit logs (*.wal) stay files with both engines: they are the
+cross-worker ordering point for live editing. Existing JSON data is imported
+with `python -m utils.migrate`.
+"""
+from __future__ import annotations
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from utils.activity_index import timestamp_key
+from utils.constants import DATA_DIR, SQLITE_PATH, SQLITE_POOL_SIZE, TASK_COMPACT_RECORDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    status TEXT,
+    assignedTo TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE INDEX IF NOT EXISTS tasks_assignee ON tasks (assignedTo, id);
+CREATE TABLE IF NOT EXISTS task_changes (
+    seq INTEGER PRIMARY KEY,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,
+    user TEXT,
+    action TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS activity_user ON activity (user, id);
+CREATE INDEX IF NOT EXISTS activity_action ON activity (action, id);
+CREATE INDEX IF NOT EXISTS activity_ts ON activity (ts, id);
+"""
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class SqliteDatabase:
+    """
+    Pool of connections to one SQLite file in WAL mode.
+
+    - Connections are opened on demand and up to `pool_size` idle ones are
+      kept for reuse. Each one caches its prepared statements, and every
+      statement here is a constant with bound parameters, so repeated
+      queries skip parsing.
+    - In WAL mode readers never wait for the writer; concurrent writers
+      (threads or worker processes) queue on SQLite's lock for up to `timeout`.
+    - `documents` are keyed by path relative to `root` (DATA_DIR), so the
+      same database works wherever the backend is checked out.
+    """
+
+    def __init__(self, path: Path = SQLITE_PATH, root: Path = DATA_DIR,
+                 pool_size: int = SQLITE_POOL_SIZE, timeout: float = 30.0):
+        self.path = Path(path)
+        self.root = Path(root).resolve()
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._schema_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not self._ready:
+            with self._schema_lock:
+                if not self._ready:
+                    conn.executescript(SCHEMA)
+                    self._ready = True
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection (autocommit; see `transaction`)."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """A connection inside BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error)."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close the idle connections (borrowed ones close when returned)."""
+        self.pool_size = 0
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # -----------------------------
+    # Documents (data store loader / writer)
+    # -----------------------------
+    def _name(self, path: Path | str) -> str:
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return str(path)
+
+    def read_document(self, path: Path | str) -> Dict[str, Any]:
+        """Stored payload for `path`, or {} (like reading a missing JSON file)."""
+        with self.connection() as conn:
+            row = conn.execute("SELECT data FROM documents WHERE name = ?", (self._name(path),)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def write_document(self, path: Path | str, data: Dict[str, Any]) -> None:
+        name = self._name(path)
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO documents (name, data) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET data = excluded.data",
+                (name, _dumps(data)),
+            )
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                ("documents.version:" + name,),
+            )
+
+    def document_stamp(self, path: Path | str) -> int:
+        """Write counter of `path`'s document (the data store's `stamp`)."""
+        with self.connection() as conn:
+            return self.get_meta(conn, "documents.version:" + self._name(path))
+
+    def has_document(self, path: Path | str) -> bool:
+        with self.connection() as conn:
+            row = conn.execute("SELECT 1 FROM documents WHERE name = ?", (self._name(path),)).fetchone()
+        return row is not None
+
+    # -----------------------------
+    # Counters
+    # -----------------------------
+    @staticmethod
+    def get_meta(conn: sqlite3.Connection, key: str, default: int = 0) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def set_meta(conn: sqlite3.Connection, key: str, value: int) -> None:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+class SqliteTaskLog:
+    """
+    Task persistence for `TaskStore` on SQLite: every commit is one
+    transaction touching only the changed rows, so there is nothing to compact.
+    The last `keep` records are also stored, so that other worker processes
+    can apply them instead of reloading every task.
+    """
+    compacts = False
+
+    def __init__(self, database: SqliteDatabase, keep: int = TASK_COMPACT_RECORDS):
+        self.database = database
+        self.keep = keep
+
+    @contextmanager
+    def _connection(self, conn: sqlite3.Connection | None) -> Iterator[sqlite3.Connection]:
+        if conn is not None:
+            yield conn
+        else:
+            with self.database.connection() as conn:
+                yield conn
+
+    def load(self, conn: sqlite3.Connection | None = None) -> Tuple[Dict[int, Dict[str, Any]], int, int, int]:
+        """(tasks by id, last seq, snapshot seq, next id)."""
+        with self._connection(conn) as conn:
+            tasks = {task_id: json.loads(data) for task_id, data in conn.execute("SELECT id, data FROM tasks ORDER BY id")}
+            seq = self.database.get_meta(conn, "tasks.seq")
+            next_id = self.database.get_meta(conn, "tasks.next_id", 1)
+        return tasks, seq, seq, next_id
+
+    @contextmanager
+    def exclusive(self) -> Iterator[sqlite3.Connection]:
+        """A transaction that keeps other processes from committing; the handle for `changes`/`load`/`commit`."""
+        with self.database.transaction() as conn:
+            yield conn
+
+    def changes(self, seq: int, conn: sqlite3.Connection | None = None) -> List[Dict[str, Any]] | None:
+        """Records committed after `seq`, in order; None if they are no longer kept: `load` again."""
+        with self._connection(conn) as conn:
+            if self.database.get_meta(conn, "tasks.seq") == seq:
+                return []
+            rows = conn.execute("SELECT record FROM task_changes WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        records = [json.loads(record) for (record,) in rows]
+        if not records or records[0]["seq"] != seq + 1:
+            return None
+        return records
+
+    def commit(self, records: List[Dict[str, Any]], next_id: int | None,
+               conn: sqlite3.Connection | None = None) -> None:
+        if conn is None:
+            with self.database.transaction() as conn:
+                self.commit(records, next_id, conn)
+            return
+        puts = [r["task"] for r in records if r["op"] == "put"]
+        if len(puts) == len(records):
+            self._put(conn, puts)
+        else:
+            # Keep the batch's order: a task may be written and then deleted
+            for record in records:
+                if record["op"] == "put":
+                    self._put(conn, [record["task"]])
+                else:
+                    conn.execute("DELETE FROM tasks WHERE id = ?", (record["id"],))
+        conn.executemany("INSERT INTO task_changes (seq, record) VALUES (?, ?)",
+                         [(r["seq"], _dumps(r)) for r in records])
+        conn.execute("DELETE FROM task_changes WHERE seq <= ?", (records[-1]["seq"] - self.keep,))
+        self.database.set_meta(conn, "tasks.seq", records[-1]["seq"])
+        if next_id is not None:
+            self.database.set_meta(conn, "tasks.next_id", next_id)
+
+    @staticmethod
+    def _put(conn: sqlite3.Connection, tasks: List[Dict[str, Any]]) -> None:
+        conn.executemany(
+            "INSERT INTO tasks (id, status, assignedTo, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = excluded.status, "
+            "assignedTo = excluded.assignedTo, data = excluded.data",
+            [(t["id"], t.get("status"), t.get("assignedTo"), _dumps(t)) for t in tasks],
+        )
+
+    def replace_all(self, tasks: Iterable[Dict[str, Any]], seq: int, next_id: int) -> None:
+        """Overwrite every stored task (migration)."""
+        with self.database.transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM task_changes")
+            self._put(conn, list(tasks))
+            self.database.set_meta(conn, "tasks.seq", seq)
+            self.database.set_meta(conn, "tasks.next_id", next_id)
+
+    def compact(self, tasks: List[Dict[str, Any]], seq: int, next_id: int, keep: int = 0) -> None:
+        pass
+
+
+class SqliteActivityJournal:
+    """
+    The activity journal as a table; same interface as `ActivityJournal`.
+    Cursors are row ids: a page holds entries older than the cursor.
+    """
+
+    def __init__(self, database: SqliteDatabase):
+        self.database = database
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self.append_many([entry])
+
+    def append_many(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Insert several entries in one transaction."""
+        rows = [(timestamp_key(e.get("timestamp")), e.get("user"), e.get("action"), _dumps(e)) for e in entries]
+        if not rows:
+            return
+        with self.database.transaction() as conn:
+            conn.executemany("INSERT INTO activity (ts, user, action, data) VALUES (?, ?, ?, ?)", rows)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over every entry, oldest first (in chunks, without holding a connection)."""
+        last = 0
+        while True:
+            with self.database.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, data FROM activity WHERE id > ? ORDER BY id LIMIT 1000", (last,)
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, data in rows:
+                yield json.loads(data)
+            last = rows[-1][0]
+
+    def tail(self, limit: int) -> List[Dict[str, Any]]:
+        """Return the newest `limit` entries, oldest first."""
+        if limit <= 0:
+            return []
+        with self.database.connection() as conn:
+            rows = conn.execute("SELECT data FROM activity ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def query(
+        self,
+        user: str | None = None,
+        action: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        cursor: int | None = None,
+        limit: int = 50,
+    ) -> Tuple[List[Dict[str, Any]], int | None]:
+        """One page of matching entries (oldest first) and the cursor for the next, older page."""
+        if limit <= 0:
+            return [], None
+        conditions, params = [], []
+        for clause, value in (("user = ?", user), ("action = ?", action), ("ts >= ?", start),
+                              ("ts <= ?", end), ("id < ?", cursor)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        with self.database.connection() as conn:
+            rows = conn.execute(f"SELECT id, data FROM activity {where}ORDER BY id DESC LIMIT ?",
+                                (*params, limit + 1)).fetchall()
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [json.loads(data) for _, data in reversed(rows[:limit])], next_cursor
+
+
+# Shared database for the data store, task store and activity journal when STORAGE_ENGINE=sqlite
+database = SqliteDatabase()
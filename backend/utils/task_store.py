@@ -0,0 +1,489 @@
+from __future__ import annotations
+import asyncio
+import base64
+import json
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from utils.constants import STORAGE_ENGINE, TASK_COMPACT_RECORDS, TASK_IDS_PATH, TASKS_PATH, TASKS_WAL_PATH
+from utils.data_store import DataStore
+from utils.etags import PreconditionFailed
+from utils.file_ops import store as default_store
+from utils.pubsub import bus
+from utils.wal import WriteAheadLog
+
+SORT_FIELDS = ("id", "title", "status", "assignedTo")
+# Fields with a secondary index: value -> sorted ids of the tasks that have it
+INDEXED_FIELDS = ("status", "assignedTo")
+
+
+def encode_cursor(key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: str) -> Any:
+    """Inverse of `encode_cursor`; raises ValueError if it does not fit `sort`."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if sort == "id" and isinstance(key, int):
+        return key
+    if sort != "id" and isinstance(key, list) and len(key) == 2 and isinstance(key[0], str) and isinstance(key[1], int):
+        return tuple(key)
+    raise ValueError("Invalid cursor")
+
+
+def _record_id(record: Dict[str, Any]) -> int:
+    return record["task"]["id"] if record["op"] == "put" else record["id"]
+
+
+class _Overlay:
+    """Read-only view of `base` (task id -> task) with `changed` entries on top (None: deleted)."""
+
+    def __init__(self, base: Dict[int, Dict[str, Any]]):
+        self.base = base
+        self.changed: Dict[int, Dict[str, Any] | None] = {}
+
+    def get(self, task_id: int) -> Dict[str, Any] | None:
+        return self.changed[task_id] if task_id in self.changed else self.base.get(task_id)
+
+
+class MissingTasks(Exception):
+    """Operations refer to tasks that do not exist; holds {operation index: task id}."""
+
+    def __init__(self, missing: Dict[int, int]):
+        super().__init__(f"Tasks not found: {sorted(set(missing.values()))}")
+        self.missing = missing
+
+
+class RevisionMismatch(Exception):
+    """Operations expected other task revisions; holds {operation index: (task id, current revision)}."""
+
+    def __init__(self, conflicts: Dict[int, Tuple[int, int]]):
+        super().__init__(f"Tasks have changed: {sorted({task_id for task_id, _ in conflicts.values()})}")
+        self.conflicts = conflicts
+
+
+class JsonTaskLog:
+    """
+    Task persistence for `TaskStore` on the JSON engine.
+
+    - Each commit appends its records to a write-ahead log (one write)
+      before the change becomes visible. tasks.json is only rewritten on
+      `compact`, which also trims the log.
+    - The id counter is kept in its own small file, written with each
+      snapshot; ids handed out since then are found in the WAL.
+    - Processes sharing the data directory commit while holding the log's
+      lock file (`exclusive`) and follow each other's records with `changes`.
+    """
+    compacts = True
+
+    def __init__(self, path: Path = TASKS_PATH, wal_path: Path = TASKS_WAL_PATH,
+                 ids_path: Path = TASK_IDS_PATH, store: DataStore = default_store):
+        self.path = path
+        self.ids_path = ids_path
+        self.wal = WriteAheadLog(wal_path)
+        self.store = store
+        self._position: Tuple[int, bytes, int] | None = None  # how far `changes` has read the WAL
+
+    def load(self, handle: Any = None) -> Tuple[Dict[int, Dict[str, Any]], int, int, int]:
+        """(tasks by id, last seq, snapshot seq, next id): the snapshot plus the WAL replayed on top."""
+        self.store.refresh(self.path)
+        self.store.refresh(self.ids_path)
+        data = self.store.get(self.path)
+        tasks = {t["id"]: t for t in data.get("tasks", [])}
+        seq = snapshot_seq = data.get("seq", 0)
+        next_id = self.store.get(self.ids_path).get("next", 1)
+        records, self._position = self.wal.read_since(None)
+        for record in records:
+            if record["seq"] <= seq:
+                continue
+            task_id = _record_id(record)
+            if record["op"] == "put":
+                tasks[task_id] = record["task"]
+            else:
+                tasks.pop(task_id, None)
+            seq, next_id = record["seq"], max(next_id, task_id + 1)
+        return tasks, seq, snapshot_seq, next_id
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Keep other processes from committing; yields the handle for `changes`/`load`/`commit`."""
+        with self.wal.exclusive():
+            yield None
+
+    def changes(self, seq: int, handle: Any = None) -> List[Dict[str, Any]] | None:
+        """
+        Records after `seq` that other processes appended, in order; None if
+        the log no longer reaches back to `seq` (compacted away): `load` again.
+        """
+        records, self._position = self.wal.read_since(self._position)
+        records = [r for r in records if r["seq"] > seq]
+        if records and records[0]["seq"] != seq + 1:
+            return None
+        return records
+
+    def commit(self, records: List[Dict[str, Any]], next_id: int | None, handle: Any = None) -> None:
+        self.wal.append_many(records)
+
+    def compact(self, tasks: List[Dict[str, Any]], seq: int, next_id: int, keep: int = 0) -> None:
+        """
+        Snapshot `tasks` (as of `seq`) and drop the records it covers except
+        the last `keep`, which lagging processes may still have to read.
+        Another process's newer snapshot is never overwritten.
+        """
+        with self.wal.exclusive():
+            self.store.refresh(self.path)
+            self.store.refresh(self.ids_path)
+            if self.store.get(self.path).get("seq", 0) < seq:
+                self.store.put(self.path, {"tasks": tasks, "seq": seq})
+            if self.store.get(self.ids_path).get("next", 1) < next_id:
+                self.store.put(self.ids_path, {"next": next_id})
+            self.store.flush([self.path, self.ids_path])
+            self.wal.discard_through(seq - keep)
+
+
+class TaskStore:
+    """
+    Tasks held in memory, indexed by id, persisted through a task log
+    (`JsonTaskLog` or, with STORAGE_ENGINE=sqlite, `SqliteTaskLog`).
+
+    - Lookups, updates and deletes are dict operations instead of scans over
+      every task; the dict keeps creation order for listing.
+    - Each change (or batch of changes) is committed to the log as one write
+      before it becomes visible. Logs that need it are compacted once
+      `compact_records` records have accumulated (and on close).
+    - Ids come from a counter persisted apart from the tasks, so an id is
+      never handed out twice, even after the newest task was deleted.
+    - Sorted id lists per status and per assignee are kept up to date on
+      every write, so `query` pages through only the matching tasks.
+      Orders other than by id are built once per change and then reused.
+    - `shared` stores (several worker processes on one data directory)
+      allocate ids and seqs while holding the log (`exclusive`), after
+      applying what the others committed, and catch up the same way before
+      every read, so all workers hand out unique ids and serve the same tasks.
+
+    Stored task dicts are replaced, never modified in place, so the lists
+    returned by `all` stay valid while they are being serialized. Each one
+    carries a `revision`: the seq of the log record that last wrote it, which
+    writers can require (If-Match) to avoid overwriting a newer version.
+    """
+
+    def __init__(self, log: JsonTaskLog | None = None, compact_records: int = TASK_COMPACT_RECORDS,
+                 shared: bool = False):
+        self.log = log if log is not None else JsonTaskLog()
+        self.compact_records = compact_records
+        self.shared = shared
+        self.lock = asyncio.Lock()
+        self._tasks: Dict[int, Dict[str, Any]] | None = None
+        self._list: List[Dict[str, Any]] | None = None
+        self._ids: List[int] = []
+        self._indexes: Dict[str, Dict[Any, List[int]]] = {field: {} for field in INDEXED_FIELDS}
+        self._views: Dict[Tuple[Any, ...], List[Any]] = {}
+        self._next_id = 1
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._compact_task: asyncio.Task | None = None
+
+    async def load(self) -> None:
+        """
+        Read the last snapshot and replay the WAL on first use. Shared stores
+        also apply what other processes have committed since the last call.
+        """
+        if self._tasks is None:
+            async with self.lock:
+                if self._tasks is None:
+                    await asyncio.to_thread(self._load)
+        elif self.shared:
+            async with self.lock:
+                changes = await asyncio.to_thread(self.log.changes, self._seq)
+                if changes is None:
+                    await asyncio.to_thread(self._load)
+                    self._changed()
+                elif changes:
+                    self._apply(changes)
+                    self._changed()
+
+    def _load(self) -> None:
+        self._reset(*self.log.load())
+
+    def _reset(self, tasks: Dict[int, Dict[str, Any]], seq: int, snapshot_seq: int, next_id: int) -> None:
+        self._seq, self._snapshot_seq = seq, snapshot_seq
+        # The counter may lag the tasks after a crash; never go below what was used
+        self._next_id = max(next_id, max(tasks, default=0) + 1)
+        self._list = None
+        self._views = {}
+        self._ids = sorted(tasks)
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        for task_id in self._ids:
+            for field, index in self._indexes.items():
+                index.setdefault(tasks[task_id].get(field), []).append(task_id)
+        self._tasks = tasks
+
+    @property
+    def version(self) -> int:
+        """Changes every time a task changes (and survives restarts, via the WAL seq)."""
+        return self._seq
+
+    def _index(self, task: Dict[str, Any]) -> None:
+        insort(self._ids, task["id"])
+        for field, index in self._indexes.items():
+            insort(index.setdefault(task.get(field), []), task["id"])
+
+    def _unindex(self, task: Dict[str, Any]) -> None:
+        self._ids.pop(bisect_left(self._ids, task["id"]))
+        for field, index in self._indexes.items():
+            ids = index[task.get(field)]
+            ids.pop(bisect_left(ids, task["id"]))
+            if not ids:
+                del index[task.get(field)]
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    async def all(self) -> List[Dict[str, Any]]:
+        await self.load()
+        if self._list is None:
+            self._list = list(self._tasks.values())
+        return self._list
+
+    async def get(self, task_id: int) -> Dict[str, Any] | None:
+        await self.load()
+        return self._tasks.get(task_id)
+
+    async def query(
+        self,
+        status: str | None = None,
+        assigned_to: str | None = None,
+        sort: str = "id",
+        descending: bool = False,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> Tuple[List[Dict[str, Any]], str | None]:
+        """
+        One page of the tasks matching the filters, ordered by `sort` (ties by id).
+
+        - `cursor` is the `nextCursor` returned with the previous page
+        - Returns the page and the cursor for the next one, or None
+        - Raises ValueError for a cursor that does not belong to this order
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort!r}")
+        await self.load()
+        keys = self._view(status, assigned_to, sort)
+        if descending:
+            end = len(keys) if cursor is None else bisect_left(keys, decode_cursor(cursor, sort))
+            start = max(0, end - limit)
+            page, more = keys[start:end][::-1], start > 0
+        else:
+            start = 0 if cursor is None else bisect_right(keys, decode_cursor(cursor, sort))
+            page, more = keys[start:start + limit], start + limit < len(keys)
+
+        tasks = [self._tasks[key if sort == "id" else key[1]] for key in page]
+        next_cursor = encode_cursor(page[-1]) if more and page else None
+        return tasks, next_cursor
+
+    def _view(self, status: str | None, assigned_to: str | None, sort: str) -> List[Any]:
+        """Sorted keys of the matching tasks: ids, or (value, id) pairs for other orders."""
+        view = self._views.get((status, assigned_to, sort))
+        if view is not None:
+            return view
+
+        if status is not None and assigned_to is not None:
+            by_status = self._indexes["status"].get(status, [])
+            by_assignee = self._indexes["assignedTo"].get(assigned_to, [])
+            # Walk the shorter list; it is already in id order
+            if len(by_status) <= len(by_assignee):
+                ids = [i for i in by_status if self._tasks[i].get("assignedTo") == assigned_to]
+            else:
+                ids = [i for i in by_assignee if self._tasks[i].get("status") == status]
+        elif status is not None:
+            ids = self._indexes["status"].get(status, [])
+        elif assigned_to is not None:
+            ids = self._indexes["assignedTo"].get(assigned_to, [])
+        else:
+            ids = self._ids
+
+        view = ids if sort == "id" else sorted((self._tasks[i].get(sort), i) for i in ids)
+        self._views[(status, assigned_to, sort)] = view
+        return view
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    async def create(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Store `task` under a newly allocated id and return it."""
+        results = await self.batch([("create", None, task)])
+        return results[0]
+
+    async def update(self, task_id: int, task: Dict[str, Any], revision: int | None = None) -> Dict[str, Any] | None:
+        """
+        Replace task `task_id`; None if there is no such task. With `revision`,
+        raises PreconditionFailed unless that is the task's current revision.
+        """
+        return await self._single("update", task_id, task, revision)
+
+    async def delete(self, task_id: int, revision: int | None = None) -> Dict[str, Any] | None:
+        """Remove task `task_id` and return it; None if there is no such task. `revision` as for `update`."""
+        return await self._single("delete", task_id, None, revision)
+
+    async def _single(self, op: str, task_id: int, task: Dict[str, Any] | None, revision: int | None):
+        try:
+            results = await self.batch([(op, task_id, task)], None if revision is None else {0: revision})
+        except MissingTasks:
+            return None
+        except RevisionMismatch as e:
+            raise PreconditionFailed(e.conflicts[0][1])
+        return results[0]
+
+    async def batch(
+        self,
+        operations: List[Tuple[str, int | None, Dict[str, Any] | None]],
+        expected: Dict[int, int] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Apply ("create", None, task), ("update", id, task) and ("delete", id, None)
+        operations in order, all or nothing, as one log commit.
+
+        - Returns per operation the created/updated task, or the deleted one
+        - Raises MissingTasks (and changes nothing) if an update or delete
+          refers to a task that does not exist at that point of the batch
+        - `expected` maps operation indexes to the revision their task must
+          have at that point; RevisionMismatch (nothing changed) otherwise
+        """
+        expected = expected or {}
+        await self.load()
+        async with self.lock:
+            if self.shared:
+                reloaded, changes, planned = await asyncio.to_thread(self._commit_exclusive, operations, expected)
+                if reloaded is not None:
+                    self._reset(*reloaded)
+                elif changes:
+                    self._apply(changes)
+                if reloaded is not None or changes:
+                    self._changed()
+                if isinstance(planned, Exception):
+                    raise planned
+                records, results = planned
+            else:
+                records, results, next_id = self._plan(operations, expected, self._tasks, self._seq, self._next_id)
+                await asyncio.to_thread(self.log.commit, records, next_id if next_id != self._next_id else None)
+            self._apply(records)
+            self._changed()
+        return results
+
+    def _commit_exclusive(self, operations: List[Tuple[str, int | None, Dict[str, Any] | None]],
+                          expected: Dict[int, int]) -> Tuple[Any, List[Dict[str, Any]] | None, Any]:
+        """
+        Shared stores (worker thread): with the log held against other
+        processes, read what they committed since our seq, plan the batch on
+        top of it and commit. Returns (reloaded state or None, their records,
+        (records, results) or the MissingTasks/RevisionMismatch raised).
+        """
+        with self.log.exclusive() as handle:
+            reloaded, changes = None, self.log.changes(self._seq, handle)
+            if changes is None:
+                reloaded = self.log.load(handle)
+                tasks, seq, _, next_id = reloaded
+                next_id = max(next_id, max(tasks, default=0) + 1)
+            else:
+                # Their records on top of our tasks; `self._tasks` is only modified on the event loop
+                tasks, seq, next_id = _Overlay(self._tasks), self._seq, self._next_id
+                for record in changes:
+                    task_id = _record_id(record)
+                    tasks.changed[task_id] = record["task"] if record["op"] == "put" else None
+                    seq, next_id = record["seq"], max(next_id, task_id + 1)
+            try:
+                records, results, planned_next_id = self._plan(operations, expected, tasks, seq, next_id)
+            except (MissingTasks, RevisionMismatch) as e:
+                return reloaded, changes, e
+            self.log.commit(records, planned_next_id if planned_next_id != next_id else None, handle)
+            return reloaded, changes, (records, results)
+
+    @staticmethod
+    def _plan(operations: List[Tuple[str, int | None, Dict[str, Any] | None]], expected: Dict[int, int],
+              tasks: Dict[int, Dict[str, Any]] | _Overlay, seq: int, next_id: int,
+              ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """
+        Check `operations` against `tasks` and build their log records,
+        numbered from `seq` + 1, allocating ids from `next_id`.
+        Returns (records, results, next id); raises MissingTasks/RevisionMismatch.
+        """
+        pending: Dict[int, Dict[str, Any] | None] = {}  # this batch's view of changed ids
+        records, results, missing, conflicts = [], [], {}, {}
+        for index, (op, task_id, task) in enumerate(operations):
+            if op == "create":
+                task_id, next_id = next_id, next_id + 1
+            current = pending[task_id] if task_id in pending else tasks.get(task_id)
+            if op != "create" and current is None:
+                missing[index] = task_id
+                continue
+            if op != "create" and index in expected and current.get("revision", 0) != expected[index]:
+                conflicts[index] = (task_id, current.get("revision", 0))
+                continue
+            record_seq = seq + len(records) + 1
+            if op == "delete":
+                pending[task_id] = None
+                records.append({"seq": record_seq, "op": "delete", "id": task_id})
+                results.append(current)
+            else:
+                pending[task_id] = {**task, "id": task_id, "revision": record_seq}
+                records.append({"seq": record_seq, "op": "put", "task": pending[task_id]})
+                results.append(pending[task_id])
+        if missing:
+            raise MissingTasks(missing)
+        if conflicts:
+            raise RevisionMismatch(conflicts)
+        return records, results, next_id
+
+    def _apply(self, records: List[Dict[str, Any]]) -> None:
+        """Apply logged records (ours or another process's) to the tasks and indexes."""
+        for record in records:
+            task_id = _record_id(record)
+            if record["op"] == "put":
+                if task_id in self._tasks:
+                    self._unindex(self._tasks[task_id])
+                self._tasks[task_id] = record["task"]
+                self._index(record["task"])
+            elif task_id in self._tasks:
+                self._unindex(self._tasks.pop(task_id))
+            self._seq, self._next_id = record["seq"], max(self._next_id, task_id + 1)
+
+    def _changed(self) -> None:
+        self._list = None
+        self._views = {}
+        if self.log.compacts and self._seq - self._snapshot_seq >= self.compact_records and (
+            self._compact_task is None or self._compact_task.done()
+        ):
+            self._compact_task = asyncio.create_task(self.compact())
+
+    # -----------------------------
+    # Snapshots
+    # -----------------------------
+    async def compact(self) -> None:
+        """Snapshot every task and let the log drop the records it covers."""
+        if self._tasks is None or self._seq == self._snapshot_seq:
+            return
+        tasks, seq = list(self._tasks.values()), self._seq
+        # Shared logs keep a tail for workers that have not read it yet
+        keep = self.compact_records if self.shared else 0
+        await asyncio.to_thread(self.log.compact, tasks, seq, self._next_id, keep)
+        self._snapshot_seq = seq
+
+    async def close(self) -> None:
+        """Take a final snapshot (server shutdown)."""
+        if self._compact_task is not None and not self._compact_task.done():
+            await self._compact_task
+        self._compact_task = None
+        await self.compact()
+
+
+# Shared task repository; main.py loads it at startup and snapshots it on shutdown
+if STORAGE_ENGINE == "sqlite":
+    from utils.sqlite_storage import SqliteTaskLog, database
+    task_store = TaskStore(SqliteTaskLog(database), shared=bus.distributed)
+else:
+    task_store = TaskStore(shared=bus.distributed)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple
+
+from utils.constants import REVOKED_TOKENS_PATH, TOKEN_SECRET, TOKEN_SECRET_PATH, TOKEN_TTL
+from utils.data_store import DataStore
+from utils.file_ops import store as default_store
+from utils.pubsub import LocalBus, bus as default_bus
+
+
+class InvalidToken(Exception):
+    """Malformed, tampered with, expired or revoked."""
+
+
+class Claims(NamedTuple):
+    username: str
+    role: str
+    expires: int
+    token_id: str
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class TokenSigner:
+    """
+    Stateless session tokens: "<claims>.<signature>", both base64url, signed
+    with HMAC-SHA256. Verifying one needs no storage lookup: revocations are
+    kept in memory, read once from `revoked_path`.
+
+    - `revoke` adds to that file (read-modify-write under its lock file, so
+      workers do not drop each other's entries) and logouts survive restarts.
+    - `arevoke` also announces the revocation on the bus, and every other
+      worker adds it to its own list.
+    """
+
+    def __init__(self, secret: bytes, ttl: int = TOKEN_TTL, revoked_path: Path = REVOKED_TOKENS_PATH,
+                 store: DataStore = default_store, bus: LocalBus = default_bus):
+        self._secret = secret
+        self.ttl = ttl
+        self.revoked_path = revoked_path
+        self.store = store
+        self.bus = bus
+        self.channel = "tokens"
+        self._revoked: Dict[str, int] | None = None  # token id -> expiry; replaced, never modified
+        self._lock = threading.Lock()
+        bus.subscribe(self.channel, self.receive)
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, username: str, role: str) -> tuple[str, Claims]:
+        claims = Claims(username, role, int(time.time()) + self.ttl, secrets.token_urlsafe(12))
+        payload = _b64encode(json.dumps(
+            {"sub": claims.username, "role": claims.role, "exp": claims.expires, "jti": claims.token_id},
+            separators=(",", ":"),
+        ).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}", claims
+
+    def verify(self, token: str) -> Claims:
+        payload, _, signature = token.partition(".")
+        if not signature or not hmac.compare_digest(signature, self._sign(payload)):
+            raise InvalidToken("Invalid token")
+        try:
+            data = json.loads(_b64decode(payload))
+            claims = Claims(data["sub"], data["role"], int(data["exp"]), data["jti"])
+        except (ValueError, KeyError, TypeError):
+            raise InvalidToken("Invalid token")
+        if claims.expires <= time.time():
+            raise InvalidToken("Token expired")
+        if claims.token_id in self._revoked_ids():
+            raise InvalidToken("Token revoked")
+        return claims
+
+    def revoke(self, claims: Claims) -> None:
+        """Reject this token from now on (until it would have expired anyway); blocks on the file write."""
+        self._remember(claims.token_id, claims.expires)
+
+        def add(data: Dict) -> Dict:
+            now = time.time()
+            revoked = {jti: exp for jti, exp in data.get("revoked", {}).items() if exp > now}
+            revoked[claims.token_id] = claims.expires
+            return {"revoked": revoked}
+
+        self.store.update(self.revoked_path, add)
+
+    async def arevoke(self, claims: Claims) -> None:
+        """`revoke` in a worker thread, then tell the other workers."""
+        await asyncio.to_thread(self.revoke, claims)
+        await self.bus.publish(self.channel, {"node": self.bus.node, "id": claims.token_id, "expires": claims.expires})
+
+    def receive(self, message: Dict) -> None:
+        """Bus callback: another worker revoked a token."""
+        self._remember(message["id"], message["expires"])
+
+    def _remember(self, token_id: str, expires: int) -> None:
+        with self._lock:
+            now = time.time()
+            revoked = {jti: exp for jti, exp in self._revoked_ids().items() if exp > now}
+            revoked[token_id] = expires
+            self._revoked = revoked
+
+    def _revoked_ids(self) -> Dict[str, int]:
+        if self._revoked is None:
+            self._revoked = dict(self.store.get(self.revoked_path).get("revoked", {}))
+        return self._revoked
+
+
+def _load_secret() -> bytes:
+    if TOKEN_SECRET:
+        return TOKEN_SECRET.encode("utf-8")
+    if not TOKEN_SECRET_PATH.exists():
+        # Workers may start together: the first to link its key wins
+        tmp = TOKEN_SECRET_PATH.with_name(f"{TOKEN_SECRET_PATH.name}.{os.getpid()}.tmp")
+        tmp.write_text(secrets.token_hex(32), encoding="ascii")
+        os.chmod(tmp, 0o600)
+        try:
+            os.link(tmp, TOKEN_SECRET_PATH)
+        except FileExistsError:
+            pass
+        finally:
+            tmp.unlink()
+    return TOKEN_SECRET_PATH.read_text(encoding="ascii").strip().encode("ascii")
+
+
+# Shared signer for login, the auth dependencies and the WebSocket handshake
+tokens = TokenSigner(_load_secret())
@@ -0,0 +1,44 @@
+from __future__ import annotations
+import asyncio
+from pathlib import Path
+from typing import Any, Dict
+
+from utils.constants import USERS_PATH
+from utils.file_ops import store
+from utils.pubsub import bus
+
+
+class UserIndex:
+    """
+    username -> user record, built from the users file once and rebuilt
+    only after the file is written (tracked through `store.version`).
+    With several workers, `aget` (login) first checks whether another
+    worker wrote the file, so a user created there can log in here at once.
+    """
+
+    def __init__(self, path: Path = USERS_PATH):
+        self.path = path
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._version: int | None = None
+
+    def _current(self) -> Dict[str, Dict[str, Any]]:
+        version = store.version(self.path)
+        if version != self._version:
+            users = store.get(self.path).get("users", [])
+            self._by_name = {u["username"]: u for u in users if "username" in u}
+            self._version = version
+        return self._by_name
+
+    async def aget(self, username: str) -> Dict[str, Any] | None:
+        if self._version is None:
+            await store.aget(self.path)  # first load off the event loop
+        elif bus.distributed:
+            await asyncio.to_thread(store.refresh, self.path)
+        return self._current().get(username)
+
+    def get(self, username: str) -> Dict[str, Any] | None:
+        return self._current().get(username)
+
+
+# Shared index for the user routes
+user_index = UserIndex()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, single worker only
+    fcntl = None
+
+
+class WriteAheadLog:
+    """
+    Append-only JSON-lines log of changes not yet folded into a snapshot.
+
+    - Each record carries a monotonically increasing "seq".
+    - `append` writes one line, so its cost does not depend on the size of
+      the data being protected.
+    - After a snapshot up to some seq is safely on disk, `discard_through`
+      drops the records it covers and keeps any written since.
+    """
+
+    def __init__(self, path: Path, fsync: bool = False):
+        self.path = Path(path)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+    def lock(self) -> int | None:
+        """
+        Block until this process holds the log exclusively across processes
+        (workers sharing one data directory). Returns a handle for `unlock`.
+        """
+        if fcntl is None:
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path.with_suffix(self.path.suffix + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def unlock(self, fd: int | None) -> None:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    @contextmanager
+    def exclusive(self):
+        fd = self.lock()
+        try:
+            yield
+        finally:
+            self.unlock(fd)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("ab") as f:
+                f.write(data)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    def replay(self, after: int = -1) -> List[Dict[str, Any]]:
+        """Records with seq > `after`, in write order. A torn final line is ignored."""
+        with self._lock:
+            return [r for r in self._read() if r.get("seq", 0) > after]
+
+    def read_since(self, position: Tuple[int, bytes, int] | None,
+                   ) -> Tuple[List[Dict[str, Any]], Tuple[int, bytes, int] | None]:
+        """
+        Records appended after `position` (returned by the previous call), for
+        following a log that other processes append to. Starts from the top
+        when the file has been rewritten since. A partial last line is left
+        for the next call.
+        """
+        with self._lock:
+            try:
+                f = self.path.open("rb")
+            except FileNotFoundError:
+                return [], None
+            with f:
+                stat = os.fstat(f.fileno())
+                # A rewritten log may get the inode number of the one it
+                # replaced; its first line tells the two apart
+                first = f.readline()
+                offset = 0
+                if position is not None and position[:2] == (stat.st_ino, first) and position[2] <= stat.st_size:
+                    offset = position[2]
+                f.seek(offset)
+                records = []
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+                    offset += len(line)
+            return records, (stat.st_ino, first, offset)
+
+    def discard_through(self, seq: int) -> None:
+        """Drop every record with seq <= `seq`."""
+        with self._lock:
+            keep = [r for r in self._read() if r.get("seq", 0) > seq]
+            if not keep:
+                self.path.unlink(missing_ok=True)
+                return
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for record in keep:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            tmp.replace(self.path)
+
+    def _read(self) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        records = []
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Crash mid-append: everything before it is intact
+                    break
+        return records
@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from "react";
 import { useAuth } from "@/context/AuthContext";
-import { API_BASE } from "@/lib/api";
+import { API_BASE, subscribeFeed } from "@/lib/api";
 
 interface ActivityLog {
     timestamp: string;
@@ -18,6 +18,11 @@ export default function ActivityLogPage() {
 
     useEffect(() => {
         loadActivityLogs();
+        // New entries arrive over the activity feed
+        return subscribeFeed<ActivityLog>("activity", {
+            onEvent: (entry) => setActivityLogs(current => [...current, entry]),
+            onReset: loadActivityLogs,
+        });
     }, []);
 
     const loadActivityLogs = async () => {
@@ -3,15 +3,21 @@
 import { useState, useEffect } from "react";
 import { useAuth } from "@/context/AuthContext";
 import Toast from "@/components/ui/Toast";
-import { API_BASE } from "@/lib/api";
+import { API_BASE, authHeaders, subscribeFeed } from "@/lib/api";
 
 interface Task {
     id: number;
     title: string;
     assignedTo: string;
     status: string;
+    revision?: number;
 }
 
+type TaskEvent = { op: "put"; task: Task } | { op: "delete"; id: number };
+
+const upsert = (tasks: Task[], task: Task) =>
+    tasks.some(t => t.id === task.id) ? tasks.map(t => (t.id === task.id ? task : t)) : [...tasks, task];
+
 export default function TaskBoardPage() {
     const { user, role } = useAuth();
     const [showToast, setShowToast] = useState(false);
@@ -22,6 +28,14 @@ export default function TaskBoardPage() {
 
     useEffect(() => {
         loadTasks();
+        // Apply other users' changes as they happen instead of refetching the list
+        return subscribeFeed<TaskEvent>("tasks", {
+            onEvent: (event) =>
+                setTasks(current =>
+                    event.op === "put" ? upsert(current, event.task) : current.filter(t => t.id !== event.id)
+                ),
+            onReset: loadTasks,
+        });
     }, []);
 
     const loadTasks = async () => {
@@ -47,7 +61,7 @@ export default function TaskBoardPage() {
             try {
                 const res = await fetch(`${API_BASE}/api/tasks`, {
                     method: "POST",
-                    headers: { "Content-Type": "application/json" },
+                    headers: authHeaders(),
                     body: JSON.stringify({
                         title: newTaskTitle,
                         assignedTo: user.username,
@@ -56,7 +70,7 @@ export default function TaskBoardPage() {
                 });
                 const json = await res.json();
                 if (res.ok && json.status === "success") {
-                    setTasks([...tasks, json.data]);
+                    setTasks(current => upsert(current, json.data));
                     setNewTaskTitle("");
                 }
             } catch (e) {
@@ -73,7 +87,10 @@ export default function TaskBoardPage() {
         try {
             const res = await fetch(`${API_BASE}/api/tasks/${task.id}`, {
                 method: "PUT",
-                headers: { "Content-Type": "application/json" },
+                // Refused (412) if someone else moved the task since this board saw it
+                headers: task.revision === undefined
+                    ? authHeaders()
+                    : { ...authHeaders(), "If-Match": `"task-${task.id}-${task.revision}"` },
                 body: JSON.stringify({
                     title: task.title,
                     assignedTo: user.username,
@@ -82,7 +99,9 @@ export default function TaskBoardPage() {
             });
             const json = await res.json();
             if (res.ok && json.status === "success") {
-                setTasks(tasks.map(t => (t.id === task.id ? json.data : t)));
+                setTasks(current => upsert(current, json.data));
+            } else if (res.status === 412) {
+                loadTasks();
             }
         } catch (e) {
             console.error(e);
@@ -3,9 +3,11 @@
 import { useState, useEffect, useRef } from "react";
 import { useAuth } from "@/context/AuthContext";
 import Toast from "@/components/ui/Toast";
-import { API_BASE } from "@/lib/api";
+import { API_BASE, authHeaders } from "@/lib/api";
+import { Op, applyOps, diff, transform } from "@/lib/ot";
 
 interface CursorPresence {
+  id: string;
   user: string;
   cursor: number | null;
 }
@@ -21,6 +23,12 @@ export default function DocumentPage() {
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimer = useRef<NodeJS.Timeout | null>(null);
   const textareaRef = useRef<HTMLTextAreaElement | null>(null);
+  // OT client state: last server revision seen, the edit awaiting ack, and edits made since
+  const contentRef = useRef("");
+  const revisionRef = useRef(0);
+  const pendingRef = useRef<Op[] | null>(null);
+  const bufferRef = useRef<Op[] | null>(null);
+  const resyncingRef = useRef(false);
   const isViewer = role === "Viewer";
 
   // -----------------------------
@@ -37,7 +45,8 @@ export default function DocumentPage() {
       const res = await fetch(`${API_BASE}/api/document`);
       const json = await res.json();
       if (res.ok && json.status === "success") {
-        setContent(json.data.content || "");
+        contentRef.current = json.data.content || "";
+        setContent(contentRef.current);
         console.debug("[DOC] Document content loaded successfully");
       } else {
         console.warn("[DOC] Unexpected response:", json);
@@ -65,7 +74,7 @@ export default function DocumentPage() {
       return;
     }
 
-    const wsUrl = `${API_BASE.replace("http", "ws")}/ws/document?user=${user.username}`;
+    const wsUrl = `${API_BASE.replace("http", "ws")}/ws/document?token=${encodeURIComponent(user.token)}`;
     console.log("🌐 [WS] --- INIT ---");
     console.log("🌐 [WS] API_BASE:", API_BASE);
     console.log("🌐 [WS] Constructed URL:", wsUrl);
@@ -94,15 +103,27 @@ export default function DocumentPage() {
     ws.onmessage = (event) => {
       try {
         const msg = JSON.parse(event.data);
-        if (msg.type === "init") {
-          setContent(msg.data.document.content);
-          setUsersOnline(msg.data.users.map((u: any) => u.user));
-          setPresence(msg.data.users);
-        } else if (msg.type === "update") {
-          setContent(msg.data.content);
+        if (msg.type === "init" || msg.type === "resync") {
+          resetDocument(msg.data.document.content || "", msg.data.revision);
+          if (msg.data.users) {
+            setUsersOnline(msg.data.users.map((u: any) => u.user));
+            setPresence(msg.data.users);
+          }
+        } else if (msg.type === "ack") {
+          if (msg.data.revision !== revisionRef.current + 1) return requestResync();
+          revisionRef.current = msg.data.revision;
+          pendingRef.current = bufferRef.current;
+          bufferRef.current = null;
+          if (pendingRef.current) sendOps(pendingRef.current);
+        } else if (msg.type === "op") {
+          applyRemoteOps(msg.data.revision, msg.data.ops);
         } else if (msg.type === "presence") {
           setPresence(msg.data);
           setUsersOnline(msg.data.map((u: any) => u.user));
+        } else if (msg.type === "presence_diff") {
+          // Only the cursors that moved since the last tick
+          const moved = new Map<string, CursorPresence>(msg.data.map((p: CursorPresence) => [p.id, p]));
+          setPresence((prev) => prev.map((p) => moved.get(p.id) ?? p));
         } else {
           console.warn("[WS] Unknown message type:", msg.type);
         }
@@ -150,8 +171,44 @@ export default function DocumentPage() {
   }, [user?.username]);
 
   // -----------------------------
-  // 3. Send live content updates
+  // 3. Send live edits as ops
   // -----------------------------
+  const resetDocument = (text: string, revision: number) => {
+    contentRef.current = text;
+    revisionRef.current = revision;
+    pendingRef.current = null;
+    bufferRef.current = null;
+    resyncingRef.current = false;
+    setContent(text);
+  };
+
+  const applyRemoteOps = (revision: number, ops: Op[]) => {
+    // Ignore ops already included in the snapshot we hold
+    if (revision <= revisionRef.current) return;
+    // A skipped revision means messages were dropped while we lagged
+    if (revision !== revisionRef.current + 1) return requestResync();
+
+    let remote = ops;
+    if (pendingRef.current) {
+      [pendingRef.current, remote] = transform(pendingRef.current, remote);
+    }
+    if (bufferRef.current) {
+      [bufferRef.current, remote] = transform(bufferRef.current, remote);
+    }
+    revisionRef.current = revision;
+    contentRef.current = applyOps(contentRef.current, remote);
+    setContent(contentRef.current);
+  };
+
+  const requestResync = () => {
+    if (resyncingRef.current) return;
+    resyncingRef.current = true;
+    const ws = wsRef.current;
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: "resync" }));
+    }
+  };
+
   const handleContentChange = (e: React.ChangeEvent<HTMLTextAreaElement>) => {
     if (isViewer) {
       console.warn("[EDIT] Viewer attempted to edit document");
@@ -159,27 +216,28 @@ export default function DocumentPage() {
       return;
     }
     const newText = e.target.value;
+    const ops = diff(contentRef.current, newText);
+    contentRef.current = newText;
     setContent(newText);
-    sendUpdate(newText);
+    if (!ops.length) return;
+
+    // One edit in flight at a time; later edits wait in the buffer
+    if (pendingRef.current) {
+      bufferRef.current = [...(bufferRef.current || []), ...ops];
+    } else {
+      pendingRef.current = ops;
+      sendOps(ops);
+    }
   };
 
-  const sendUpdate = (newText: string) => {
+  const sendOps = (ops: Op[]) => {
     const ws = wsRef.current;
     if (!ws) {
-      console.error("[EDIT] Cannot send update: wsRef null");
+      console.error("[EDIT] Cannot send ops: wsRef null");
       return;
     }
     if (ws.readyState === WebSocket.OPEN) {
-      ws.send(
-        JSON.stringify({
-          type: "update",
-          data: {
-            title: "Team Collaboration Workspace",
-            content: newText,
-            lastEditedBy: user?.username,
-          },
-        })
-      );
+      ws.send(JSON.stringify({ type: "op", data: { revision: revisionRef.current, ops } }));
     } else {
       console.warn("[EDIT] Skipped send — socket not open");
     }
@@ -215,7 +273,8 @@ export default function DocumentPage() {
     try {
       const res = await fetch(`${API_BASE}/api/document`, {
         method: "PUT",
-        headers: { "Content-Type": "application/json" },
+        // Only overwrite the revision this editor has seen
+        headers: { ...authHeaders(), "If-Match": `"document-main-${revisionRef.current}"` },
         body: JSON.stringify({
           title: "Team Collaboration Workspace",
           content,
@@ -227,6 +286,10 @@ export default function DocumentPage() {
       if (res.ok && json.status === "success") {
         setSaveMessage("Document saved successfully!");
         setTimeout(() => setSaveMessage(""), 3000);
+      } else if (res.status === 412) {
+        setSaveMessage("Someone else changed the document; reloaded the latest version.");
+        setTimeout(() => setSaveMessage(""), 3000);
+        requestResync();
       } else {
         console.warn("[SAVE] Failed:", json);
       }
@@ -258,7 +321,7 @@ export default function DocumentPage() {
       .filter((p) => p.user !== user?.username && p.cursor !== null)
       .map((p) => (
         <div
-          key={p.user}
+          key={p.id}
           title={`${p.user}'s cursor`}
           className="absolute bg-red-500 rounded-full w-2 h-2 animate-pulse"
           style={{
@@ -41,7 +41,7 @@ export default function UsersPage() {
     }
 
     try {
-        await createAdminUser(user?.username); // pass username
+        await createAdminUser();
         await loadUsers();
     } catch (error) {
         console.error("Failed to add user:", error);
@@ -2,20 +2,14 @@
 
 import React, { createContext, useContext, useState, useEffect, useCallback } from "react";
 import { useRouter, usePathname } from "next/navigation";
-import { API_BASE } from "@/lib/api";
+import { API_BASE, SESSION_KEY } from "@/lib/api";
 
 type Role = "Admin" | "Editor" | "Viewer";
 
 interface User {
   username: string;
   role: Role;
-}
-
-interface BackendUser {
-  id: number;
-  username: string;
-  password: string;
-  role: string;
+  token: string;
 }
 
 interface AuthContextType {
@@ -28,7 +22,7 @@ interface AuthContextType {
 }
 
 const AuthContext = createContext<AuthContextType | undefined>(undefined);
-const STORAGE_KEY = "auth_session";
+const STORAGE_KEY = SESSION_KEY;
 
 export function AuthProvider({ children }: { children: React.ReactNode }) {
   const [user, setUser] = useState<User | null>(null);
@@ -47,20 +41,16 @@ const revalidateSession = useCallback(async () => {
       return;
     }
 
-    const session = JSON.parse(savedSession);
+    const session: User = JSON.parse(savedSession);
 
-    const response = await fetch(`${API_BASE}/api/users`);
-    if (!response.ok) throw new Error("Failed to fetch users");
+    // The server checks the token's signature, expiry and revocation
+    const response = await fetch(`${API_BASE}/api/users/me`, {
+      headers: { Authorization: `Bearer ${session.token}` },
+    });
 
-    const json = await response.json();
-    const users: BackendUser[] = json.data;
-
-    const userExists = users.some(
-      (u) => u.username === session.username && u.role === session.role
-    );
-
-    if (userExists) {
-      setUser(session);
+    if (response.ok) {
+      const json = await response.json();
+      setUser({ ...session, ...json.data });
     } else {
       localStorage.removeItem(STORAGE_KEY);
       setUser(null);
@@ -93,8 +83,8 @@ const revalidateSession = useCallback(async () => {
         throw new Error(json.detail || "Invalid username or password");
       }
 
-      const { username: name, role } = json.data;
-      const userData: User = { username: name, role };
+      const { username: name, role, token } = json.data;
+      const userData: User = { username: name, role, token };
 
       // Save locally
       localStorage.setItem(STORAGE_KEY, JSON.stringify(userData));
@@ -116,8 +106,7 @@ const revalidateSession = useCallback(async () => {
       if (user) {
         await fetch(`${API_BASE}/api/users/logout`, {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ username: user.username }),
+          headers: { Authorization: `Bearer ${user.token}` },
         });
       }
 
@@ -1,6 +1,31 @@
 export const API_BASE =
   process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 
+export const SESSION_KEY = "auth_session";
+
+/**
+ * Session token saved by AuthContext at login
+ */
+export function sessionToken(): string | null {
+  if (typeof window === "undefined") return null;
+  try {
+    return JSON.parse(localStorage.getItem(SESSION_KEY) || "null")?.token ?? null;
+  } catch {
+    return null;
+  }
+}
+
+/**
+ * JSON headers plus the bearer token, for requests that need a signed-in user
+ */
+export function authHeaders(): Record<string, string> {
+  const token = sessionToken();
+  return {
+    "Content-Type": "application/json",
+    ...(token ? { Authorization: `Bearer ${token}` } : {}),
+  };
+}
+
 /**
  * Fetch all users (any role)
  * GET /api/users
@@ -16,9 +41,12 @@ export async function fetchUsers() {
   return json.data;
 }
 
-export async function createAdminUser(creator?: string) {
+/**
+ * Create a random Viewer (Admin-only; the creator comes from the session token)
+ * POST /api/users
+ */
+export async function createAdminUser() {
   const newUser = {
-    creator: creator || "admin123",
     username: `user${Math.floor(Math.random() * 1000)}`,
     password: "password123",
     role: "Viewer",
@@ -26,7 +54,7 @@ export async function createAdminUser(creator?: string) {
 
   const res = await fetch(`${API_BASE}/api/users`, {
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers: authHeaders(),
     body: JSON.stringify(newUser),
   });
 
@@ -38,3 +66,67 @@ export async function createAdminUser(creator?: string) {
 
   return json.data;
 }
+
+export interface FeedHandlers<T> {
+  /** A change made after the client was last in sync */
+  onEvent: (data: T) => void;
+  /** Missed changes are no longer buffered on the server: reload the full list */
+  onReset: () => void;
+}
+
+/**
+ * Follow a live change feed (/ws/feed/tasks or /ws/feed/activity).
+ * Reconnects after a drop and resumes from the last applied sequence, so
+ * only the missed events are replayed. Returns a function that stops it.
+ */
+export function subscribeFeed<T>(name: string, { onEvent, onReset }: FeedHandlers<T>): () => void {
+  let ws: WebSocket | null = null;
+  let epoch: string | null = null;
+  let seq = 0;
+  let stopped = false;
+  let retry: ReturnType<typeof setTimeout> | null = null;
+
+  const apply = (event: { seq: number; data: T }) => {
+    if (event.seq <= seq) return; // already applied (replayed around init)
+    if (event.seq > seq + 1) {
+      // Events were dropped for this client: resume from the last one applied
+      ws?.close();
+      return;
+    }
+    seq = event.seq;
+    onEvent(event.data);
+  };
+
+  const connect = () => {
+    const resume = epoch ? `?since=${seq}&epoch=${encodeURIComponent(epoch)}` : "";
+    ws = new WebSocket(`${API_BASE.replace("http", "ws")}/ws/feed/${name}${resume}`);
+
+    ws.onmessage = (message) => {
+      const msg = JSON.parse(message.data);
+      if (msg.type === "init") {
+        const fresh = epoch === null;
+        if (msg.data.reset || fresh) {
+          seq = msg.data.seq;
+          if (!fresh) onReset();
+        }
+        epoch = msg.data.epoch;
+        msg.data.events.forEach(apply);
+      } else if (msg.type === "event") {
+        apply(msg);
+      }
+    };
+
+    ws.onclose = () => {
+      ws = null;
+      if (!stopped) retry = setTimeout(connect, 1000);
+    };
+  };
+
+  connect();
+
+  return () => {
+    stopped = true;
+    if (retry) clearTimeout(retry);
+    ws?.close(1000, "unmount");
+  };
+}
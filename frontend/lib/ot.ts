@@ -0,0 +1,88 @@
+/**
+ * Operational transform helpers mirroring backend/utils/ot.py.
+ * An edit is a list of primitive ops applied in order.
+ */
+export type Op =
+  | { type: "insert"; pos: number; text: string }
+  | { type: "delete"; pos: number; length: number };
+
+export function applyOps(content: string, ops: Op[]): string {
+  for (const op of ops) {
+    if (op.type === "insert") {
+      content = content.slice(0, op.pos) + op.text + content.slice(op.pos);
+    } else {
+      content = content.slice(0, op.pos) + content.slice(op.pos + op.length);
+    }
+  }
+  return content;
+}
+
+function transformOp(op: Op, other: Op, opFirst: boolean): Op[] {
+  const pos = op.pos;
+
+  if (other.type === "insert") {
+    const at = other.pos;
+    const size = other.text.length;
+    if (op.type === "insert") {
+      if (pos < at || (pos === at && opFirst)) return [op];
+      return [{ ...op, pos: pos + size }];
+    }
+    const end = pos + op.length;
+    if (at <= pos) return [{ ...op, pos: pos + size }];
+    if (at >= end) return [op];
+    return [
+      { type: "delete", pos, length: at - pos },
+      { type: "delete", pos: pos + size, length: end - at },
+    ];
+  }
+
+  const start = other.pos;
+  const stop = other.pos + other.length;
+  if (op.type === "insert") {
+    if (pos <= start) return [op];
+    if (pos >= stop) return [{ ...op, pos: pos - other.length }];
+    return [{ ...op, pos: start }];
+  }
+
+  const end = pos + op.length;
+  if (end <= start) return [op];
+  if (pos >= stop) return [{ ...op, pos: pos - other.length }];
+  const remaining = op.length - (Math.min(end, stop) - Math.max(pos, start));
+  return remaining ? [{ type: "delete", pos: Math.min(pos, start), length: remaining }] : [];
+}
+
+/** Returns [a', b'] where a' applies after b and b' applies after a. */
+export function transform(a: Op[], b: Op[], aFirst = false): [Op[], Op[]] {
+  if (!a.length || !b.length) return [a, b];
+
+  if (a.length > 1) {
+    const [head, b1] = transform(a.slice(0, 1), b, aFirst);
+    const [tail, b2] = transform(a.slice(1), b1, aFirst);
+    return [[...head, ...tail], b2];
+  }
+  if (b.length > 1) {
+    const [a1, head] = transform(a, b.slice(0, 1), aFirst);
+    const [a2, tail] = transform(a1, b.slice(1), aFirst);
+    return [a2, [...head, ...tail]];
+  }
+  return [transformOp(a[0], b[0], aFirst), transformOp(b[0], a[0], !aFirst)];
+}
+
+/** Smallest single-region edit turning `oldText` into `newText`. */
+export function diff(oldText: string, newText: string): Op[] {
+  const limit = Math.min(oldText.length, newText.length);
+  let prefix = 0;
+  while (prefix < limit && oldText[prefix] === newText[prefix]) prefix++;
+  let suffix = 0;
+  while (
+    suffix < limit - prefix &&
+    oldText[oldText.length - 1 - suffix] === newText[newText.length - 1 - suffix]
+  ) suffix++;
+
+  const ops: Op[] = [];
+  const removed = oldText.length - prefix - suffix;
+  if (removed) ops.push({ type: "delete", pos: prefix, length: removed });
+  const inserted = newText.slice(prefix, newText.length - suffix);
+  if (inserted) ops.push({ type: "insert", pos: prefix, text: inserted });
+  return ops;
+}